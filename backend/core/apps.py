@@ -6,3 +6,9 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         import core.signals  # noqa
+
+        from django.conf import settings
+
+        if getattr(settings, "ML_PRELOAD_MODELS", False):
+            from core.ml_model import preload
+            preload()
@@ -0,0 +1,303 @@
+# core/batch_recommender.py
+"""
+Top-N recommendations for many users at once.
+
+The candidate snapshot is taken once for the whole run. Users are loaded in
+chunks of ``RECOMMENDER_BATCH['CHUNK_USERS']``, two queries per chunk
+(locations and booking histories).
+
+Each user's candidates are the snapshot rows ``retrieve_from_snapshot`` would
+return for them, i.e. the grid cells around the user with the adaptive
+radius of ``RECOMMENDER_RETRIEVAL``. Users sharing the same candidate rows
+(neighbours in the same cell, mostly) are scored together: one broadcast
+distance matrix and, in model mode, one ``Booster.predict`` call per group,
+split so that the ``users × candidates`` matrices stay under ``max_cells``
+entries. Results are yielded user by user, so callers can stream them
+straight to a response or file.
+
+With ``STRATEGY = "snapshot"`` this matches ``recommend_top_n_for_user``
+exactly. With ``"postgis"`` the single-user path asks PostGIS for the ``K``
+nearest workers within an exact radius, so at the edges of the radius and
+beyond the ``K`` nearest workers the two candidate sets can differ.
+"""
+import csv
+import json
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from sqlalchemy import text
+
+from core import distance
+from core.candidates import candidate_index, snapshot_rows
+from core.db import get_engine
+from core.features import distance_bucket
+from core.recommender import (
+    RESULT_FIELDS, _fill_charge, _records, assemble_features, normalize, resolve_scorer,
+    retrieval_settings,
+)
+
+USER_LOCATIONS_SQL = text("""
+    SELECT id, ST_Y(location::geometry) AS lat, ST_X(location::geometry) AS lon
+    FROM core_authenticateduser
+    WHERE id = ANY(:ids) AND location IS NOT NULL;
+""")
+
+USER_HISTORIES_SQL = text("""
+    SELECT b.user_id, b.worker_id, b.service_id, w.average_rating AS worker_rating
+    FROM bookings b
+    JOIN workers w ON w.id = b.worker_id
+    WHERE b.user_id = ANY(:ids) AND b.status = 'completed';
+""")
+
+ALL_USER_IDS_SQL = text("""
+    SELECT id FROM core_authenticateduser
+    WHERE location IS NOT NULL
+    ORDER BY id;
+""")
+
+
+def batch_settings():
+    conf = {"MAX_CELLS": 2_000_000, "CHUNK_USERS": 1_000, "MAX_API_USERS": 10_000}
+    conf.update(getattr(settings, "RECOMMENDER_BATCH", {}))
+    return conf
+
+
+# ---------------------------------------------------------
+# 🔹 Loading
+# ---------------------------------------------------------
+def iter_user_ids(engine=None):
+    """Stream the ids of every user with a location (server-side cursor)."""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=10_000).execute(ALL_USER_IDS_SQL)
+        for (user_id,) in result:
+            yield user_id
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(int(item))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _load_users(conn, user_ids):
+    locations = pd.read_sql(USER_LOCATIONS_SQL, conn, params={"ids": user_ids})
+    histories = pd.read_sql(USER_HISTORIES_SQL, conn, params={"ids": user_ids})
+    return locations, histories
+
+
+# ---------------------------------------------------------
+# 🔹 Batch scoring
+# ---------------------------------------------------------
+def _row_normalize(values):
+    """``normalize`` applied to every row of a 2-D array."""
+    lo = values.min(axis=1, keepdims=True)
+    hi = values.max(axis=1, keepdims=True)
+    span = hi - lo
+    return np.where(span == 0, 0.5, (values - lo) / np.where(span == 0, 1, span))
+
+
+def _history_matrices(cand, histories, user_rows, n_users):
+    """
+    ``service_match`` and ``user_worker_bookings`` as ``(n_users, n_cand)``
+    arrays, plus a per-user flag telling whether they have any history.
+    """
+    services, service_inv = np.unique(cand.service_id, return_inverse=True)
+    workers, worker_inv = np.unique(cand.worker_id, return_inverse=True)
+    booked_services = np.zeros((n_users, len(services)), dtype=bool)
+    worker_counts = np.zeros((n_users, len(workers)), dtype=np.int64)
+    has_history = np.zeros(n_users, dtype=bool)
+
+    if not histories.empty:
+        rows = user_rows[histories["user_id"].to_numpy()].to_numpy()
+        has_history[rows] = True
+
+        sid = histories["service_id"].to_numpy(dtype=np.float64)
+        pos = np.searchsorted(services, sid).clip(max=len(services) - 1)
+        hit = services[pos] == sid
+        booked_services[rows[hit], pos[hit]] = True
+
+        wid = histories["worker_id"].to_numpy()
+        pos = np.searchsorted(workers, wid).clip(max=len(workers) - 1)
+        hit = workers[pos] == wid
+        np.add.at(worker_counts, (rows[hit], pos[hit]), 1)
+
+    return booked_services[:, service_inv].astype(np.int64), worker_counts[:, worker_inv], has_history
+
+
+def score_batch(cand, lats, lons, histories, user_ids, model=None, feature_cols=None):
+    """
+    Score ``cand`` for every user in ``user_ids`` (with ``lats`` / ``lons``).
+    Returns a dict of ``(n_users, n_cand)`` feature arrays, matching what
+    ``score_candidates`` / ``score_candidates_with_model`` return per user.
+    """
+    n_users = len(user_ids)
+    user_rows = pd.Series(np.arange(n_users), index=user_ids)
+    distance_km = distance.distance_km(lats[:, None], lons[:, None], cand.points())
+    service_match, user_worker_bookings, has_history = _history_matrices(
+        cand, histories, user_rows, n_users
+    )
+    charge = _fill_charge(cand.charge)
+
+    if model is not None:
+        avg_rating = (
+            histories["worker_rating"].astype(float).fillna(0.0)
+            .groupby(histories["user_id"]).mean()
+            .reindex(user_ids).to_numpy()
+        )
+        columns = {
+            "worker_lat": np.tile(cand.worker_lat, n_users),
+            "worker_lon": np.tile(cand.worker_lon, n_users),
+            "charge": np.tile(np.nan_to_num(cand.charge, nan=0.0), n_users),
+            "num_bookings": np.tile(cand.num_bookings, n_users),
+            "distance_km": distance_km.ravel(),
+            "distance_km_scaled": distance_km.ravel() * 2,
+            "distance_bucket": distance_bucket(distance_km.ravel()),
+            "service_match": service_match.ravel(),
+            "worker_avg_rating": np.tile(cand.total_rating, n_users),
+            "worker_total_bookings": np.tile(cand.num_bookings, n_users),
+            "user_avg_rating": np.repeat(avg_rating, cand.size),
+        }
+        matrix = assemble_features(columns, feature_cols, n_users * cand.size)
+        score = model.predict(matrix).reshape(n_users, cand.size)
+    else:
+        is_new_user = ~has_history[:, None]
+        loc_rank = np.exp(-distance_km / 10)
+        num_bookings_rank = normalize(cand.num_bookings)
+        charge_rank = 1 - normalize(charge)
+        rating_rank = normalize(cand.total_rating)
+        user_worker_bookings_rank = _row_normalize(user_worker_bookings)
+
+        cold = loc_rank * 0.7 + rating_rank * 0.2 + charge_rank * 0.1
+        warm = (
+            loc_rank * 0.4 +
+            service_match * 0.2 +
+            num_bookings_rank * 0.15 +
+            user_worker_bookings_rank * 0.1 +
+            charge_rank * 0.05 +
+            rating_rank * 0.1
+        )
+        score = np.where(is_new_user, cold, warm)
+
+    return {
+        "charge": charge,
+        "distance_km": distance_km,
+        "user_worker_bookings": user_worker_bookings,
+        "service_match": service_match,
+        "final_rank_score": score,
+    }
+
+
+def _top_n(scores, top_n):
+    """
+    Row-wise indices of the ``top_n`` best scores, best first. Ties are broken
+    by position, exactly like the stable argsort of the single-user path.
+    """
+    n = scores.shape[1]
+    if top_n >= n:
+        return np.argsort(-scores, axis=1, kind="stable")
+    kth = -np.partition(-scores, top_n - 1, axis=1)[:, top_n - 1]
+    top = np.empty((scores.shape[0], top_n), dtype=np.intp)
+    for i, row in enumerate(scores):
+        idx = np.flatnonzero(row >= kth[i])  # the best top_n plus ties with the last one
+        top[i] = idx[np.argsort(-row[idx], kind="stable")[:top_n]]
+    return top
+
+
+# ---------------------------------------------------------
+# 🔹 Entry point
+# ---------------------------------------------------------
+def _candidate_groups(snapshot, lats, lons, retrieval):
+    """``(rows, positions)`` pairs: the users at ``positions`` all get the snapshot ``rows``."""
+    groups = {}
+    for i, (lat, lon) in enumerate(zip(lats, lons)):
+        rows = snapshot_rows(
+            snapshot, lat, lon,
+            k=retrieval["K"],
+            radius_km=retrieval["RADIUS_KM"],
+            max_radius_km=retrieval["MAX_RADIUS_KM"],
+            min_candidates=retrieval["MIN_CANDIDATES"],
+        )
+        groups.setdefault(rows.tobytes(), (rows, []))[1].append(i)
+    return [(rows, np.asarray(positions)) for rows, positions in groups.values()]
+
+
+def recommend_batch(user_ids, model=None, feature_cols=None, top_n=10, scorer=None,
+                    max_cells=None, engine=None):
+    """
+    Yield ``(user_id, recommendations)`` for every id in ``user_ids`` (any
+    iterable, consumed lazily). Users without a location or without
+    candidates get an empty list, as with ``recommend_top_n_for_user``.
+    """
+    if resolve_scorer(scorer) != "model" or not feature_cols:
+        model = None
+    engine = engine or get_engine()
+    conf = batch_settings()
+    max_cells = max_cells or conf["MAX_CELLS"]
+    retrieval = retrieval_settings()
+
+    snapshot = candidate_index.snapshot()
+
+    for chunk in _chunks(user_ids, conf["CHUNK_USERS"]):
+        with engine.connect() as conn:
+            locations, histories = _load_users(conn, chunk)
+        located = locations["id"].to_numpy()
+        lats, lons = locations["lat"].to_numpy(), locations["lon"].to_numpy()
+
+        results = {}
+        for rows, positions in _candidate_groups(snapshot, lats, lons, retrieval):
+            if rows.size == 0:
+                continue
+            cand = snapshot.take(rows)
+            step = max(1, max_cells // cand.size)
+            for start in range(0, len(positions), step):
+                part = positions[start:start + step]
+                ids = located[part]
+                features = score_batch(
+                    cand, lats[part], lons[part],
+                    histories[histories["user_id"].isin(ids)], ids, model, feature_cols,
+                )
+                top = _top_n(features["final_rank_score"], top_n)
+                for i, user_id in enumerate(ids.tolist()):
+                    user_features = {
+                        name: values[i] if values.ndim == 2 else values for name, values in features.items()
+                    }
+                    results[user_id] = _records(cand, user_features, top[i])
+
+        for user_id in chunk:
+            yield user_id, results.get(user_id, [])
+
+
+# ---------------------------------------------------------
+# 🔹 Output formats
+# ---------------------------------------------------------
+class _Echo:
+    """File-like object whose ``write`` just returns the value (for csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+def iter_jsonl(results):
+    for user_id, recommendations in results:
+        yield json.dumps({"user_id": user_id, "recommendations": recommendations}) + "\n"
+
+
+def iter_csv(results):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(["user_id", "rank", *RESULT_FIELDS])
+    for user_id, recommendations in results:
+        for rank, rec in enumerate(recommendations, start=1):
+            yield writer.writerow([user_id, rank, *(rec[name] for name in RESULT_FIELDS)])
+
+
+FORMATS = {
+    "jsonl": (iter_jsonl, "application/x-ndjson"),
+    "csv": (iter_csv, "text/csv"),
+}
@@ -0,0 +1,310 @@
+# core/candidates.py
+"""
+In-memory, column-oriented snapshot of recommendation candidates.
+
+One row per (worker, offered service) – the same shape the recommender used to
+get from its multi-join SQL on every request. The snapshot is loaded once per
+process, patched per worker when ``Worker`` / ``WorkerService`` / ``Booking``
+rows are saved (see ``core.signals``) and fully reloaded every
+``RECOMMENDER_CANDIDATE_TTL`` seconds so changes made by other processes are
+eventually picked up too.
+
+``retrieve_from_snapshot`` prunes the snapshot to the grid cells around the
+user (``core.geo_grid``) so only nearby rows are scored.
+
+``retrieve_nearest`` is the alternative, spatially pruned retrieval: it asks
+PostGIS for the K nearest available workers only (KNN ``<->`` ordering on the
+GiST index of ``workers.location``), so per-request work does not grow with
+the total worker count.
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from sqlalchemy import text
+
+from core import distance, geo_grid
+from core.db import get_engine
+
+CANDIDATE_COLUMNS = """
+    SELECT w.id AS worker_id,
+           wu.name AS worker_name,
+           s.id AS service_id,
+           s.service_type AS service_name,
+           ST_Y(w.location::geometry) AS worker_lat,
+           ST_X(w.location::geometry) AS worker_lon,
+           COALESCE(wf.completed_bookings, 0) AS num_bookings,
+           w.average_rating AS total_rating,
+           ws.charge,
+           w.is_available,
+           w.profile_image,
+           w.address
+"""
+
+CANDIDATE_JOINS = """
+    LEFT JOIN core_authenticateduser wu ON w.user_id = wu.id
+    LEFT JOIN worker_services ws ON w.id = ws.worker_id
+    LEFT JOIN core_service s ON ws.service_id = s.id
+    LEFT JOIN worker_features wf ON wf.worker_id = w.id
+"""
+
+CANDIDATE_SQL = (
+    CANDIDATE_COLUMNS
+    + "    FROM workers w\n"
+    + CANDIDATE_JOINS
+    + "    WHERE w.location IS NOT NULL {worker_filter}\n    ORDER BY w.id, s.id;\n"
+)
+
+# K nearest available workers (GiST index on workers.location drives the
+# ``<->`` ordering), optionally bounded by an ST_DWithin radius in metres and
+# restricted to workers offering one service.
+NEAREST_SQL = (
+    """
+    WITH nearest AS (
+        SELECT w.id
+        FROM workers w
+        WHERE w.is_available = TRUE
+          AND w.location IS NOT NULL {radius_filter} {service_filter}
+        ORDER BY w.location <-> ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography
+        LIMIT :k
+    )
+"""
+    + CANDIDATE_COLUMNS
+    + "    FROM nearest n\n    JOIN workers w ON w.id = n.id\n"
+    + CANDIDATE_JOINS
+    + "    {service_rows}\n    ORDER BY w.id, s.id;\n"
+)
+
+# Probes worker_svc_service_worker_idx (service_id, worker_id) per KNN row.
+SERVICE_FILTER = (
+    "AND EXISTS (SELECT 1 FROM worker_services sf "
+    "WHERE sf.service_id = :service_id AND sf.worker_id = w.id)"
+)
+
+# column name -> dtype; missing service ids are stored as -1, missing charges as NaN,
+# missing image paths / addresses as None
+COLUMNS = {
+    "worker_id": np.int64,
+    "worker_name": object,
+    "service_id": np.int64,
+    "service_name": object,
+    "worker_lat": np.float64,
+    "worker_lon": np.float64,
+    "num_bookings": np.int64,
+    "total_rating": np.float64,
+    "charge": np.float64,
+    "is_available": np.bool_,
+    "profile_image": object,
+    "address": object,
+}
+
+
+class CandidateSnapshot:
+    """
+    Immutable set of equally long NumPy columns (see ``COLUMNS``), plus the
+    worker coordinates prepared for ``core.distance`` (``PREPARED_COLUMNS``).
+    """
+
+    def __init__(self, columns):
+        if not all(name in columns for name in distance.PREPARED_COLUMNS):
+            columns = {**columns, **distance.prepare(columns["worker_lat"], columns["worker_lon"])}
+        self.columns = columns
+        self.size = len(columns["worker_id"])
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def empty(cls):
+        return cls({name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()})
+
+    @classmethod
+    def from_frame(cls, df):
+        df = df.copy()
+        df["service_id"] = df["service_id"].fillna(-1)
+        df["num_bookings"] = df["num_bookings"].fillna(0)
+        df["total_rating"] = df["total_rating"].fillna(0.0)
+        df["is_available"] = df["is_available"].fillna(False)
+        columns = {}
+        for name, dtype in COLUMNS.items():
+            values = df[name].to_numpy()
+            columns[name] = values.astype(dtype) if dtype is not object else values.astype(object)
+        return cls(columns)
+
+    def points(self):
+        """Worker coordinates as ``distance.PreparedPoints``."""
+        return distance.PreparedPoints(self.lat_rad, self.lon_rad, self.cos_lat)
+
+    def cell_index(self):
+        """``geo_grid.CellIndex`` over the rows' coordinates, built once per snapshot."""
+        if "_cells" not in self.__dict__:
+            self.__dict__["_cells"] = geo_grid.CellIndex(self.worker_lat, self.worker_lon)
+        return self.__dict__["_cells"]
+
+    def take(self, idx):
+        return CandidateSnapshot({name: col[idx] for name, col in self.columns.items()})
+
+    def replace_workers(self, worker_ids, fresh):
+        """Return a new snapshot with the rows of ``worker_ids`` swapped for ``fresh``."""
+        keep = ~np.isin(self.worker_id, np.asarray(list(worker_ids), dtype=np.int64))
+        merged = {
+            name: np.concatenate([col[keep], fresh.columns[name]])
+            for name, col in self.columns.items()
+        }
+        order = np.lexsort((merged["service_id"], merged["worker_id"]))
+        return CandidateSnapshot({name: col[order] for name, col in merged.items()})
+
+
+def load_candidates(engine=None, worker_ids=None):
+    """Run the candidate query, optionally restricted to ``worker_ids``."""
+    engine = engine or get_engine()
+    params = {}
+    worker_filter = ""
+    if worker_ids is not None:
+        worker_filter = "AND w.id = ANY(:ids)"
+        params["ids"] = [int(w) for w in worker_ids]
+    sql = CANDIDATE_SQL.format(worker_filter=worker_filter)
+    with engine.connect() as conn:
+        df = pd.read_sql(text(sql), conn, params=params)
+    return CandidateSnapshot.from_frame(df)
+
+
+def load_nearest_candidates(lat, lon, k, radius_km=None, engine=None, service_id=None):
+    """
+    Candidate rows of the ``k`` available workers closest to ``(lat, lon)``;
+    with ``service_id`` only workers offering it, one row each.
+    """
+    engine = engine or get_engine()
+    params = {"lat": lat, "lon": lon, "k": int(k)}
+    radius_filter = service_filter = service_rows = ""
+    if radius_km is not None:
+        radius_filter = (
+            "AND ST_DWithin(w.location, "
+            "ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography, :radius_m)"
+        )
+        params["radius_m"] = float(radius_km) * 1000.0
+    if service_id is not None:
+        service_filter = SERVICE_FILTER
+        service_rows = "WHERE ws.service_id = :service_id"
+        params["service_id"] = int(service_id)
+    sql = NEAREST_SQL.format(radius_filter=radius_filter, service_filter=service_filter, service_rows=service_rows)
+    with engine.connect() as conn:
+        df = pd.read_sql(text(sql), conn, params=params)
+    return CandidateSnapshot.from_frame(df)
+
+
+def _enough(worker_ids, min_candidates, k):
+    # A KNN query returns at most k workers, so more than k can never be asked for.
+    return len(np.unique(worker_ids)) >= min(min_candidates, k)
+
+
+def retrieve_nearest(lat, lon, k=200, radius_km=5, max_radius_km=80, min_candidates=20, engine=None,
+                     service_id=None):
+    """
+    KNN retrieval with adaptive radius: start with ``radius_km`` and double it
+    until at least ``min(min_candidates, k)`` workers are found or
+    ``max_radius_km`` is exceeded, then fall back to a plain (unbounded) KNN
+    query.
+    """
+    radius = radius_km
+    while radius and radius <= max_radius_km:
+        cand = load_nearest_candidates(lat, lon, k, radius, engine, service_id)
+        if _enough(cand.worker_id, min_candidates, k):
+            return cand
+        radius *= 2
+    return load_nearest_candidates(lat, lon, k, None, engine, service_id)
+
+
+def snapshot_rows(snapshot, lat, lon, k=200, radius_km=5, max_radius_km=80, min_candidates=20,
+                  service_id=None):
+    """
+    Indices of the available snapshot rows (of ``service_id`` only, if given)
+    in the grid cells around ``(lat, lon)``, with the same adaptive radius and
+    threshold as ``retrieve_nearest``; every such row if even
+    ``max_radius_km`` finds too few workers.
+    """
+    wanted = snapshot.is_available
+    if service_id is not None:
+        wanted = wanted & (snapshot.service_id == service_id)
+    cells = snapshot.cell_index()
+    radius = radius_km
+    while radius and radius <= max_radius_km:
+        rows = cells.rows_near(lat, lon, radius)
+        rows = rows[wanted[rows]]
+        if _enough(snapshot.worker_id[rows], min_candidates, k):
+            return rows
+        radius *= 2
+    return np.flatnonzero(wanted)
+
+
+def retrieve_from_snapshot(snapshot, lat, lon, k=200, radius_km=5, max_radius_km=80, min_candidates=20,
+                           service_id=None):
+    """The ``snapshot_rows`` of ``(lat, lon)`` as a snapshot of their own."""
+    return snapshot.take(
+        snapshot_rows(snapshot, lat, lon, k, radius_km, max_radius_km, min_candidates, service_id)
+    )
+
+
+class CandidateIndex:
+    """Process-wide holder of the current ``CandidateSnapshot``."""
+
+    def __init__(self, loader=load_candidates):
+        self._loader = loader
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._dirty = set()
+        self._lock = threading.Lock()  # held for a whole (re)load
+        self._dirty_lock = threading.Lock()  # guards _dirty only, so marking never waits for a load
+
+    @property
+    def ttl(self):
+        return getattr(settings, "RECOMMENDER_CANDIDATE_TTL", 300)
+
+    def _take_dirty(self):
+        with self._dirty_lock:
+            worker_ids, self._dirty = self._dirty, set()
+        return worker_ids
+
+    def snapshot(self):
+        """Return the current snapshot, (re)loading or patching it if needed."""
+        snap = self._snapshot
+        stale = snap is None or (self.ttl and time.monotonic() - self._loaded_at > self.ttl)
+        if not stale and not self._dirty:
+            return snap
+
+        with self._lock:
+            if self._snapshot is None or (self.ttl and time.monotonic() - self._loaded_at > self.ttl):
+                # Workers marked while the load runs stay queued for the next call.
+                self._take_dirty()
+                self._snapshot = self._loader()
+                self._loaded_at = time.monotonic()
+            else:
+                worker_ids = self._take_dirty()
+                if worker_ids:
+                    fresh = self._loader(worker_ids=worker_ids)
+                    self._snapshot = self._snapshot.replace_workers(worker_ids, fresh)
+            return self._snapshot
+
+    def mark_dirty(self, *worker_ids):
+        """Queue workers whose rows must be re-read before the next recommendation."""
+        ids = {int(w) for w in worker_ids if w is not None}
+        if ids:
+            with self._dirty_lock:
+                self._dirty |= ids
+
+    def invalidate(self):
+        """Drop the snapshot; the next call to ``snapshot()`` reloads everything."""
+        with self._lock:
+            self._snapshot = None
+            self._take_dirty()
+
+
+candidate_index = CandidateIndex()
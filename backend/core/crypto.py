@@ -0,0 +1,249 @@
+# core/crypto.py
+"""
+Hybrid payload encryption shared by the API views.
+
+Clients encrypt every sensitive field with AES-CBC (IV prepended, base64).
+The AES key reaches the server in one of two ways:
+
+* per request: ``{"key": RSA-OAEP(aes_key), "data": {...}}``. Each request
+  pays for one RSA private-key decryption, the most CPU-expensive step of
+  login, signup or a booking;
+* per session: the client sends ``RSA-OAEP(aes_key)`` once to
+  ``POST /api/crypto/session-key/`` and gets back a key id. Later payloads
+  send ``{"kid": ..., "data": {...}}`` and need only AES.
+
+Session keys live in the Django session (``SESSION_FIELD``), so they are
+bound to its cookie. ``login()`` keeps them and ``logout()`` drops them.
+Each key expires ``CRYPTO_SESSION_KEYS['TTL']`` seconds after it was
+established. At most ``MAX_KEYS`` are kept: establishing a new key rotates
+out the oldest while requests in flight can still use the previous one.
+The exchange response says when the client should rotate
+(``rotate_after``).
+
+``decrypt_envelope`` turns either form into the plain fields. The API
+views do not call it themselves: ``core.parsers`` runs it once, while DRF
+parses the request. Async views use ``core.crypto_pool``, which runs the RSA
+step (``decrypt_with_rsa_key``) on a bounded worker pool.
+"""
+import base64
+import functools
+import json
+import os
+import secrets
+import time
+
+from Crypto.Cipher import AES, PKCS1_OAEP
+from Crypto.PublicKey import RSA
+from Crypto.Util.Padding import unpad
+from Crypto.Util.strxor import strxor
+from django.conf import settings
+
+SESSION_FIELD = "crypto_keys"
+AES_KEY_SIZES = (16, 24, 32)
+
+DEFAULTS = {
+    "TTL": 3600,
+    "ROTATE_AFTER": 1800,
+    "MAX_KEYS": 2,
+}
+
+
+
+class EnvelopeError(ValueError):
+    """An encrypted payload that cannot be decrypted. The message is safe to return to the client."""
+
+
+# Load RSA private key securely (store private.pem safely on your server)
+PRIVATE_KEY_PATH = os.path.join(settings.BASE_DIR, 'private.pem')
+with open(PRIVATE_KEY_PATH, 'rb') as key_file:
+    PRIVATE_KEY = RSA.import_key(key_file.read())
+
+
+def session_key_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, "CRYPTO_SESSION_KEYS", {}))
+    return conf
+
+
+# ---------------------------------------------------------
+# 🔹 Primitives
+# ---------------------------------------------------------
+def decrypt_rsa(encrypted_b64):
+    try:
+        encrypted_data = base64.b64decode(encrypted_b64)
+        cipher_rsa = PKCS1_OAEP.new(PRIVATE_KEY)
+        decrypted = cipher_rsa.decrypt(encrypted_data)
+        return decrypted  # bytes representing AES key
+    except Exception:
+        return None
+
+
+def decrypt_aes(encrypted_b64, aes_key):
+    try:
+        encrypted_data = base64.b64decode(encrypted_b64)
+        iv = encrypted_data[:16]
+        ciphertext = encrypted_data[16:]
+        cipher_aes = AES.new(aes_key, AES.MODE_CBC, iv)
+        decrypted_data = unpad(cipher_aes.decrypt(ciphertext), AES.block_size)
+        return decrypted_data.decode('utf-8')
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=128)
+def _block_cipher(aes_key):
+    # ECB is the raw block cipher: it keeps no IV state, so one object per key can be reused
+    return AES.new(aes_key, AES.MODE_ECB)
+
+
+def decrypt_fields(fields, aes_key):
+    """
+    Decrypt ``fields`` (name -> base64(IV + AES-CBC ciphertext)) in one pass.
+
+    Each value is base64-decoded once. The blobs are joined and the whole
+    buffer goes through a single ECB decryption, using a cipher cached per
+    key. CBC is then undone for every block at once: each plaintext block is
+    its decrypted block XOR the block before it. For a field's first block
+    that is its own IV. The blocks that come from the other fields' IVs are
+    skipped. Returns ``(plain, failed)``, where ``plain`` maps name -> str
+    and ``failed`` lists the names that could not be decrypted.
+    """
+    plain, failed, names, blobs = {}, [], [], []
+    for name, value in fields.items():
+        try:
+            blob = base64.b64decode(value)
+        except (TypeError, ValueError):
+            failed.append(name)
+            continue
+        if len(blob) < 2 * AES.block_size or len(blob) % AES.block_size:
+            failed.append(name)
+            continue
+        names.append(name)
+        blobs.append(blob)
+    if not blobs:
+        return plain, failed
+
+    buffer = b"".join(blobs)
+    decrypted = strxor(_block_cipher(aes_key).decrypt(buffer[AES.block_size:]), buffer[:-AES.block_size])
+    start = 0
+    for name, blob in zip(names, blobs):
+        try:
+            text = unpad(decrypted[start:start + len(blob) - AES.block_size], AES.block_size)
+            plain[name] = text.decode("utf-8")
+        except ValueError:
+            failed.append(name)
+        start += len(blob)
+    return plain, failed
+
+
+# ---------------------------------------------------------
+# 🔹 Session keys
+# ---------------------------------------------------------
+def _live_keys(session, now):
+    keys = session.get(SESSION_FIELD) or {}
+    return {kid: entry for kid, entry in keys.items() if entry["expires"] > now}
+
+
+def establish_session_key(session, encrypted_key_b64):
+    """
+    RSA-decrypt the client's AES key once and store it in ``session``.
+    Returns ``{"kid", "expires_in", "rotate_after"}`` or None for an invalid key.
+    """
+    aes_key = decrypt_rsa(encrypted_key_b64)
+    if not aes_key or len(aes_key) not in AES_KEY_SIZES:
+        return None
+
+    conf = session_key_settings()
+    now = time.time()
+    keys = _live_keys(session, now)
+    kid = secrets.token_urlsafe(12)
+    keys[kid] = {
+        "key": base64.b64encode(aes_key).decode("ascii"),
+        "created": now,
+        "expires": now + conf["TTL"],
+    }
+    newest = sorted(keys, key=lambda k: keys[k]["created"])[-conf["MAX_KEYS"]:]
+    session[SESSION_FIELD] = {k: keys[k] for k in newest}
+    return {"kid": kid, "expires_in": conf["TTL"], "rotate_after": min(conf["ROTATE_AFTER"], conf["TTL"])}
+
+
+def _entry_key(entry):
+    if not entry or entry["expires"] <= time.time():
+        return None
+    return base64.b64decode(entry["key"])
+
+
+def session_key(session, kid):
+    """AES key bytes for ``kid`` in ``session``, or None if unknown or expired."""
+    return _entry_key((session.get(SESSION_FIELD) or {}).get(kid))
+
+
+async def asession_key(session, kid):
+    return _entry_key((await session.aget(SESSION_FIELD) or {}).get(kid))
+
+
+def drop_session_keys(session):
+    session.pop(SESSION_FIELD, None)
+
+
+def resolve_aes_key(request, payload):
+    """
+    The AES key of an encrypted ``payload``: from the session for ``{"kid": ...}``,
+    by RSA decryption for ``{"key": ...}``. None if neither yields a key.
+    """
+    kid = payload.get("kid")
+    if kid:
+        return session_key(request.session, kid)
+    key_enc = payload.get("key")
+    return decrypt_rsa(key_enc) if key_enc else None
+
+
+def has_key_reference(payload):
+    return bool(payload.get("kid") or payload.get("key"))
+
+
+# ---------------------------------------------------------
+# 🔹 Envelope
+# ---------------------------------------------------------
+def envelope_fields(payload):
+    """
+    Encrypted ``data`` of ``{"key" | "kid": ..., "data": {name: encrypted}}``
+    with the empty values left out. ``data`` may also arrive as a JSON string,
+    as it does in multipart forms. Raises ``EnvelopeError`` with the message
+    for the client.
+    """
+    if not hasattr(payload, "get"):
+        raise EnvelopeError("Missing encryption data.")
+    data = payload.get("data")
+    if not has_key_reference(payload) or not data:
+        raise EnvelopeError("Missing encryption data.")
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            raise EnvelopeError("Data must be a JSON object.")
+    if not isinstance(data, dict):
+        raise EnvelopeError("Data must be a JSON object.")
+    # empty values count as absent fields, as they did in the views
+    return {name: value for name, value in data.items() if value}
+
+
+def plain_fields(fields, aes_key):
+    """``decrypt_fields`` that raises ``EnvelopeError`` for a bad key or any field that fails."""
+    if not aes_key or len(aes_key) not in AES_KEY_SIZES:
+        raise EnvelopeError("Invalid encrypted key.")
+    plain, failed = decrypt_fields(fields, aes_key)
+    if failed:
+        raise EnvelopeError(f"Failed to decrypt {failed[0]}.")
+    return plain
+
+
+def decrypt_with_rsa_key(encrypted_key_b64, fields):
+    """RSA-unwrap the AES key and decrypt ``fields`` with it: the whole job one pool task runs."""
+    return plain_fields(fields, decrypt_rsa(encrypted_key_b64))
+
+
+def decrypt_envelope(request, payload):
+    """Plain fields of an encrypted payload (see ``envelope_fields``)."""
+    fields = envelope_fields(payload)
+    return plain_fields(fields, resolve_aes_key(request, payload))
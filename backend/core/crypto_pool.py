@@ -0,0 +1,192 @@
+# core/crypto_pool.py
+"""
+Bounded worker pool for RSA private-key work in async views.
+
+An RSA-OAEP decryption takes a few milliseconds of CPU. Done inline in an
+``async def`` view, it stalls the event loop and every request that loop
+serves. ``CryptoPool.run`` hands the job to an executor and awaits it, so
+the loop keeps serving other requests:
+
+* ``KIND = "thread"`` (default): the modular exponentiation runs in GMP with
+  the GIL released, so the threads do decrypt in parallel;
+* ``KIND = "process"``: spawned worker processes, each importing
+  ``core.crypto`` (and so the private key) once. This adds pickling
+  overhead per job but no GIL contention with the rest of the app.
+
+At most ``MAX_PENDING`` jobs may be queued or running. Past that, ``run``
+raises ``CryptoPoolBusy`` straight away, and the views answer 503, rather
+than queueing logins behind a backlog. ``stats()`` reports the queue depth
+and the execution and wait times, for ``GET /api/crypto/pool/stats/``.
+
+``decrypt_envelope_async`` is the async counterpart of
+``core.crypto.decrypt_envelope``. Only an RSA-wrapped key goes to the pool.
+A session key (``kid``) needs only AES, which costs less than handing the
+job to the pool, so it runs inline.
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+
+from core import crypto
+from core.middleware import record_timing
+
+KINDS = ("thread", "process")
+
+DEFAULTS = {
+    "KIND": "thread",
+    "WORKERS": 4,
+    "MAX_PENDING": 64,
+}
+
+
+class CryptoPoolBusy(Exception):
+    """The pool already has ``MAX_PENDING`` jobs queued or running."""
+
+
+def pool_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, "CRYPTO_POOL", {}))
+    if conf["KIND"] not in KINDS:
+        raise ValueError(f"Unknown crypto pool kind '{conf['KIND']}'. Choose one of: {', '.join(KINDS)}.")
+    return conf
+
+
+def _timed(fn, *args):
+    # Runs in the worker. It measures execution time only, so the caller can derive the wait.
+    # Exceptions are returned, not raised, so failed jobs are timed too.
+    start = time.perf_counter()
+    try:
+        result, error = fn(*args), None
+    except Exception as e:
+        result, error = None, e
+    return result, error, time.perf_counter() - start
+
+
+# ---------------------------------------------------------
+# 🔹 Pool
+# ---------------------------------------------------------
+class CryptoPool:
+    def __init__(self, kind="thread", workers=4, max_pending=64):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.reset_stats()
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crypto")
+        return self._executor
+
+    async def run(self, fn, *args):
+        """Result of ``fn(*args)`` computed on the pool (``fn`` must be picklable for processes)."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise CryptoPoolBusy()
+            self._pending += 1
+            self._submitted += 1
+            executor = self._get_executor()
+
+        start = time.perf_counter()
+        try:
+            future = executor.submit(_timed, fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # Released when the job itself ends: a cancelled caller leaves a started job running.
+        future.add_done_callback(self._release)
+        result, error, elapsed = await asyncio.wrap_future(future)
+        total = time.perf_counter() - start
+
+        with self._lock:
+            self._completed += 1
+            self._failed += error is not None
+            self._exec_total += elapsed
+            self._exec_max = max(self._exec_max, elapsed)
+            wait = max(total - elapsed, 0.0)
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        if error is not None:
+            raise error
+        return result
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self):
+        with self._lock:
+            done = self._completed
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "queued": max(self._pending - self.workers, 0),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_exec_ms": self._exec_total / done * 1000 if done else 0.0,
+                "max_exec_ms": self._exec_max * 1000,
+                "avg_wait_ms": self._wait_total / done * 1000 if done else 0.0,
+                "max_wait_ms": self._wait_max * 1000,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._submitted = self._completed = self._failed = self._rejected = 0
+            self._exec_total = self._exec_max = 0.0
+            self._wait_total = self._wait_max = 0.0
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide pool, created from ``settings.CRYPTO_POOL`` on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            conf = pool_settings()
+            _pool = CryptoPool(conf["KIND"], conf["WORKERS"], conf["MAX_PENDING"])
+        return _pool
+
+
+# ---------------------------------------------------------
+# 🔹 Envelope
+# ---------------------------------------------------------
+async def decrypt_envelope_async(request, payload):
+    """
+    ``core.crypto.decrypt_envelope`` for async views. Raises ``EnvelopeError``
+    for a bad payload and ``CryptoPoolBusy`` when the pool is full. The
+    ``decrypt`` Server-Timing phase includes the wait for a pool worker.
+    """
+    start = time.perf_counter()
+    try:
+        fields = crypto.envelope_fields(payload)
+        kid = payload.get("kid")
+        if kid:
+            return crypto.plain_fields(fields, await crypto.asession_key(request.session, kid))
+        return await get_pool().run(crypto.decrypt_with_rsa_key, payload.get("key"), fields)
+    finally:
+        record_timing(request, "decrypt", time.perf_counter() - start)
@@ -1,13 +1,53 @@
 # backend/core/data_prep.py
 import pandas as pd
 
+from core.db import get_engine
+
 FEATURE_COLS = [
     "worker_lat", "worker_lon", "charge", "num_bookings",
     "distance_km", "distance_bucket", "service_match",
     "worker_avg_rating", "worker_total_bookings", "user_avg_rating"
 ]
 
-def load_df(engine):
+# Interactions joined with the user's location (rows without either location are
+# dropped, as train_model does), ordered by user so query groups are contiguous.
+TRAINING_SQL = """
+SELECT
+    d.user_id,
+    d.worker_id,
+    d.service_id,
+    ST_Y(d.worker_location::geometry) AS worker_lat,
+    ST_X(d.worker_location::geometry) AS worker_lon,
+    d.charge,
+    d.num_bookings,
+    d.total_rating,
+    ST_Y(u.location::geometry) AS lat_user,
+    ST_X(u.location::geometry) AS lon_user,
+    COALESCE(wf.completed_bookings, 0) AS worker_total_bookings,
+    CASE WHEN wf.review_count > 0 THEN wf.rating_sum / wf.review_count ELSE 0 END AS worker_avg_rating
+FROM user_worker_data d
+JOIN core_authenticateduser u ON u.id = d.user_id AND u.location IS NOT NULL
+LEFT JOIN worker_features wf ON wf.worker_id = d.worker_id
+WHERE d.worker_location IS NOT NULL
+ORDER BY d.user_id;
+"""
+
+
+def _fill_missing(df):
+    df["num_bookings"] = df["num_bookings"].fillna(0).astype(int)
+    df["total_rating"] = pd.to_numeric(df["total_rating"], errors="coerce").fillna(0.0)
+    df["charge"] = df["charge"].fillna(0)
+    return df
+
+
+def load_df(engine=None, chunksize=None):
+    """
+    The whole ``user_worker_data`` table, or with ``chunksize`` an iterator of
+    DataFrames read through a server-side cursor.
+    """
+    if engine is None:
+        engine = get_engine()
+
     query = """
     SELECT 
         user_id,
@@ -20,20 +60,39 @@ def load_df(engine):
         total_rating
     FROM user_worker_data;
     """
-    df = pd.read_sql(query, engine)
-    
-    # Fill missing values as needed
-    df["num_bookings"] = df["num_bookings"].fillna(0).astype(int)
-    df["total_rating"] = df["total_rating"].fillna(0.0)
-    df["charge"] = df["charge"].fillna(0)
-    
-    return df
+    if chunksize:
+        return iter_chunks(query, engine, chunksize)
+    return _fill_missing(pd.read_sql(query, engine))
 
-def worker_stats(df):
-    return df.groupby('worker_id').agg(
-        worker_avg_rating=('total_rating', 'mean'),
-        worker_total_bookings=('num_bookings', 'sum')
-    ).reset_index()
+
+def iter_chunks(query, engine=None, chunksize=50_000):
+    """Stream ``query`` as DataFrames of at most ``chunksize`` rows."""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=chunksize)
+        for chunk in pd.read_sql(query, conn, chunksize=chunksize):
+            yield _fill_missing(chunk)
+
+
+def iter_training_chunks(engine=None, chunksize=50_000):
+    """``TRAINING_SQL`` in chunks; bounded memory however large the table grows."""
+    return iter_chunks(TRAINING_SQL, engine, chunksize)
+
+# Per-worker features precomputed by core.feature_store (the values the recommender serves).
+WORKER_FEATURES_SQL = """
+SELECT worker_id,
+       CASE WHEN review_count > 0 THEN rating_sum / review_count ELSE 0 END AS worker_avg_rating,
+       completed_bookings AS worker_total_bookings
+FROM worker_features;
+"""
+
+
+def worker_stats(df=None, engine=None):
+    """Feature-store worker aggregates, restricted to ``df``'s workers when given."""
+    stats = pd.read_sql(WORKER_FEATURES_SQL, engine or get_engine())
+    if df is not None:
+        stats = stats[stats["worker_id"].isin(df["worker_id"].unique())]
+    return stats.reset_index(drop=True)
 
 
 def user_stats(df):
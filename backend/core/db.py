@@ -0,0 +1,180 @@
+# core/db.py
+"""
+Process-wide SQLAlchemy engines for the pandas / ML code paths.
+
+``pd.read_sql`` cannot use Django's connections, so the recommender,
+``data_prep.load_df`` and the ``train_model`` command share one lazily created
+engine (and connection pool) per process instead of calling ``create_engine``
+on every request.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+POOL_DEFAULTS = {
+    "POOL_SIZE": 5,
+    "MAX_OVERFLOW": 10,
+    "POOL_TIMEOUT": 30,
+    "POOL_RECYCLE": 1800,
+    "SLOW_CHECKOUT_MS": 50,
+    "LISTENERS": [],
+}
+
+_engines = {}
+_lock = threading.Lock()
+_listeners = []
+_settings_listeners_loaded = False
+
+
+# ---------------------------------------------------------
+# 🔹 Instrumentation
+# ---------------------------------------------------------
+def pool_settings():
+    """Merge ``settings.RECOMMENDER_DB_POOL`` over the defaults."""
+    conf = dict(POOL_DEFAULTS)
+    conf.update(getattr(settings, "RECOMMENDER_DB_POOL", {}))
+    return conf
+
+
+def register_pool_listener(callback):
+    """
+    Register ``callback(event, alias, wait_seconds, pool)``.
+
+    ``event`` is ``"checkout"`` for every connection handed out and
+    ``"exhausted"`` when a checkout timed out because the pool and its
+    overflow were all in use.
+    """
+    if callback not in _listeners:
+        _listeners.append(callback)
+    return callback
+
+
+def unregister_pool_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def _load_settings_listeners():
+    global _settings_listeners_loaded
+    if _settings_listeners_loaded:
+        return
+    for path in pool_settings()["LISTENERS"]:
+        register_pool_listener(import_string(path))
+    _settings_listeners_loaded = True
+
+
+def _notify(event, alias, wait, pool):
+    for callback in list(_listeners):
+        try:
+            callback(event, alias, wait, pool)
+        except Exception:
+            logger.exception("Pool listener %r failed", callback)
+
+
+@register_pool_listener
+def log_slow_checkouts(event, alias, wait, pool):
+    """Default listener: warn on slow checkouts and on exhaustion."""
+    if event == "exhausted":
+        logger.error(
+            "DB pool '%s' exhausted after %.1f ms (%s)", alias, wait * 1000, pool.status()
+        )
+    elif wait * 1000 >= pool_settings()["SLOW_CHECKOUT_MS"]:
+        logger.warning(
+            "Slow DB pool checkout on '%s': %.1f ms (%s)", alias, wait * 1000, pool.status()
+        )
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited."""
+
+    alias = "default"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            _notify("exhausted", self.alias, time.perf_counter() - start, self)
+            raise
+        _notify("checkout", self.alias, time.perf_counter() - start, self)
+        return conn
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.alias = self.alias
+        return pool
+
+
+# ---------------------------------------------------------
+# 🔹 Engine registry
+# ---------------------------------------------------------
+def _database_url(alias):
+    db = settings.DATABASES[alias]
+    return URL.create(
+        "postgresql+psycopg2",
+        username=db.get("USER") or None,
+        password=db.get("PASSWORD") or None,
+        host=db.get("HOST") or None,
+        port=int(db["PORT"]) if db.get("PORT") else None,
+        database=db.get("NAME"),
+    )
+
+
+def _build_engine(alias):
+    conf = pool_settings()
+    engine = create_engine(
+        _database_url(alias),
+        poolclass=InstrumentedQueuePool,
+        pool_size=conf["POOL_SIZE"],
+        max_overflow=conf["MAX_OVERFLOW"],
+        pool_timeout=conf["POOL_TIMEOUT"],
+        pool_recycle=conf["POOL_RECYCLE"],
+        pool_pre_ping=True,
+    )
+    engine.pool.alias = alias
+    return engine
+
+
+def get_engine(alias="default"):
+    """Return the shared engine for ``alias``, creating it on first use."""
+    engine = _engines.get(alias)
+    if engine is not None:
+        return engine
+    with _lock:
+        engine = _engines.get(alias)
+        if engine is None:
+            _load_settings_listeners()
+            engine = _engines[alias] = _build_engine(alias)
+    return engine
+
+
+def dispose_engines():
+    """Close every pooled connection (e.g. at shutdown or in tests)."""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+def _reset_after_fork():
+    # Connections inherited from the parent must never be used (or closed) by
+    # the child: drop them without touching the sockets and rebuild lazily.
+    global _lock
+    _lock = threading.Lock()
+    for engine in _engines.values():
+        engine.dispose(close=False)
+    _engines.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
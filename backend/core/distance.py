@@ -0,0 +1,150 @@
+# core/distance.py
+"""
+Great-circle distance kernels over prepared coordinates.
+
+``core.utils.haversine_vector`` converts both sides to radians and takes
+``cos`` of every worker latitude on every call. Each step allocates a new
+temporary array. Worker coordinates change far less often than they are
+scored, so:
+
+* ``prepare(lat, lon)`` converts them once to radians and ``cos(lat)``. The
+  candidate snapshot stores these as extra columns (``PREPARED_COLUMNS``),
+  so they are patched and sliced together with the rows they belong to.
+* ``haversine_km`` / ``equirectangular_km`` compute everything with in-place
+  ``out=`` ufuncs. They use the result array plus one per-thread scratch
+  buffer that is reused across calls. The only allocation per call is the
+  result, and the caller can pass that in too.
+* ``equirectangular_km`` is the flat-earth approximation. Its relative error
+  stays below ~0.1 % up to a few hundred km away from the poles, and it needs
+  no ``sin`` / ``arcsin``. ``RECOMMENDER_DISTANCE = "equirectangular"``
+  selects it for scoring, where candidates are already limited to nearby
+  workers.
+
+The query side (``lat``, ``lon`` in degrees) may be a scalar or any array
+that broadcasts against the prepared points, e.g. ``(n_users, 1)`` against
+``(n_candidates,)`` in the batch recommender.
+"""
+import threading
+
+import numpy as np
+from django.conf import settings
+
+EARTH_RADIUS_KM = 6371.0
+METHODS = ("haversine", "equirectangular")
+PREPARED_COLUMNS = ("lat_rad", "lon_rad", "cos_lat")
+
+_local = threading.local()
+
+
+class PreparedPoints:
+    """Coordinates in radians plus ``cos(lat)`` (read-only views, no copies)."""
+
+    __slots__ = ("lat_rad", "lon_rad", "cos_lat")
+
+    def __init__(self, lat_rad, lon_rad, cos_lat):
+        self.lat_rad = lat_rad
+        self.lon_rad = lon_rad
+        self.cos_lat = cos_lat
+
+    def __len__(self):
+        return len(self.lat_rad)
+
+
+def prepare(lat, lon):
+    """``{"lat_rad", "lon_rad", "cos_lat"}`` columns for degree coordinates."""
+    lat_rad = np.radians(np.asarray(lat, dtype=np.float64))
+    return {
+        "lat_rad": lat_rad,
+        "lon_rad": np.radians(np.asarray(lon, dtype=np.float64)),
+        "cos_lat": np.cos(lat_rad),
+    }
+
+
+def prepared_points(lat, lon):
+    return PreparedPoints(**prepare(lat, lon))
+
+
+def _buffers(lat, lon, points, out):
+    """Result array (``out`` or new) and a per-thread scratch array of the broadcast shape."""
+    shape = np.broadcast_shapes(np.shape(lat), np.shape(lon), points.lat_rad.shape)
+    if out is None:
+        out = np.empty(shape, dtype=np.float64)
+    elif out.shape != shape:
+        raise ValueError(f"out has shape {out.shape}, expected {shape}")
+
+    size = out.size
+    scratch = getattr(_local, "scratch", None)
+    if scratch is None or scratch.size < size:
+        scratch = _local.scratch = np.empty(size, dtype=np.float64)
+    return out, scratch[:size].reshape(shape)
+
+
+def haversine_km(lat, lon, points, out=None):
+    """Haversine distance in km from (``lat``, ``lon``) degrees to every prepared point."""
+    out, work = _buffers(lat, lon, points, out)
+    lat0 = np.radians(lat)
+    lon0 = np.radians(lon)
+
+    # out = sin²(Δlat / 2)
+    np.subtract(points.lat_rad, lat0, out=out)
+    out *= 0.5
+    np.sin(out, out=out)
+    np.square(out, out=out)
+
+    # work = cos(lat0) · cos(lat) · sin²(Δlon / 2)
+    np.subtract(points.lon_rad, lon0, out=work)
+    work *= 0.5
+    np.sin(work, out=work)
+    np.square(work, out=work)
+    work *= points.cos_lat
+    work *= np.cos(lat0)
+
+    out += work
+    np.minimum(out, 1.0, out=out)
+    np.sqrt(out, out=out)
+    np.arcsin(out, out=out)
+    out *= 2.0 * EARTH_RADIUS_KM
+    return out
+
+
+def equirectangular_km(lat, lon, points, out=None):
+    """
+    Equirectangular approximation in km: ``R · sqrt((Δlon · cos φm)² + Δlat²)``.
+    ``cos φm`` is taken as the mean of both cosines, so it needs no extra
+    ``cos``. Δlon is wrapped into [-π, π).
+    """
+    out, work = _buffers(lat, lon, points, out)
+    lat0 = np.radians(lat)
+    lon0 = np.radians(lon)
+
+    # work = wrapped Δlon · (cos(lat0) + cos(lat)) / 2
+    np.subtract(points.lon_rad, lon0, out=work)
+    if work.size and (work.min() < -np.pi or work.max() >= np.pi):  # only across the antimeridian
+        work += np.pi
+        np.remainder(work, 2.0 * np.pi, out=work)
+        work -= np.pi
+    np.add(points.cos_lat, np.cos(lat0), out=out)
+    work *= out
+    work *= 0.5
+    np.square(work, out=work)
+
+    np.subtract(points.lat_rad, lat0, out=out)
+    np.square(out, out=out)
+    out += work
+    np.sqrt(out, out=out)
+    out *= EARTH_RADIUS_KM
+    return out
+
+
+def distance_method():
+    method = getattr(settings, "RECOMMENDER_DISTANCE", "haversine")
+    if method not in METHODS:
+        raise ValueError(f"Unknown distance method '{method}'. Choose one of: {', '.join(METHODS)}.")
+    return method
+
+
+def distance_km(lat, lon, points, method=None, out=None):
+    """Distance with ``method`` (default ``settings.RECOMMENDER_DISTANCE``)."""
+    if (method or distance_method()) == "equirectangular":
+        return equirectangular_km(lat, lon, points, out)
+    return haversine_km(lat, lon, points, out)
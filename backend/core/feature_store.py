@@ -0,0 +1,148 @@
+# core/feature_store.py
+"""
+Incrementally maintained per-worker / per-user aggregates.
+
+``WorkerFeatures`` and ``UserFeatures`` hold running counts and sums. Every
+booking or review change applies the difference between the row's old and
+new contribution with one ``UPDATE ... SET x = x + delta`` (``F()``), so an
+event costs O(1) however many bookings a worker has. Readers get precomputed
+values by primary key:
+
+* the recommender's candidate SQL joins ``worker_features`` for
+  ``num_bookings``;
+* ``Worker.update_average_rating`` and ``update_worker_data`` read the running
+  review sums instead of aggregating reviews / bookings;
+* ``train_model`` reads ``worker_avg_rating`` / ``worker_total_bookings`` from
+  the same table, so training and serving see the same values.
+
+Decrements stop at zero. A count that has drifted (rows changed with
+``update()`` or raw SQL, which fire no signals) must never make the
+user-facing write that triggered it fail on a CHECK constraint.
+``rebuild()`` (``manage.py rebuild_feature_store``) recomputes everything from
+the source tables, for the initial backfill or to repair drift.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.models import UserFeatures, WorkerFeatures
+
+COMPLETED = "completed"
+
+
+# ---------------------------------------------------------
+# 🔹 Deltas
+# ---------------------------------------------------------
+def _added(model, field, delta):
+    if delta > 0:
+        return F(field) + delta
+    return Greatest(F(field) + delta, Value(0), output_field=model._meta.get_field(field))
+
+
+def _apply(model, pk, **deltas):
+    """Add ``deltas`` to the feature row ``pk``; the row is created on the first positive delta."""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if pk is None or not deltas:
+        return
+    changes = {field: _added(model, field, delta) for field, delta in deltas.items()}
+    if model.objects.filter(pk=pk).update(updated_at=timezone.now(), **changes):
+        return
+    if all(delta < 0 for delta in deltas.values()):
+        return  # nothing to subtract from (e.g. the owner is being deleted)
+    with transaction.atomic():
+        model.objects.get_or_create(pk=pk)
+        model.objects.filter(pk=pk).update(updated_at=timezone.now(), **changes)
+
+
+def _booking_contribution(state):
+    if state is None or state["status"] != COMPLETED:
+        return None
+    return state["worker_id"], state["user_id"]
+
+
+def booking_state(booking):
+    return {"status": booking.status, "worker_id": booking.worker_id, "user_id": booking.user_id}
+
+
+def booking_changed(old, new):
+    """Apply a booking going from state ``old`` to ``new`` (either may be None)."""
+    before, after = _booking_contribution(old), _booking_contribution(new)
+    if before == after:
+        return
+    if before:
+        _apply(WorkerFeatures, before[0], completed_bookings=-1)
+        _apply(UserFeatures, before[1], completed_bookings=-1)
+    if after:
+        _apply(WorkerFeatures, after[0], completed_bookings=1)
+        _apply(UserFeatures, after[1], completed_bookings=1)
+
+
+def review_state(review):
+    return {"rating": review.rating, "worker_id": review.worker_id, "user_id": review.user_id}
+
+
+def review_changed(old, new):
+    """Apply a review going from state ``old`` to ``new`` (either may be None)."""
+    before = (old["worker_id"], old["user_id"], old["rating"]) if old and old["rating"] is not None else None
+    after = (new["worker_id"], new["user_id"], new["rating"]) if new and new["rating"] is not None else None
+    if before == after:
+        return
+    if before:
+        _apply(WorkerFeatures, before[0], review_count=-1, rating_sum=-before[2])
+        _apply(UserFeatures, before[1], review_count=-1, rating_sum=-before[2])
+    if after:
+        _apply(WorkerFeatures, after[0], review_count=1, rating_sum=after[2])
+        _apply(UserFeatures, after[1], review_count=1, rating_sum=after[2])
+
+
+# ---------------------------------------------------------
+# 🔹 Full rebuild
+# ---------------------------------------------------------
+REBUILD_SQL = [
+    "DELETE FROM worker_features;",
+    """
+    INSERT INTO worker_features (worker_id, completed_bookings, review_count, rating_sum, updated_at)
+    SELECT w.id,
+           COALESCE(b.completed, 0),
+           COALESCE(r.reviews, 0),
+           COALESCE(r.rating_sum, 0),
+           NOW()
+    FROM workers w
+    LEFT JOIN (
+        SELECT worker_id, COUNT(*) AS completed FROM bookings
+        WHERE status = 'completed' GROUP BY worker_id
+    ) b ON b.worker_id = w.id
+    LEFT JOIN (
+        SELECT worker_id, COUNT(*) AS reviews, SUM(rating) AS rating_sum FROM core_userreview
+        WHERE rating IS NOT NULL GROUP BY worker_id
+    ) r ON r.worker_id = w.id;
+    """,
+    "DELETE FROM user_features;",
+    """
+    INSERT INTO user_features (user_id, completed_bookings, review_count, rating_sum, updated_at)
+    SELECT u.id,
+           COALESCE(b.completed, 0),
+           COALESCE(r.reviews, 0),
+           COALESCE(r.rating_sum, 0),
+           NOW()
+    FROM core_authenticateduser u
+    LEFT JOIN (
+        SELECT user_id, COUNT(*) AS completed FROM bookings
+        WHERE status = 'completed' GROUP BY user_id
+    ) b ON b.user_id = u.id
+    LEFT JOIN (
+        SELECT user_id, COUNT(*) AS reviews, SUM(rating) AS rating_sum FROM core_userreview
+        WHERE rating IS NOT NULL GROUP BY user_id
+    ) r ON r.user_id = u.id
+    WHERE b.completed IS NOT NULL OR r.reviews IS NOT NULL;
+    """,
+]
+
+
+def rebuild(using=DEFAULT_DB_ALIAS):
+    """Recompute both tables from bookings and reviews in one transaction."""
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        for sql in REBUILD_SQL:
+            cursor.execute(sql)
+    return WorkerFeatures.objects.using(using).count(), UserFeatures.objects.using(using).count()
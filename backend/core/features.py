@@ -0,0 +1,18 @@
+# core/features.py
+"""
+Feature transforms shared by serving (``core.recommender``) and training
+(``core.training_cache``). Kept free of database and model imports so either
+side can use them without loading the other.
+"""
+import numpy as np
+
+# Same bins / labels as train_model's pd.cut(distance_km, [-1, 1, 3, 10, 100]);
+# distances beyond the last edge are NaN there too.
+DISTANCE_BUCKET_EDGES = np.array([1.0, 3.0, 10.0, 100.0])
+
+
+def distance_bucket(distance_km):
+    """Vectorised ``pd.cut(distance_km, [-1, 1, 3, 10, 100], labels=[0, 1, 2, 3])``."""
+    bucket = np.searchsorted(DISTANCE_BUCKET_EDGES, distance_km, side="left").astype(np.float64)
+    bucket[bucket >= len(DISTANCE_BUCKET_EDGES)] = np.nan
+    return bucket
@@ -0,0 +1,138 @@
+# core/geo_grid.py
+"""
+Fixed lat/lon grid tiling for nearby lookups.
+
+The globe is cut into square cells of ``GEO_GRID['CELL_DEG']`` degrees (0.05°
+is about 5.5 km north–south). Each cell has an integer id::
+
+    row  = floor((lat + 90) / size)
+    col  = floor((lon + 180) / size)
+    cell = row * columns + col
+
+``Worker.grid_cell`` and ``AuthenticatedUser.grid_cell`` store the id of
+their ``location``, maintained in ``save()`` and indexed. "Everything within
+r km" becomes ``grid_cell IN neighbour_cells(lat, lon, r)``: an index lookup
+over a few cells instead of a distance computed for every row. The cell block
+covers the circle, so exact distance filters only ever see nearby rows.
+
+``CellIndex`` is the in-memory form for arrays of coordinates (the candidate
+snapshot). Rows are sorted by cell, so one cell's rows are found with a
+binary search.
+
+Ids depend on the cell size. After changing ``CELL_DEG``, run
+``manage.py rebuild_geo_grid``.
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+
+DEFAULT_CELL_DEG = 0.05
+KM_PER_DEG_LAT = 111.32
+
+# Tables with a ``location`` geography column and a ``grid_cell`` column.
+GRID_TABLES = ("workers", "core_authenticateduser")
+
+
+def cell_size():
+    return getattr(settings, "GEO_GRID", {}).get("CELL_DEG", DEFAULT_CELL_DEG)
+
+
+def _columns(size):
+    return int(math.ceil(360.0 / size))
+
+
+def _rows(size):
+    return int(math.ceil(180.0 / size))
+
+
+def cell_ids(lat, lon, size=None):
+    """Cell id of every (lat, lon) pair (vectorised; NaN coordinates give -1)."""
+    size = size or cell_size()
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    row = np.clip(np.floor((np.where(valid, lat, 0.0) + 90.0) / size), 0, _rows(size) - 1)
+    col = np.floor((np.where(valid, lon, 0.0) + 180.0) / size) % _columns(size)
+    return np.where(valid, row.astype(np.int64) * _columns(size) + col.astype(np.int64), -1)
+
+
+def cell_id(lat, lon, size=None):
+    return int(cell_ids(lat, lon, size))
+
+
+def cell_for_point(point, size=None):
+    """Cell id of a GEOS ``Point`` (x = lon, y = lat), or None without a point."""
+    if point is None:
+        return None
+    return cell_id(point.y, point.x, size)
+
+
+def neighbour_cells(lat, lon, radius_km, size=None):
+    """Sorted ids of the block of cells covering every point within ``radius_km`` of (lat, lon)."""
+    size = size or cell_size()
+    columns, rows = _columns(size), _rows(size)
+    row = min(max(int(math.floor((lat + 90.0) / size)), 0), rows - 1)
+    col = int(math.floor((lon + 180.0) / size)) % columns
+
+    dlat = radius_km / KM_PER_DEG_LAT
+    # Longitude degrees shrink with cos(lat); use the latitude of the block edge nearest a pole.
+    cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+    row_span = int(math.ceil(dlat / size))
+    if cos_lat <= 1e-9:
+        col_offsets = range(columns)
+    else:
+        col_span = int(math.ceil(radius_km / (KM_PER_DEG_LAT * cos_lat) / size))
+        col_offsets = range(columns) if 2 * col_span + 1 >= columns else range(-col_span, col_span + 1)
+
+    cells = {
+        r * columns + (col + dc) % columns
+        for r in range(max(row - row_span, 0), min(row + row_span, rows - 1) + 1)
+        for dc in col_offsets
+    }
+    return sorted(cells)
+
+
+class CellIndex:
+    """Rows of coordinate arrays grouped by cell for neighbourhood lookups."""
+
+    def __init__(self, lat, lon, size=None):
+        self.size = size or cell_size()
+        cells = cell_ids(lat, lon, self.size)
+        self.order = np.argsort(cells, kind="stable")
+        self.cells = cells[self.order]
+
+    def rows_near(self, lat, lon, radius_km):
+        """Row indices (ascending) in the cells covering ``radius_km`` around (lat, lon)."""
+        wanted = np.asarray(neighbour_cells(lat, lon, radius_km, self.size), dtype=np.int64)
+        lo = np.searchsorted(self.cells, wanted, side="left")
+        hi = np.searchsorted(self.cells, wanted, side="right")
+        if not (hi > lo).any():
+            return np.zeros(0, dtype=np.int64)
+        rows = np.concatenate([self.order[a:b] for a, b in zip(lo, hi) if b > a])
+        return np.sort(rows)
+
+
+# ---------------------------------------------------------
+# 🔹 Bulk (re)computation
+# ---------------------------------------------------------
+def update_sql(table, size=None):
+    """One UPDATE setting ``grid_cell`` of every row of ``table`` with the same formula as ``cell_ids``."""
+    size = float(size or cell_size())
+    return f"""
+        UPDATE {table} SET grid_cell = CASE WHEN location IS NULL THEN NULL ELSE
+            LEAST(GREATEST(FLOOR((ST_Y(location::geometry) + 90.0) / {size!r}), 0), {_rows(size) - 1})::bigint
+            * {_columns(size)}
+            + MOD(FLOOR((ST_X(location::geometry) + 180.0) / {size!r})::bigint, {_columns(size)})
+        END;
+    """
+
+
+def rebuild(connection, size=None):
+    """Recompute ``grid_cell`` on every grid table; returns the updated row count per table."""
+    counts = {}
+    with connection.cursor() as cursor:
+        for table in GRID_TABLES:
+            cursor.execute(update_sql(table, size))
+            counts[table] = cursor.rowcount
+    return counts
@@ -0,0 +1,112 @@
+import asyncio
+import base64
+import json
+import os
+import time
+from types import SimpleNamespace
+
+from Crypto.Cipher import AES, PKCS1_OAEP
+from Crypto.PublicKey import RSA
+from Crypto.Random import get_random_bytes
+from Crypto.Util.Padding import pad
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.crypto import decrypt_aes, decrypt_envelope, establish_session_key, resolve_aes_key
+from core.crypto_pool import decrypt_envelope_async, get_pool
+
+PAYLOADS = {
+    "login": {"email": "user@example.com", "password": "S3cure!pass"},
+    "booking": {
+        "userId": "1", "workerId": "7", "contactDates": json.dumps(["2026-10-20", "2026-10-21"]),
+        "description": "Kitchen sink leaking under the cabinet", "equipmentRequirement": "Basic tools",
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "CPU cost of decrypting the login and booking payloads: per-request RSA-wrapped "
+        "AES key, session key id with per-field AES, and the one-pass envelope "
+        "decryption the API parsers use (core/crypto.py). Then the event-loop stall of "
+        "concurrent RSA logins decrypted inline versus on core.crypto_pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrent", type=int, default=64,
+                            help="simultaneous RSA-keyed logins for the event-loop test")
+
+    def handle(self, *args, **opts):
+        with open(os.path.join(settings.BASE_DIR, "public.pem"), "rb") as f:
+            public_key = RSA.import_key(f.read())
+        aes_key = get_random_bytes(32)
+        wrapped_key = base64.b64encode(PKCS1_OAEP.new(public_key).encrypt(aes_key)).decode()
+
+        request = SimpleNamespace(session={})
+        kid = establish_session_key(request.session, wrapped_key)["kid"]
+
+        self.stdout.write(
+            f"{'payload':>8} | {'rsa µs/req':>10} | {'session µs/req':>14} | {'envelope µs/req':>15} | {'speedup':>7}"
+        )
+        self.stdout.write("-" * 68)
+        for name, fields in PAYLOADS.items():
+            data = {field: self._encrypt(value, aes_key) for field, value in fields.items()}
+            rsa = self._cpu(opts["requests"], self._per_field, request, {"key": wrapped_key, "data": data}, fields)
+            session = self._cpu(opts["requests"], self._per_field, request, {"kid": kid, "data": data}, fields)
+            envelope = self._cpu(opts["requests"], decrypt_envelope, request, {"kid": kid, "data": data}, fields)
+            self.stdout.write(
+                f"{name:>8} | {rsa:>10.1f} | {session:>14.1f} | {envelope:>15.1f} | {rsa / envelope:>6.0f}x"
+            )
+
+        login = {"key": wrapped_key, "data": {f: self._encrypt(v, aes_key) for f, v in PAYLOADS["login"].items()}}
+
+        async def inline():
+            return decrypt_envelope(request, login)
+
+        async def pooled():
+            return await decrypt_envelope_async(request, login)
+
+        self.stdout.write(f"\n{opts['concurrent']} concurrent RSA logins on one event loop:")
+        for name, decrypt in (("inline", inline), ("pool", pooled)):
+            wall, lag = asyncio.run(self._loop_lag(opts["concurrent"], decrypt))
+            self.stdout.write(f"{name:>8} | wall {wall:>7.1f} ms | max loop lag {lag:>7.1f} ms")
+        self.stdout.write(f"pool stats: {get_pool().stats()}")
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark finished (process CPU time per request)."))
+
+    def _encrypt(self, value, aes_key):
+        iv = get_random_bytes(16)
+        ciphertext = AES.new(aes_key, AES.MODE_CBC, iv).encrypt(pad(value.encode(), AES.block_size))
+        return base64.b64encode(iv + ciphertext).decode()
+
+    def _per_field(self, request, payload):
+        key = resolve_aes_key(request, payload)
+        return {field: decrypt_aes(value, key) for field, value in payload["data"].items()}
+
+    def _cpu(self, n, decrypt, request, payload, fields):
+        assert decrypt(request, payload) == fields
+        start = time.process_time()
+        for _ in range(n):
+            decrypt(request, payload)
+        return (time.process_time() - start) / n * 1e6
+
+    async def _loop_lag(self, concurrent, decrypt):
+        # A 1 ms ticker runs next to the decryptions; lag is how late it woke up.
+        lag, done = 0.0, False
+
+        async def ticker():
+            nonlocal lag
+            while not done:
+                start = time.perf_counter()
+                await asyncio.sleep(0.001)
+                lag = max(lag, time.perf_counter() - start - 0.001)
+
+        tick = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        await asyncio.gather(*(decrypt() for _ in range(concurrent)))
+        wall = time.perf_counter() - start
+        done = True
+        await tick
+        return wall * 1000, lag * 1000
@@ -0,0 +1,73 @@
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core import distance
+from core.utils import haversine_vector
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare core.utils.haversine_vector with the prepared-coordinate kernels "
+        "in core/distance.py: latency, bytes allocated per call and error."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[200, 2_000, 20_000, 200_000])
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--spread-deg", type=float, default=0.5,
+                            help="workers are drawn within ± this many degrees of the user")
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(42)
+        user_lat, user_lon = 12.97, 77.59
+
+        self.stdout.write(
+            f"{'points':>8} | {'haversine_vector':>16} | {'haversine_km':>12} | {'equirect_km':>11} | "
+            f"{'alloc KB (old/new)':>18} | {'max err km':>10} | {'equirect rel err':>16}"
+        )
+        self.stdout.write("-" * 110)
+
+        for n in opts["sizes"]:
+            lat = user_lat + rng.uniform(-opts["spread_deg"], opts["spread_deg"], size=n)
+            lon = user_lon + rng.uniform(-opts["spread_deg"], opts["spread_deg"], size=n)
+            points = distance.prepared_points(lat, lon)
+            out = np.empty(n)
+
+            expected = haversine_vector(user_lat, user_lon, lat, lon)
+            err = float(np.abs(distance.haversine_km(user_lat, user_lon, points, out=out) - expected).max())
+            approx = distance.equirectangular_km(user_lat, user_lon, points)
+            far = expected > 0.01
+            rel = float((np.abs(approx - expected)[far] / expected[far]).max()) if far.any() else 0.0
+
+            old_ms = self._time(opts["repeat"], haversine_vector, user_lat, user_lon, lat, lon)
+            new_ms = self._time(opts["repeat"], distance.haversine_km, user_lat, user_lon, points, out)
+            fast_ms = self._time(opts["repeat"], distance.equirectangular_km, user_lat, user_lon, points, out)
+            old_kb = self._allocated(haversine_vector, user_lat, user_lon, lat, lon)
+            new_kb = self._allocated(distance.haversine_km, user_lat, user_lon, points, out)
+
+            self.stdout.write(
+                f"{n:>8} | {old_ms:>13.3f} ms | {new_ms:>9.3f} ms | {fast_ms:>8.3f} ms | "
+                f"{old_kb:>8.0f} / {new_kb:<7.0f} | {err:>10.1e} | {rel:>16.2e}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark finished (median per call)."))
+
+    def _time(self, repeat, fn, *args):
+        fn(*args)  # warm-up (sizes the per-thread scratch buffer)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(*args)
+            timings.append(time.perf_counter() - start)
+        return float(np.median(timings)) * 1000
+
+    def _allocated(self, fn, *args):
+        fn(*args)
+        tracemalloc.start()
+        fn(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak / 1024
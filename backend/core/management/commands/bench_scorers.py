@@ -0,0 +1,71 @@
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from core.candidates import CandidateSnapshot
+from core.ml_model import get_model
+from core.recommender import score_candidates, score_candidates_with_model
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-request scoring latency of the heuristic scorer and the "
+        "LightGBM ranker on synthetic candidate sets (no database needed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1_000, 10_000, 100_000])
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--history", type=int, default=5, help="completed bookings of the test user")
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(42)
+        user_lat, user_lon = 12.97, 77.59
+        ranker = get_model()
+
+        self.stdout.write(f"{'candidates':>10} | {'heuristic ms':>12} | {'model ms':>9}")
+        self.stdout.write("-" * 38)
+
+        for n in opts["sizes"]:
+            cand = self._candidates(rng, n)
+            picked = rng.integers(0, n, size=opts["history"])
+            history = pd.DataFrame({
+                "worker_id": cand.worker_id[picked],
+                "service_id": cand.service_id[picked],
+                "worker_rating": cand.total_rating[picked],
+            })
+
+            heuristic = self._time(opts["repeat"], score_candidates, cand, user_lat, user_lon, history)
+            model = self._time(
+                opts["repeat"], score_candidates_with_model,
+                cand, user_lat, user_lon, history, ranker, ranker.feature_cols,
+            )
+            self.stdout.write(f"{n:>10} | {heuristic * 1000:>12.3f} | {model * 1000:>9.3f}")
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark finished (median per request)."))
+
+    def _candidates(self, rng, n):
+        return CandidateSnapshot({
+            "worker_id": np.arange(n, dtype=np.int64),
+            "worker_name": np.full(n, "worker", dtype=object),
+            "service_id": rng.integers(1, 10, size=n),
+            "service_name": np.full(n, "service", dtype=object),
+            "worker_lat": rng.uniform(12.80, 13.15, size=n),
+            "worker_lon": rng.uniform(77.45, 77.75, size=n),
+            "num_bookings": rng.integers(0, 50, size=n),
+            "total_rating": rng.uniform(0, 5, size=n),
+            "charge": rng.uniform(100, 1000, size=n),
+            "is_available": np.ones(n, dtype=bool),
+            "profile_image": np.full(n, None, dtype=object),
+            "address": np.full(n, None, dtype=object),
+        })
+
+    def _time(self, repeat, fn, *args):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(*args)
+            timings.append(time.perf_counter() - start)
+        return float(np.median(timings))
@@ -0,0 +1,82 @@
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from core.features import DISTANCE_BUCKET_EDGES, distance_bucket
+from core.ml_model import FEATURES_FILE, LEGACY_VERSION, MODEL_FILE, read_pointer, version_dir
+from core.recommender import assemble_features
+from core.tree_eval import CompiledRanker
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the compiled NumPy ranker (core/tree_eval.py) matches "
+        "Booster.predict and compare their latency on synthetic candidate matrices."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--version", help="model version (default: CURRENT, else legacy)")
+        parser.add_argument("--sizes", nargs="+", type=int, default=[50, 200, 500, 5_000])
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def handle(self, *args, **opts):
+        import joblib
+        import lightgbm as lgb
+
+        version = opts["version"] or read_pointer("CURRENT") or LEGACY_VERSION
+        directory = version_dir(version)
+        if not os.path.exists(os.path.join(directory, MODEL_FILE)):
+            raise CommandError(f"No model found for version '{version}'.")
+
+        booster = lgb.Booster(model_file=os.path.join(directory, MODEL_FILE))
+        feature_cols = joblib.load(os.path.join(directory, FEATURES_FILE))
+
+        start = time.perf_counter()
+        compiled = CompiledRanker.from_booster(booster)
+        self.stdout.write(
+            f"📦 Version {version}: {compiled.num_trees} trees compiled in "
+            f"{(time.perf_counter() - start) * 1000:.1f} ms ({compiled.table.size} table entries)"
+        )
+
+        rng = np.random.default_rng(42)
+        self.stdout.write(f"{'candidates':>10} | {'lightgbm ms':>11} | {'numpy ms':>8} | {'max |diff|':>10}")
+        self.stdout.write("-" * 50)
+
+        for n in opts["sizes"]:
+            matrix = self._matrix(rng, n, feature_cols)
+            expected = booster.predict(matrix)
+            diff = float(np.abs(compiled.predict(matrix) - expected).max())
+            lightgbm_ms = self._time(opts["repeat"], booster.predict, matrix) * 1000
+            numpy_ms = self._time(opts["repeat"], compiled.predict, matrix) * 1000
+            self.stdout.write(f"{n:>10} | {lightgbm_ms:>11.3f} | {numpy_ms:>8.3f} | {diff:>10.2e}")
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark finished (median per call)."))
+
+    def _matrix(self, rng, n, feature_cols):
+        # Past the last bucket edge too, so the NaN distance bucket is exercised.
+        distance_km = rng.uniform(0, DISTANCE_BUCKET_EDGES[-1] * 1.2, size=n)
+        num_bookings = rng.integers(0, 50, size=n)
+        columns = {
+            "worker_lat": rng.uniform(12.80, 13.15, size=n),
+            "worker_lon": rng.uniform(77.45, 77.75, size=n),
+            "charge": rng.uniform(0, 1000, size=n),
+            "num_bookings": num_bookings,
+            "distance_km": distance_km,
+            "distance_km_scaled": distance_km * 2,
+            "distance_bucket": distance_bucket(distance_km),
+            "service_match": rng.uniform(0, 1, size=n),
+            "worker_avg_rating": rng.uniform(0, 5, size=n),
+            "worker_total_bookings": num_bookings,
+            "user_avg_rating": rng.uniform(0, 5),
+        }
+        return assemble_features(columns, feature_cols, n)
+
+    def _time(self, repeat, fn, *args):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(*args)
+            timings.append(time.perf_counter() - start)
+        return float(np.median(timings))
@@ -0,0 +1,88 @@
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from shapely.geometry import Point
+from sqlalchemy import text
+
+from core.db import get_engine
+from core.utils import TTLCache
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the recommender's user-location lookup: the old full-table "
+        "dict build versus the single-user fetch (uncached and cached). Runs "
+        "against a temporary PostGIS table seeded with N synthetic users; the "
+        "remaining recommendation stages do not depend on the user count."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--lookups", type=int, default=200, help="single-user fetches per size")
+
+    def handle(self, *args, **opts):
+        engine = get_engine()
+        rng = np.random.default_rng(42)
+
+        self.stdout.write(f"{'users':>10} | {'legacy ms':>10} | {'fetch ms':>9} | {'cached ms':>9}")
+        self.stdout.write("-" * 48)
+
+        with engine.connect() as conn:
+            for n in opts["sizes"]:
+                self._seed(conn, n)
+                user_ids = rng.integers(1, n + 1, size=opts["lookups"]).tolist()
+
+                legacy = min(self._legacy(conn, user_ids[0]) for _ in range(opts["repeat"]))
+                fetch = self._fetch_all(conn, user_ids, cache=None)
+                cache = TTLCache(maxsize=len(user_ids), ttl=300)
+                self._fetch_all(conn, user_ids, cache)  # warm
+                cached = self._fetch_all(conn, user_ids, cache)
+
+                self.stdout.write(
+                    f"{n:>10} | {legacy * 1000:>10.2f} | {fetch * 1000:>9.3f} | {cached * 1000:>9.4f}"
+                )
+                conn.execute(text("DROP TABLE IF EXISTS bench_users"))
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark finished (per-lookup latency)."))
+
+    def _seed(self, conn, n):
+        conn.execute(text("DROP TABLE IF EXISTS bench_users"))
+        conn.execute(text("""
+            CREATE TEMP TABLE bench_users AS
+            SELECT g AS id,
+                   ST_SetSRID(ST_MakePoint(77.45 + random() * 0.3, 12.80 + random() * 0.25), 4326)::geography
+                       AS location
+            FROM generate_series(1, :n) g
+        """), {"n": n})
+        conn.execute(text("ALTER TABLE bench_users ADD PRIMARY KEY (id)"))
+        conn.execute(text("ANALYZE bench_users"))
+
+    def _legacy(self, conn, user_id):
+        """The previous build_user_locs_dict() path followed by one lookup."""
+        start = time.perf_counter()
+        user_locs = pd.read_sql(
+            "SELECT id, ST_Y(location::geometry) AS lat, ST_X(location::geometry) AS lon "
+            "FROM bench_users WHERE location IS NOT NULL",
+            conn,
+        )
+        locs = {row["id"]: Point(row["lon"], row["lat"]) for _, row in user_locs.iterrows()}
+        locs.get(user_id)
+        return time.perf_counter() - start
+
+    def _fetch_all(self, conn, user_ids, cache):
+        """Mean latency of core.recommender.get_user_location's query (+ cache)."""
+        query = text(
+            "SELECT ST_Y(location::geometry) AS lat, ST_X(location::geometry) AS lon "
+            "FROM bench_users WHERE id = :user_id AND location IS NOT NULL"
+        )
+        start = time.perf_counter()
+        for user_id in user_ids:
+            if cache is not None and cache.get(user_id) is not None:
+                continue
+            row = conn.execute(query, {"user_id": user_id}).first()
+            if cache is not None:
+                cache.set(user_id, (row.lat, row.lon) if row else None)
+        return (time.perf_counter() - start) / len(user_ids)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ml_model import list_versions, read_pointer, version_metrics, write_pointer
+
+
+class Command(BaseCommand):
+    help = (
+        "List stored ranker versions or move the CURRENT / SHADOW pointers. "
+        "Running processes pick up the change within ML_MODEL_RELOAD_INTERVAL seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["list", "activate", "shadow", "clear-shadow"])
+        parser.add_argument("version", nargs="?")
+
+    def handle(self, *args, **opts):
+        action, version = opts["action"], opts["version"]
+
+        if action in ("activate", "shadow") and not version:
+            raise CommandError(f"'{action}' needs a version (see: manage.py model_versions list).")
+
+        try:
+            if action == "activate":
+                write_pointer("CURRENT", version)
+            elif action == "shadow":
+                write_pointer("SHADOW", version)
+            elif action == "clear-shadow":
+                write_pointer("SHADOW", None)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        current, shadow = read_pointer("CURRENT"), read_pointer("SHADOW")
+        for v in list_versions():
+            metrics = version_metrics(v)
+            tag = " [CURRENT]" if v == current else " [SHADOW]" if v == shadow else ""
+            self.stdout.write(
+                f"{v}{tag}  MRR={metrics.get('mrr', '-')}  MAP={metrics.get('map', '-')}  "
+                f"trained_at={metrics.get('trained_at', '-')}"
+            )
+        if action != "list":
+            self.stdout.write(self.style.SUCCESS(f"✅ CURRENT={current or 'legacy'}  SHADOW={shadow or '-'}"))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import feature_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the worker / user feature store from bookings and reviews. "
+        "Normally it is kept up to date incrementally; run this to backfill or repair drift."
+    )
+
+    def handle(self, *args, **opts):
+        start = time.perf_counter()
+        workers, users = feature_store.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rebuilt features for {workers} workers and {users} users "
+            f"in {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core import geo_grid
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the grid cell of every worker and user from their location. "
+        "Cells are kept up to date on save; run this after changing GEO_GRID['CELL_DEG'] "
+        "or after bulk updates that bypass save()."
+    )
+
+    def handle(self, *args, **opts):
+        start = time.perf_counter()
+        with transaction.atomic():
+            counts = geo_grid.rebuild(connection)
+        rows = ", ".join(f"{count} {table}" for table, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Recomputed grid cells ({geo_grid.cell_size()}° cells) for {rows} "
+            f"in {time.perf_counter() - start:.1f}s"
+        ))
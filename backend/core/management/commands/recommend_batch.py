@@ -0,0 +1,58 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.batch_recommender import FORMATS, batch_settings, iter_user_ids, recommend_batch
+from core.recommender import resolve_ranker
+
+
+class Command(BaseCommand):
+    help = (
+        "Write top-N worker recommendations for many users as JSON lines or CSV. "
+        "Candidates are loaded once and users are scored in chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", nargs="+", type=int, help="user ids (default: every user with a location)")
+        parser.add_argument("--top-n", type=int, default=10)
+        parser.add_argument("--format", choices=sorted(FORMATS), default="jsonl")
+        parser.add_argument("--scorer", help="heuristic or model (default: settings.RECOMMENDER_SCORER)")
+        parser.add_argument("--max-cells", type=int, default=batch_settings()["MAX_CELLS"],
+                            help="max user x candidate pairs scored per batch")
+        parser.add_argument("--output", help="file to write (default: stdout)")
+
+    def handle(self, *args, **opts):
+        try:
+            scorer, model = resolve_ranker(opts["scorer"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if opts["top_n"] < 1:
+            raise CommandError("--top-n must be at least 1.")
+
+        user_ids = opts["users"] or iter_user_ids()
+        results = recommend_batch(
+            user_ids, model, model.feature_cols if model else None,
+            top_n=opts["top_n"], scorer=scorer, max_cells=opts["max_cells"],
+        )
+
+        render, _ = FORMATS[opts["format"]]
+        users = 0
+
+        def counted(items):
+            nonlocal users
+            for item in items:
+                users += 1
+                yield item
+
+        out = open(opts["output"], "w", newline="") if opts["output"] else sys.stdout
+        start = time.perf_counter()
+        try:
+            out.writelines(render(counted(results)))
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        self.stderr.write(self.style.SUCCESS(
+            f"✅ {users} users scored with '{scorer}' in {time.perf_counter() - start:.1f}s"
+        ))
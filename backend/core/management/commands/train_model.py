@@ -1,27 +1,188 @@
+import json
 import os
+import time
 import pandas as pd
 import numpy as np
 import lightgbm as lgb
 from shapely.geometry import Point
-from sqlalchemy import create_engine
-import joblib
 from sklearn.model_selection import GroupShuffleSplit
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.utils import timezone
+
+from core.data_prep import worker_stats
+from core.db import get_engine
+from core import ranker_sweep
+from core.ml_model import ML_DIR, publish_version
+from core.ranking_metrics import mean_average_precision, mean_reciprocal_rank
+from core.training_cache import TrainingCache, build_training_cache, cache_settings
 import matplotlib.pyplot as plt
 
+FEATURE_COLS = [
+    "worker_lat", "worker_lon", "charge", "num_bookings",
+    "distance_km_scaled", "distance_bucket", "service_match",
+    "worker_avg_rating", "worker_total_bookings", "user_avg_rating"
+]
+CATEGORICAL_FEATURES = ["distance_bucket"]
+RELEVANCE_THRESHOLD = 3
+
+PARAMS = {
+    "objective": "lambdarank",
+    "metric": "ndcg",
+    "ndcg_eval_at": [1, 3, 5],
+    "boosting_type": "gbdt",
+    "learning_rate": 0.01,
+    "num_leaves": 5,
+    "max_depth": 3,
+    "min_data_in_leaf": 1000,
+    "feature_fraction": 0.5,
+    "bagging_fraction": 0.5,
+    "bagging_freq": 5,
+    "min_gain_to_split": 0.1,
+    "verbose": -1,
+    "label_gain": [0, 1, 2, 3, 4, 5],
+    "seed": 42,
+}
+
+
+class StageTimer:
+    """Wall-clock time of consecutive pipeline stages."""
+
+    def __init__(self):
+        self.stages = []
+        self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.stages.append((name, now - self._last))
+        self._last = now
+
+    def report(self):
+        total = sum(seconds for _, seconds in self.stages) or 1e-9
+        lines = [f"⏱️  {name:<18} {seconds:>8.2f}s  {seconds / total:>6.1%}" for name, seconds in self.stages]
+        lines.append(f"⏱️  {'total':<18} {total:>8.2f}s")
+        return "\n".join(lines)
+
 
 class Command(BaseCommand):
     help = "Train LightGBM ranking model with realistic MRR/MAP evaluation"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--shadow", action="store_true",
+                            help="publish the new version as SHADOW instead of CURRENT")
+        parser.add_argument("--no-activate", action="store_true",
+                            help="store the new version without pointing CURRENT/SHADOW at it")
+        parser.add_argument("--streaming", action="store_true",
+                            help="stream the data into the on-disk training cache and train from it "
+                                 "(memory bounded by --chunksize instead of the table size)")
+        parser.add_argument("--chunksize", type=int, default=cache_settings()["CHUNKSIZE"],
+                            help="rows per database fetch / cache batch in --streaming mode")
+        parser.add_argument("--reuse-cache", action="store_true",
+                            help="with --streaming, train from the existing cache instead of rebuilding it")
+        parser.add_argument("--params",
+                            help="JSON file of LightGBM params overriding the defaults "
+                                 "(e.g. the best_params.json written by --sweep)")
+
+        sweep = parser.add_argument_group("hyperparameter sweep")
+        sweep.add_argument("--sweep", action="store_true",
+                           help="search ranker_sweep.SEARCH_SPACE on the training cache instead of "
+                                "training and publishing a model")
+        sweep.add_argument("--search", choices=["grid", "random"], default="random")
+        sweep.add_argument("--trials", type=int, default=20, help="configurations to try with --search random")
+        sweep.add_argument("--folds", type=int, default=3,
+                           help="user-grouped cross-validation folds (1 = single 80/20 split)")
+        sweep.add_argument("--jobs", type=int, default=None,
+                           help="parallel training processes (default: cores // --threads-per-run)")
+        sweep.add_argument("--threads-per-run", type=int, default=1,
+                           help="LightGBM num_threads of each training process")
+        sweep.add_argument("--sweep-dir", default=None,
+                           help="directory for fold Datasets and results (default: ml_models/sweeps/<timestamp>)")
+
     def handle(self, *args, **kwargs):
-        # ---------------- DATABASE CONNECTION ----------------
-        db_settings = settings.DATABASES["default"]
-        conn_str = (
-            f"postgresql://{db_settings['USER']}:{db_settings['PASSWORD']}"
-            f"@{db_settings['HOST']}:{db_settings['PORT']}/{db_settings['NAME']}"
+        self.params = dict(PARAMS)
+        if kwargs["params"]:
+            with open(kwargs["params"]) as f:
+                self.params.update(json.load(f))
+            print(f"⚙️  Params overridden from {kwargs['params']}")
+
+        timer = StageTimer()
+        if kwargs["sweep"]:
+            self._sweep(timer, kwargs)
+            return
+
+        if kwargs["streaming"]:
+            result = self._train_streaming(timer, kwargs["chunksize"], kwargs["reuse_cache"])
+        else:
+            result = self._train_in_memory(timer)
+        model, evals_result, val_users, val_pred, val_relevance, train_rows, val_rows = result
+
+        # ---------------- REALISTIC MRR/MAP ----------------
+        relevant = val_relevance >= RELEVANCE_THRESHOLD
+        mrr = mean_reciprocal_rank(val_users, val_pred, relevant)
+        map_score = mean_average_precision(val_users, val_pred, relevant)
+        timer.lap("evaluate")
+        print(f"✅ Validation MRR: {mrr:.4f}")
+        print(f"✅ Validation MAP: {map_score:.4f}")
+
+        # ---------------- SAVE MODEL ----------------
+        pointer = None if kwargs["no_activate"] else ("SHADOW" if kwargs["shadow"] else "CURRENT")
+        version, version_dir = publish_version(
+            model,
+            FEATURE_COLS,
+            metrics={
+                "mrr": round(float(mrr), 6),
+                "map": round(float(map_score), 6),
+                "best_iteration": model.best_iteration,
+                "num_trees": model.num_trees(),
+                "train_rows": train_rows,
+                "valid_rows": val_rows,
+                "streaming": kwargs["streaming"],
+                "trained_at": timezone.now().isoformat(),
+            },
+            pointer=pointer,
         )
-        engine = create_engine(conn_str)
+        print(f"✅ Saved model version {version} ({pointer or 'not activated'})")
+        timer.lap("save")
+
+        # ---------------- PLOT NDCG ----------------
+        ndcg1 = [x * 100 for x in evals_result["valid"]["ndcg@1"]]
+        ndcg3 = [x * 100 for x in evals_result["valid"]["ndcg@3"]]
+        ndcg5 = [x * 100 for x in evals_result["valid"]["ndcg@5"]]
+
+        plt.figure(figsize=(10, 6))
+        plt.plot(ndcg1, label="NDCG@1")
+        plt.plot(ndcg3, label="NDCG@3")
+        plt.plot(ndcg5, label="NDCG@5")
+        plt.xlabel("Iteration")
+        plt.ylabel("NDCG (%)")
+        plt.title("Validation NDCG During Training")
+        plt.legend()
+        plt.grid(True)
+        plt.savefig(os.path.join(version_dir, "ndcg_plot.png"), dpi=300, bbox_inches="tight")
+        plt.close()
+        timer.lap("plot")
+
+        print(timer.report())
+
+    def _train(self, lgb_train, lgb_val, timer):
+        evals_result = {}
+        model = lgb.train(
+            self.params,
+            lgb_train,
+            num_boost_round=1000,
+            valid_sets=[lgb_train, lgb_val],
+            valid_names=["train", "valid"],
+            callbacks=[lgb.early_stopping(stopping_rounds=200),
+                       lgb.log_evaluation(period=200),
+                       lgb.record_evaluation(evals_result)],
+        )
+        timer.lap("train")
+        return model, evals_result
+
+    # ---------------- IN-MEMORY PIPELINE ----------------
+    def _train_in_memory(self, timer):
+        # ---------------- DATABASE CONNECTION ----------------
+        engine = get_engine()
 
         # ---------------- HELPER FUNCTION ----------------
         def haversine_vector(lat1, lon1, lat2, lon2):
@@ -64,13 +225,14 @@ class Command(BaseCommand):
         df = df.merge(user_locs.set_index("id"), left_on="user_id", right_index=True, how="left")
         df.rename(columns={"lat": "lat_user", "lon": "lon_user"}, inplace=True)
         df.dropna(subset=["lat_user", "lon_user", "worker_lat", "worker_lon"], inplace=True)
+        timer.lap("load data")
 
         # ---------------- FEATURE ENGINEERING ----------------
-        worker_stats = df.groupby("worker_id").agg(
-            worker_avg_rating=("total_rating", "mean"),
-            worker_total_bookings=("num_bookings", "sum")
-        ).reset_index()
-        df = df.merge(worker_stats, on="worker_id", how="left")
+        # Worker aggregates are precomputed by the feature store (same values as serving).
+        df = df.merge(worker_stats(df, engine), on="worker_id", how="left")
+        df[["worker_avg_rating", "worker_total_bookings"]] = (
+            df[["worker_avg_rating", "worker_total_bookings"]].fillna(0)
+        )
 
         user_stats = df.groupby("user_id").agg(user_avg_rating=("total_rating", "mean")).reset_index()
         df = df.merge(user_stats, on="user_id", how="left")
@@ -79,8 +241,10 @@ class Command(BaseCommand):
         df["distance_km_scaled"] = df["distance_km"] * 2
         df["distance_bucket"] = pd.cut(df["distance_km"], bins=[-1, 1, 3, 10, 100], labels=[0, 1, 2, 3]).astype("category")
 
-        past_services = df.groupby("user_id")["service_id"].apply(set).to_dict()
-        df["service_match"] = df.apply(lambda r: int(r["service_id"] in past_services.get(r["user_id"], set())), axis=1)
+        # Membership of (user, service) in the user's past services, as a merge.
+        past_services = df[["user_id", "service_id"]].drop_duplicates().assign(service_match=1)
+        df = df.merge(past_services, on=["user_id", "service_id"], how="left")
+        df["service_match"] = df["service_match"].fillna(0).astype(int)
 
         # ---------------- REALISTIC RELEVANCE ----------------
         continuous_relevance = np.clip(5.0 - (df["distance_km"] / 10.0), 0.0, 5.0)
@@ -89,12 +253,7 @@ class Command(BaseCommand):
         continuous_relevance = np.clip(continuous_relevance + noise, 0.0, 5.0)
         df["relevance_int"] = continuous_relevance.round().astype(int)
         df["relevance_continuous"] = continuous_relevance
-
-        FEATURE_COLS = [
-            "worker_lat", "worker_lon", "charge", "num_bookings",
-            "distance_km_scaled", "distance_bucket", "service_match",
-            "worker_avg_rating", "worker_total_bookings", "user_avg_rating"
-        ]
+        timer.lap("features")
 
         # ---------------- TRAIN/VALID SPLIT ----------------
         if df["user_id"].nunique() > 1:
@@ -108,93 +267,107 @@ class Command(BaseCommand):
             train_groups = [len(df)]
             val_groups = [len(df)]
 
-        categorical_features = ["distance_bucket"]
+        timer.lap("split")
 
         lgb_train = lgb.Dataset(train_df[FEATURE_COLS], label=train_df["relevance_int"], group=train_groups,
-                                categorical_feature=categorical_features)
+                                categorical_feature=CATEGORICAL_FEATURES)
         lgb_val = lgb.Dataset(val_df[FEATURE_COLS], label=val_df["relevance_int"], group=val_groups,
-                              reference=lgb_train, categorical_feature=categorical_features)
-
-        params = {
-            "objective": "lambdarank",
-            "metric": "ndcg",
-            "ndcg_eval_at": [1, 3, 5],
-            "boosting_type": "gbdt",
-            "learning_rate": 0.01,
-            "num_leaves": 5,
-            "max_depth": 3,
-            "min_data_in_leaf": 1000,
-            "feature_fraction": 0.5,
-            "bagging_fraction": 0.5,
-            "bagging_freq": 5,
-            "min_gain_to_split": 0.1,
-            "verbose": -1,
-            "label_gain": [0, 1, 2, 3, 4, 5],
-            "seed": 42,
-        }
-
-        # ---------------- TRAIN MODEL ----------------
-        evals_result = {}
-        model = lgb.train(
-            params,
-            lgb_train,
-            num_boost_round=1000,
-            valid_sets=[lgb_train, lgb_val],
-            valid_names=["train", "valid"],
-            callbacks=[lgb.early_stopping(stopping_rounds=200),
-                       lgb.log_evaluation(period=200),
-                       lgb.record_evaluation(evals_result)],
-        )
+                              reference=lgb_train, categorical_feature=CATEGORICAL_FEATURES)
+
+        model, evals_result = self._train(lgb_train, lgb_val, timer)
 
         val_df["pred"] = model.predict(val_df[FEATURE_COLS], num_iteration=model.best_iteration)
+        timer.lap("predict")
+        return (model, evals_result, val_df["user_id"].values, val_df["pred"].values,
+                val_df["relevance_int"].values, len(train_df), len(val_df))
 
-        # ---------------- REALISTIC MRR/MAP ----------------
-        RELEVANCE_THRESHOLD = 3
-
-        def mean_reciprocal_rank(df_):
-            ranks = []
-            for _, g in df_.groupby("user_id"):
-                g_sorted = g.sort_values("pred", ascending=False)
-                rel = g_sorted["relevance_int"].values >= RELEVANCE_THRESHOLD
-                pos = np.where(rel)[0]
-                if len(pos) > 0:
-                    ranks.append(1.0 / (pos[0] + 1))
-            return np.mean(ranks) if ranks else 0.0
-
-        def mean_average_precision(df_):
-            aps = []
-            for _, g in df_.groupby("user_id"):
-                g_sorted = g.sort_values("pred", ascending=False)
-                rel = g_sorted["relevance_int"].values >= RELEVANCE_THRESHOLD
-                if rel.sum() == 0:
-                    continue
-                precisions = [(rel[:k+1].sum() / (k+1)) for k in range(len(g_sorted)) if rel[k]]
-                aps.append(np.mean(precisions))
-            return np.mean(aps) if aps else 0.0
-
-        mrr = mean_reciprocal_rank(val_df)
-        map_score = mean_average_precision(val_df)
-        print(f"✅ Validation MRR: {mrr:.4f}")
-        print(f"✅ Validation MAP: {map_score:.4f}")
+    # ---------------- STREAMING PIPELINE ----------------
+    def _training_cache(self, chunksize, reuse_cache):
+        if reuse_cache and TrainingCache.exists():
+            cache = TrainingCache()
+            print(f"📦 Reusing training cache ({cache.meta['rows']} rows, built {cache.meta['built_at']})")
+        else:
+            cache = build_training_cache(chunksize=chunksize)
+            print(f"📦 Built training cache: {cache.rows} rows in {cache.meta['chunks']} chunks")
+        return cache
 
-        # ---------------- SAVE MODEL ----------------
-        os.makedirs("ml_models", exist_ok=True)
-        model.save_model("ml_models/lgb_ranker.txt")
-        joblib.dump(FEATURE_COLS, "ml_models/feature_cols.pkl")
+    def _train_streaming(self, timer, chunksize, reuse_cache):
+        cache = self._training_cache(chunksize, reuse_cache)
+        timer.lap("load data")
 
-        # ---------------- PLOT NDCG ----------------
-        ndcg1 = [x * 100 for x in evals_result["valid"]["ndcg@1"]]
-        ndcg3 = [x * 100 for x in evals_result["valid"]["ndcg@3"]]
-        ndcg5 = [x * 100 for x in evals_result["valid"]["ndcg@5"]]
+        # Rows are sorted by user: one contiguous range per query group.
+        users, starts, sizes = cache.user_groups()
+        if len(users) > 1:
+            gss = GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+            train_idx, val_idx = next(gss.split(users, groups=users))
+            train_idx, val_idx = np.sort(train_idx), np.sort(val_idx)
+        else:
+            train_idx = val_idx = np.arange(len(users))
 
-        plt.figure(figsize=(10, 6))
-        plt.plot(ndcg1, label="NDCG@1")
-        plt.plot(ndcg3, label="NDCG@3")
-        plt.plot(ndcg5, label="NDCG@5")
-        plt.xlabel("Iteration")
-        plt.ylabel("NDCG (%)")
-        plt.title("Validation NDCG During Training")
-        plt.legend()
-        plt.grid(True)
-        plt.savefig("ml_models/ndcg_plot.png", dpi=300, bbox_inches="tight")
-        plt.close()
+        def ranges(idx):
+            return list(zip(starts[idx].tolist(), (starts[idx] + sizes[idx]).tolist()))
+
+        train_ranges, val_ranges = ranges(train_idx), ranges(val_idx)
+        timer.lap("split")
+
+        train_seq = cache.sequence(FEATURE_COLS, train_ranges, chunksize)
+        val_seq = cache.sequence(FEATURE_COLS, val_ranges, chunksize)
+        lgb_train = lgb.Dataset(train_seq, label=cache.gather("relevance_int", train_ranges),
+                                group=sizes[train_idx], feature_name=FEATURE_COLS,
+                                categorical_feature=CATEGORICAL_FEATURES)
+        lgb_val = lgb.Dataset(val_seq, label=cache.gather("relevance_int", val_ranges),
+                              group=sizes[val_idx], feature_name=FEATURE_COLS,
+                              reference=lgb_train, categorical_feature=CATEGORICAL_FEATURES)
+
+        model, evals_result = self._train(lgb_train, lgb_val, timer)
+
+        val_pred = np.concatenate(
+            [model.predict(batch, num_iteration=model.best_iteration) for batch in val_seq.batches()]
+        ) if len(val_seq) else np.zeros(0)
+        timer.lap("predict")
+        return (model, evals_result, np.repeat(users[val_idx], sizes[val_idx]), val_pred,
+                cache.gather("relevance_int", val_ranges), len(train_seq), len(val_seq))
+
+    # ---------------- HYPERPARAMETER SWEEP ----------------
+    def _sweep(self, timer, kwargs):
+        cache = self._training_cache(kwargs["chunksize"], kwargs["reuse_cache"])
+        timer.lap("load data")
+
+        if kwargs["search"] == "grid":
+            configs = ranker_sweep.grid_configs(ranker_sweep.SEARCH_SPACE)
+        else:
+            configs = ranker_sweep.random_configs(ranker_sweep.SEARCH_SPACE, kwargs["trials"])
+
+        directory = kwargs["sweep_dir"] or os.path.join(
+            ML_DIR, "sweeps", timezone.now().strftime("%Y%m%d-%H%M%S")
+        )
+        # Each fold's Datasets are binned once here; every trial loads the binaries.
+        folds = ranker_sweep.prepare_folds(cache, directory, FEATURE_COLS, CATEGORICAL_FEATURES,
+                                           n_folds=kwargs["folds"], batch_size=kwargs["chunksize"])
+        timer.lap("prepare folds")
+
+        threads = max(1, kwargs["threads_per_run"])
+        jobs = kwargs["jobs"] or max(1, (os.cpu_count() or 1) // threads)
+        output = os.path.join(directory, "results.jsonl")
+        print(f"🔎 {len(configs)} configs x {len(folds)} folds on {jobs} processes x {threads} threads")
+
+        def report(summary):
+            print(f"  #{summary['config_id']:<3} ndcg@5={summary.get('ndcg@5', 0):.4f} "
+                  f"mrr={summary['mrr']:.4f} map={summary['map']:.4f} "
+                  f"iter={summary['best_iteration']:.0f} train={summary['train_seconds']:.1f}s  {summary['params']}")
+
+        summaries = ranker_sweep.run_sweep(
+            configs, folds, self.params, output,
+            threads_per_run=threads, jobs=jobs,
+            relevance_threshold=RELEVANCE_THRESHOLD, predict_batch=kwargs["chunksize"],
+            on_result=report,
+        )
+        timer.lap("sweep")
+
+        best = max(summaries, key=lambda s: (s.get("ndcg@5", 0), s["mrr"]))
+        best_path = os.path.join(directory, "best_params.json")
+        with open(best_path, "w") as f:
+            json.dump(best["params"], f, indent=2)
+        print(f"✅ Best config #{best['config_id']}: {best['params']}")
+        print(f"✅ Results in {output}; train with --params {best_path}")
+        print(timer.report())
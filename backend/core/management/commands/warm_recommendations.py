@@ -0,0 +1,64 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+
+from core import rec_cache
+from core.db import get_engine
+from core.models import Booking
+from core.recommender import resolve_ranker
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-compute cached recommendations for the most active users (most "
+        "bookings in the last --days). Meant to run periodically, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=rec_cache.cache_settings()["WARM_USERS"])
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--top-n", type=int, default=10)
+        parser.add_argument("--scorer", help="heuristic or model (default: settings.RECOMMENDER_SCORER)")
+
+    def handle(self, *args, **opts):
+        try:
+            scorer, model = resolve_ranker(opts["scorer"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if opts["top_n"] < 1:
+            raise CommandError("--top-n must be at least 1.")
+        if not rec_cache.cache_settings()["TTL"]:
+            raise CommandError("The recommendation cache is disabled (RECOMMENDER_RESULT_CACHE['TTL'] is 0).")
+        if not rec_cache.is_shared():
+            raise CommandError(
+                f"The '{rec_cache.cache_settings()['ALIAS']}' cache is local to this process, so the "
+                "web workers would never see the warmed lists. Configure a shared backend "
+                "(database or Redis) for it in CACHES."
+            )
+
+        since = timezone.now() - timedelta(days=opts["days"])
+        user_ids = list(
+            Booking.objects.filter(booking_time__gte=since)
+            .values("user_id")
+            .annotate(n=Count("id"))
+            .order_by("-n")
+            .values_list("user_id", flat=True)[:opts["limit"]]
+        )
+
+        start = time.perf_counter()
+        warmed = 0
+        engine = get_engine()
+        for user_id in user_ids:
+            # Same path as recommend_view, so the cached list is the one it would compute.
+            if rec_cache.refresh_recommendations(
+                user_id, model, engine, top_n=opts["top_n"], scorer=scorer,
+                feature_cols=model.feature_cols if model else None,
+            ):
+                warmed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Warmed {warmed}/{len(user_ids)} users in {time.perf_counter() - start:.1f}s"
+        ))
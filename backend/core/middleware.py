@@ -0,0 +1,31 @@
+# core/middleware.py
+"""
+``Server-Timing`` response header for timed request phases.
+
+Code that times part of a request calls ``record_timing(request, name,
+seconds)``; time recorded twice under the same name is added up.
+``ServerTimingMiddleware`` writes the totals as
+``Server-Timing: decrypt;dur=0.41`` (milliseconds), where browser dev tools
+and proxies show them next to the total response time.
+"""
+TIMINGS_ATTR = "_server_timings"
+
+
+def record_timing(request, name, seconds):
+    request = getattr(request, "_request", request)  # DRF Request -> HttpRequest
+    timings = request.__dict__.setdefault(TIMINGS_ATTR, {})
+    timings[name] = timings.get(name, 0.0) + seconds
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        timings = getattr(request, TIMINGS_ATTR, None)
+        if timings:
+            header = ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items())
+            existing = response.get("Server-Timing")
+            response["Server-Timing"] = f"{existing}, {header}" if existing else header
+        return response
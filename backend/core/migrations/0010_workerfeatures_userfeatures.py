@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+INSERT INTO worker_features (worker_id, completed_bookings, review_count, rating_sum, updated_at)
+SELECT w.id, COALESCE(b.completed, 0), COALESCE(r.reviews, 0), COALESCE(r.rating_sum, 0), NOW()
+FROM workers w
+LEFT JOIN (
+    SELECT worker_id, COUNT(*) AS completed FROM bookings
+    WHERE status = 'completed' GROUP BY worker_id
+) b ON b.worker_id = w.id
+LEFT JOIN (
+    SELECT worker_id, COUNT(*) AS reviews, SUM(rating) AS rating_sum FROM core_userreview
+    WHERE rating IS NOT NULL GROUP BY worker_id
+) r ON r.worker_id = w.id;
+
+INSERT INTO user_features (user_id, completed_bookings, review_count, rating_sum, updated_at)
+SELECT u.id, COALESCE(b.completed, 0), COALESCE(r.reviews, 0), COALESCE(r.rating_sum, 0), NOW()
+FROM core_authenticateduser u
+LEFT JOIN (
+    SELECT user_id, COUNT(*) AS completed FROM bookings
+    WHERE status = 'completed' GROUP BY user_id
+) b ON b.user_id = u.id
+LEFT JOIN (
+    SELECT user_id, COUNT(*) AS reviews, SUM(rating) AS rating_sum FROM core_userreview
+    WHERE rating IS NOT NULL GROUP BY user_id
+) r ON r.user_id = u.id
+WHERE b.completed IS NOT NULL OR r.reviews IS NOT NULL;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_booking_user_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerFeatures',
+            fields=[
+                ('worker', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='features', serialize=False, to='core.worker')),
+                ('completed_bookings', models.PositiveIntegerField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'worker_features',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserFeatures',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='features', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('completed_bookings', models.PositiveIntegerField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'user_features',
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:05
+
+from django.db import migrations, models
+
+
+# core.geo_grid.cell_ids for the default 0.05° cells (3600 rows x 7200 columns).
+# With another GEO_GRID['CELL_DEG'], run manage.py rebuild_geo_grid afterwards.
+BACKFILL_SQL = """
+UPDATE workers SET grid_cell =
+    LEAST(GREATEST(FLOOR((ST_Y(location::geometry) + 90.0) / 0.05), 0), 3599)::bigint * 7200
+    + MOD(FLOOR((ST_X(location::geometry) + 180.0) / 0.05)::bigint, 7200)
+WHERE location IS NOT NULL;
+
+UPDATE core_authenticateduser SET grid_cell =
+    LEAST(GREATEST(FLOOR((ST_Y(location::geometry) + 90.0) / 0.05), 0), 3599)::bigint * 7200
+    + MOD(FLOOR((ST_X(location::geometry) + 180.0) / 0.05)::bigint, 7200)
+WHERE location IS NOT NULL;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_workerfeatures_userfeatures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authenticateduser',
+            name='grid_cell',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='worker',
+            name='grid_cell',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
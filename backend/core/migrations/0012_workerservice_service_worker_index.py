@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_grid_cell'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workerservice',
+            index=models.Index(fields=['service', 'worker'], name='worker_svc_service_worker_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:10
+
+from django.db import migrations
+
+# The table DatabaseCache expects (same DDL as ``manage.py createcachetable``),
+# created here so every environment that migrates has the shared
+# CACHES['recommendations'] backend ready.
+CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS recommendation_cache (
+    cache_key varchar(255) NOT NULL PRIMARY KEY,
+    value text NOT NULL,
+    expires timestamp with time zone NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recommendation_cache_expires ON recommendation_cache (expires);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_workerservice_service_worker_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, reverse_sql="DROP TABLE IF EXISTS recommendation_cache;"),
+    ]
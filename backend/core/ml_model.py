@@ -1,9 +1,377 @@
-import lightgbm as lgb
-import joblib
+# core/ml_model.py
+"""
+Versioned, lazily loaded store for the LightGBM ranker.
+
+Layout under ``ml_models/``::
+
+    versions/<version>/lgb_ranker.txt   model
+    versions/<version>/feature_cols.pkl feature order
+    versions/<version>/metrics.json     validation MRR / MAP etc. from train_model
+    versions/<version>/compiled_ranker.npz  NumPy form of the model (core.tree_eval)
+    CURRENT                             name of the version serving traffic
+    SHADOW                              optional version scored in shadow
+
+The pointers are replaced atomically with ``os.replace``. Every process checks
+them at most every ``ML_MODEL_RELOAD_INTERVAL`` seconds and swaps in a newly
+published version without a restart. Without a ``CURRENT`` pointer, the flat
+``ml_models/lgb_ranker.txt`` / ``feature_cols.pkl`` pair is served as version
+``"legacy"``.
+
+``ML_RANKER_EVALUATOR = "numpy"`` scores with ``core.tree_eval.CompiledRanker``
+instead of ``Booster.predict``. The scores are identical. When the version has a
+``compiled_ranker.npz``, lightgbm is then never imported by the serving process.
+The compiled form is only built when that evaluator is selected. A model whose
+tables would exceed ``ML_RANKER_MAX_TABLE_ENTRIES`` is not compiled; it is
+logged and served by ``Booster.predict``.
+
+Nothing is read, and lightgbm / joblib are not even imported, until the first
+``get_model()`` call. With ``ML_PRELOAD_MODELS = True`` the current version is
+loaded in ``CoreConfig.ready()`` instead. A preloading server (``gunicorn
+--preload``) then loads it once in the master, and the forked workers share
+those pages copy-on-write. ``gc.freeze()`` stops the garbage collector from
+touching, and so copying, the preloaded objects after the fork.
+"""
+import collections
+import gc
+import json
+import logging
 import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ML_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ml_models")
+VERSIONS_DIR = os.path.join(ML_DIR, "versions")
+MODEL_FILE = "lgb_ranker.txt"
+FEATURES_FILE = "feature_cols.pkl"
+METRICS_FILE = "metrics.json"
+COMPILED_FILE = "compiled_ranker.npz"
+LEGACY_VERSION = "legacy"
+
+# Kept for callers that read the flat files directly.
+MODEL_PATH = os.path.join(ML_DIR, MODEL_FILE)
+FEATURES_PATH = os.path.join(ML_DIR, FEATURES_FILE)
+
+
+def _rss_bytes():
+    """Current resident set size, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# ---------------------------------------------------------
+# 🔹 Per-version scoring metrics
+# ---------------------------------------------------------
+class ScoringStats:
+    """Latency and score distribution of one model version in this process."""
+
+    SAMPLE_SIZE = 5000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rows = 0
+        self.latencies = collections.deque(maxlen=1000)
+        self.scores = collections.deque(maxlen=self.SAMPLE_SIZE)
+        self.overlaps = collections.deque(maxlen=1000)
+
+    def record(self, seconds, scores):
+        step = max(1, len(scores) // 100)  # keep ~100 scores per call
+        with self._lock:
+            self.calls += 1
+            self.rows += len(scores)
+            self.latencies.append(seconds)
+            self.scores.extend(scores[::step].tolist())
+
+    def record_overlap(self, overlap):
+        with self._lock:
+            self.overlaps.append(overlap)
+
+    def summary(self):
+        with self._lock:
+            latencies = np.array(self.latencies)
+            scores = np.array(self.scores)
+            overlaps = np.array(self.overlaps)
+            summary = {"calls": self.calls, "rows": self.rows}
+        if latencies.size:
+            p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+            summary["latency_ms"] = {"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3)}
+        if scores.size:
+            q = np.percentile(scores, [5, 25, 50, 75, 95])
+            summary["scores"] = {
+                "mean": round(float(scores.mean()), 5),
+                "std": round(float(scores.std()), 5),
+                "min": round(float(scores.min()), 5),
+                "max": round(float(scores.max()), 5),
+                "quantiles": dict(zip(["p5", "p25", "p50", "p75", "p95"], np.round(q, 5).tolist())),
+            }
+        if overlaps.size:
+            summary["top_n_overlap_with_current"] = round(float(overlaps.mean()), 4)
+        return summary
+
+
+_stats = collections.defaultdict(ScoringStats)
+
+
+class ModelVersion:
+    """A loaded Booster (or its compiled form) plus its feature order; ``predict`` records metrics."""
+
+    def __init__(self, version, booster, feature_cols, metrics, load_seconds, rss_delta_mb, compiled=None):
+        self.version = version
+        self.booster = booster
+        self.compiled = compiled
+        self.feature_cols = feature_cols
+        self.metrics = metrics
+        self.load_seconds = load_seconds
+        self.rss_delta_mb = rss_delta_mb
+
+    @property
+    def stats(self):
+        return _stats[self.version]
+
+    @property
+    def evaluator(self):
+        return "numpy" if self.compiled is not None else "lightgbm"
+
+    def predict(self, matrix):
+        start = time.perf_counter()
+        if self.compiled is not None:
+            scores = self.compiled.predict(matrix)
+        else:
+            scores = self.booster.predict(matrix)
+        self.stats.record(time.perf_counter() - start, scores)
+        return scores
+
+
+# ---------------------------------------------------------
+# 🔹 Store
+# ---------------------------------------------------------
+def _pointer_path(name):
+    return os.path.join(ML_DIR, name)
+
+
+def read_pointer(name):
+    try:
+        with open(_pointer_path(name)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_pointer(name, version):
+    """Atomically point ``name`` (CURRENT / SHADOW) at ``version``, or remove it."""
+    path = _pointer_path(name)
+    if version is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    if not os.path.isdir(os.path.join(VERSIONS_DIR, version)):
+        raise ValueError(f"Unknown model version '{version}'.")
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, path)
+
+
+def list_versions():
+    if not os.path.isdir(VERSIONS_DIR):
+        return []
+    return sorted(v for v in os.listdir(VERSIONS_DIR) if not v.startswith("."))
+
+
+def version_metrics(version):
+    try:
+        with open(os.path.join(VERSIONS_DIR, version, METRICS_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def publish_version(booster, feature_cols, metrics=None, version=None, pointer="CURRENT"):
+    """
+    Save a trained model as a new version and point ``pointer`` at it
+    (``"CURRENT"``, ``"SHADOW"`` or None to only store it). Returns the
+    version name and its directory.
+    """
+    import joblib
+
+    version = version or time.strftime("%Y%m%d-%H%M%S")
+    target = os.path.join(VERSIONS_DIR, version)
+    if os.path.exists(target):
+        raise ValueError(f"Model version '{version}' already exists.")
+
+    tmp = os.path.join(VERSIONS_DIR, f".tmp-{version}-{os.getpid()}")
+    os.makedirs(tmp)
+    booster.save_model(os.path.join(tmp, MODEL_FILE))
+    if ranker_evaluator() == "numpy":
+        compiled = _compile(booster, version)
+        if compiled is not None:
+            compiled.save(os.path.join(tmp, COMPILED_FILE))
+    joblib.dump(list(feature_cols), os.path.join(tmp, FEATURES_FILE))
+    with open(os.path.join(tmp, METRICS_FILE), "w") as f:
+        json.dump({"version": version, **(metrics or {})}, f, indent=2)
+    os.replace(tmp, target)
+
+    if pointer:
+        write_pointer(pointer, version)
+    return version, target
+
+
+def ranker_evaluator():
+    return getattr(settings, "ML_RANKER_EVALUATOR", "lightgbm")
+
+
+def _compile(booster, version):
+    """``CompiledRanker`` of ``booster``, or None (logged) when its tables would be too large."""
+    from core.tree_eval import MAX_TABLE_ENTRIES, CompiledRanker, ModelTooLarge
+
+    try:
+        return CompiledRanker.from_booster(
+            booster, max_entries=getattr(settings, "ML_RANKER_MAX_TABLE_ENTRIES", MAX_TABLE_ENTRIES)
+        )
+    except ModelTooLarge as e:
+        logger.warning("Ranker version %s not compiled, scoring with lightgbm: %s", version, e)
+        return None
+
+
+def _load_booster(directory):
+    import lightgbm as lgb
+
+    return lgb.Booster(model_file=os.path.join(directory, MODEL_FILE))
+
+
+def version_dir(version):
+    return ML_DIR if version == LEGACY_VERSION else os.path.join(VERSIONS_DIR, version)
+
+
+def _load_version(version):
+    directory = version_dir(version)
+
+    # Timed from before the imports: importing lightgbm is most of the first load.
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+
+    import joblib
+
+    booster = compiled = None
+    compiled_path = os.path.join(directory, COMPILED_FILE)
+    if ranker_evaluator() == "numpy" and os.path.exists(compiled_path):
+        from core.tree_eval import CompiledRanker
+
+        compiled = CompiledRanker.load(compiled_path)
+    else:
+        booster = _load_booster(directory)
+        if ranker_evaluator() == "numpy":
+            compiled = _compile(booster, version)
+            if compiled is not None:
+                booster = None
+    feature_cols = joblib.load(os.path.join(directory, FEATURES_FILE))
+    load_seconds = round(time.perf_counter() - start, 4)
+    rss_delta_mb = round((_rss_bytes() - rss_before) / 2**20, 1) if rss_before is not None else None
+
+    logger.info("Loaded ranker version %s (%s) in %.3fs (RSS +%s MB)", version,
+                "numpy" if compiled is not None else "lightgbm", load_seconds, rss_delta_mb)
+    return ModelVersion(
+        version, booster, feature_cols,
+        version_metrics(version) if version != LEGACY_VERSION else {},
+        load_seconds, rss_delta_mb, compiled,
+    )
+
+
+class _Slot:
+    """The model a pointer currently names, re-checked every reload interval."""
+
+    def __init__(self, pointer, fallback=None):
+        self.pointer = pointer
+        self.fallback = fallback
+        self.model = None
+        self.version = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def _due(self):
+        interval = getattr(settings, "ML_MODEL_RELOAD_INTERVAL", 30)
+        return self.checked_at is None or (
+            interval is not None and time.monotonic() - self.checked_at >= interval
+        )
+
+    def get(self):
+        if not self._due():
+            return self.model
+        with self.lock:
+            if self._due():
+                version = read_pointer(self.pointer) or self.fallback
+                if version != self.version:
+                    try:
+                        self.model = _load_version(version) if version else None
+                        self.version = version
+                    except Exception:
+                        if self.model is None and self.pointer == "CURRENT":
+                            raise
+                        logger.exception("Could not load ranker version %s; keeping %s", version, self.version)
+                self.checked_at = time.monotonic()
+        return self.model
+
+
+_current = _Slot("CURRENT", fallback=LEGACY_VERSION)
+_shadow = _Slot("SHADOW")
+
+
+# ---------------------------------------------------------
+# 🔹 Public API
+# ---------------------------------------------------------
+def get_model():
+    """The ``ModelVersion`` serving traffic (``.predict``, ``.feature_cols``, ``.version``)."""
+    return _current.get()
+
+
+def get_shadow_model():
+    """The shadow ``ModelVersion``, or None when no SHADOW pointer is set."""
+    model = _shadow.get()
+    if model is not None and model.version == _current.version:
+        return None
+    return model
+
+
+def shadow_sample_rate():
+    return getattr(settings, "ML_SHADOW_SAMPLE_RATE", 0.0)
+
+
+def model_info():
+    def describe(model):
+        if model is None:
+            return None
+        return {
+            "version": model.version,
+            "evaluator": model.evaluator,
+            "load_seconds": model.load_seconds,
+            "rss_delta_mb": model.rss_delta_mb,
+            "metrics": model.metrics,
+        }
+
+    return {
+        "pid": os.getpid(),
+        "current": describe(_current.model),
+        "shadow": describe(_shadow.model),
+        "pointers": {"CURRENT": read_pointer("CURRENT"), "SHADOW": read_pointer("SHADOW")},
+        "versions": list_versions(),
+        "shadow_sample_rate": shadow_sample_rate(),
+        "scoring": {version: stats.summary() for version, stats in list(_stats.items())},
+    }
+
 
-MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../ml_models/lgb_ranker.txt")
-FEATURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../ml_models/feature_cols.pkl")
+def preload(freeze=True):
+    """Load the current ranker and the recommendation stack now (before forking)."""
+    import core.batch_recommender  # noqa: F401  (pandas, SQLAlchemy, NumPy)
 
-recommendation_model = lgb.Booster(model_file=MODEL_PATH)
-feature_cols = joblib.load(FEATURES_PATH)
+    get_model()
+    get_shadow_model()
+    if freeze:
+        gc.freeze()
@@ -13,6 +13,8 @@ from django.contrib.gis.geos import Point
 import requests
 from decouple import config
 import string
+
+from core import geo_grid, roles
 # ==============================
 # User Management
 # ==============================
@@ -44,6 +46,14 @@ class AuthenticatedUserManager(BaseUserManager):
         return user
 
 
+def set_grid_cell(instance, save_kwargs):
+    """Keep ``instance.grid_cell`` in step with its ``location`` (see core/geo_grid.py)."""
+    instance.grid_cell = geo_grid.cell_for_point(instance.location)
+    update_fields = save_kwargs.get("update_fields")
+    if update_fields is not None and "location" in update_fields and "grid_cell" not in update_fields:
+        save_kwargs["update_fields"] = [*update_fields, "grid_cell"]
+
+
 class AuthenticatedUser(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
     name = models.CharField(max_length=150, blank=True)
@@ -53,6 +63,7 @@ class AuthenticatedUser(AbstractBaseUser, PermissionsMixin):
     phone = PhoneNumberField(blank=True, default="", max_length=30)
     address = models.CharField(max_length=255, blank=True)
     location = gis_models.PointField(geography=True, null=True, blank=True)
+    grid_cell = models.BigIntegerField(null=True, blank=True, editable=False, db_index=True)
     is_verifier = models.BooleanField(default=False)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['name']
@@ -62,16 +73,17 @@ class AuthenticatedUser(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.name or self.email
 
+    def save(self, *args, **kwargs):
+        set_grid_cell(self, kwargs)
+        super().save(*args, **kwargs)
+
     def is_profile_complete(self):
         return all([self.name, self.phone, self.address, self.location])
 
     @property
     def role(self):
-        user_role, created = UserRole.objects.get_or_create(
-            user=self,
-            defaults={'role': 'customer'}
-        )
-        return user_role.role
+        # Oldest role, cached per request and per user (core/roles.py); 'customer' if none yet
+        return roles.primary_role(self)
 
 
 class UserRole(models.Model):
@@ -690,6 +702,7 @@ class Worker(models.Model):
 
     address = models.TextField(blank=True, null=True)
     location = gis_models.PointField(geography=True, null=True, blank=True)
+    grid_cell = models.BigIntegerField(null=True, blank=True, editable=False, db_index=True)
     is_available = models.BooleanField(default=True)
     allows_cod = models.BooleanField(default=False)
     experience_years = models.PositiveIntegerField(default=0)
@@ -712,13 +725,16 @@ class Worker(models.Model):
         # return worker.address if available, else use user's address
         return self.address or self.user.address or "Address not provided"
     def update_average_rating(self):
-        """Recalculate average rating based on all reviews."""
-        reviews = self.userreview_set.filter(rating__isnull=False)
-        agg = reviews.aggregate(avg_rating=models.Avg("rating"), total=models.Count("id"))
-        self.average_rating = round(agg["avg_rating"] or 0.0, 2)
-        self.total_reviews = agg["total"] or 0
+        """Refresh average rating from the feature store's running review sums."""
+        features = WorkerFeatures.objects.filter(worker=self).first()
+        self.average_rating = round(features.avg_rating, 2) if features else 0.0
+        self.total_reviews = features.review_count if features else 0
         self.save(update_fields=["average_rating", "total_reviews"])
 
+    def save(self, *args, **kwargs):
+        set_grid_cell(self, kwargs)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.worker_name
 
@@ -736,6 +752,10 @@ class WorkerService(models.Model):
     class Meta:
         unique_together = ('worker', 'service')
         db_table = 'worker_services'
+        indexes = [
+            # Service-first lookups (recommendations filtered by ?service=)
+            models.Index(fields=['service', 'worker'], name='worker_svc_service_worker_idx'),
+        ]
         verbose_name = 'Worker Service'
         verbose_name_plural = 'Worker Services'
 
@@ -792,6 +812,9 @@ class Booking(models.Model):
         db_table = 'bookings'
         verbose_name = 'Booking'
         verbose_name_plural = 'Bookings'
+        indexes = [
+            models.Index(fields=['user', 'status'], name='bookings_user_status_idx'),
+        ]
 
     def __str__(self):
         return f"Booking #{self.id} - {self.user.name} - {self.service.service_type}"
@@ -916,7 +939,50 @@ class UserWorkerData(models.Model):
         return f"{self.user} → {self.worker} ({self.service_name})"
 
 
-@receiver(post_save, sender=Booking)
+# ==============================
+# Feature Store
+# ==============================
+
+class WorkerFeatures(models.Model):
+    """Per-worker aggregates kept up to date from booking / review events (core/feature_store.py)."""
+    worker = models.OneToOneField(Worker, on_delete=models.CASCADE, primary_key=True, related_name='features')
+    completed_bookings = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'worker_features'
+
+    @property
+    def avg_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else 0.0
+
+    def __str__(self):
+        return f"Features of worker #{self.worker_id}"
+
+
+class UserFeatures(models.Model):
+    """Per-user aggregates kept up to date from booking / review events (core/feature_store.py)."""
+    user = models.OneToOneField(AuthenticatedUser, on_delete=models.CASCADE, primary_key=True, related_name='features')
+    completed_bookings = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.FloatField(default=0.0)  # ratings the user has given
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'user_features'
+
+    @property
+    def avg_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else 0.0
+
+    def __str__(self):
+        return f"Features of user #{self.user_id}"
+
+
+# Connected in core.signals after the feature-store handlers, so the counts read
+# here already include this booking.
 def update_worker_data(sender, instance, **kwargs):
     booking = instance
     service = booking.service
@@ -926,10 +992,10 @@ def update_worker_data(sender, instance, **kwargs):
     if not (worker and service):
         return
 
-    # ✅ Aggregate more realistic data
-    avg_rating = worker.userreview_set.aggregate(avg=Avg('rating'))['avg'] or 0.0
-    total_bookings = worker.bookings.filter(status='completed').count()
-    total_earnings = worker.earnings.aggregate(total=Avg('amount'))['total'] or 0
+    # ✅ Aggregates come precomputed from the feature store
+    features = WorkerFeatures.objects.filter(worker=worker).first()
+    avg_rating = features.avg_rating if features else 0.0
+    total_bookings = features.completed_bookings if features else 0
 
     # ✅ Add some controlled variation to avoid identical data
     experience_factor = worker.experience_years + (total_bookings // 5)
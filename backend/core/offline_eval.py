@@ -0,0 +1,215 @@
+# core/offline_eval.py
+"""
+Offline replay evaluation of recommender strategies.
+
+A replay is a time-ordered table of completed bookings (``EVENT_COLUMNS``)
+plus the candidate pool (a ``CandidateSnapshot``, one row per worker and
+service). For every booking, ``run_replay`` rebuilds the list the user would
+have been shown at booking time:
+
+* the candidates are the pool rows of the ``k`` nearest workers, like
+  ``retrieve_nearest`` without its radius schedule;
+* ``num_bookings`` is each worker's count of completed bookings *before* the
+  event, and the user's history is their earlier completed bookings. Both
+  are replayed from the events themselves.
+
+Each strategy (``(cand, lat, lon, history) -> scores``) then scores that
+list. The booked (worker, service) row is the relevant one. NDCG@k, MRR and
+recall@k (``core.ranking_metrics``) are taken over the events whose booked
+row was retrieved. ``coverage`` is the share of such events, and it is the
+same for every strategy. Latency covers the scoring call only; retrieval is
+shared and is not timed.
+
+``synthetic_replay`` generates a reproducible dataset whose bookings follow a
+known utility, so results can be compared offline without a database.
+``database_replay`` reads the real bookings. Worker ratings there are
+current values, not as of the booking.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from core import distance
+from core.candidates import CandidateSnapshot, load_candidates
+from core.db import get_engine
+from core.ranking_metrics import mean_reciprocal_rank, ndcg_at_k, recall_at_k
+from core.recommender import score_candidates, score_candidates_with_model
+from core.utils import haversine_vector
+
+EVENT_COLUMNS = ["user_id", "lat", "lon", "worker_id", "service_id", "worker_rating"]
+HISTORY_COLUMNS = ["worker_id", "service_id", "worker_rating"]
+
+EVENTS_SQL = text("""
+    SELECT b.user_id,
+           ST_Y(COALESCE(b.job_location, u.location)::geometry) AS lat,
+           ST_X(COALESCE(b.job_location, u.location)::geometry) AS lon,
+           b.worker_id, b.service_id, w.average_rating AS worker_rating
+    FROM bookings b
+    JOIN core_authenticateduser u ON u.id = b.user_id
+    JOIN workers w ON w.id = b.worker_id
+    WHERE b.status = 'completed'
+      AND COALESCE(b.job_location, u.location) IS NOT NULL
+    ORDER BY b.booking_time, b.id;
+""")
+
+
+# ---------------------------------------------------------
+# 🔹 Strategies
+# ---------------------------------------------------------
+def heuristic_strategy(cand, lat, lon, history):
+    return score_candidates(cand, lat, lon, history)["final_rank_score"]
+
+
+def model_strategy(model):
+    """Score with a ``ModelVersion`` (or anything with ``predict`` and ``feature_cols``)."""
+    def score(cand, lat, lon, history):
+        return score_candidates_with_model(cand, lat, lon, history, model, model.feature_cols)["final_rank_score"]
+    return score
+
+
+def distance_strategy(cand, lat, lon, history):
+    return -distance.haversine_km(lat, lon, cand.points())
+
+
+def random_strategy(seed=0):
+    rng = np.random.default_rng(seed)
+    return lambda cand, lat, lon, history: rng.random(cand.size)
+
+
+# ---------------------------------------------------------
+# 🔹 Datasets
+# ---------------------------------------------------------
+def nearest_workers(pool, lat, lon, k):
+    """Indices of the pool rows of the ``k`` nearest workers, nearest first."""
+    order = np.argsort(distance.haversine_km(lat, lon, pool.points()), kind="stable")
+    workers = pool.worker_id[order]
+    _, first = np.unique(workers, return_index=True)
+    is_first = np.zeros(len(order), dtype=bool)
+    is_first[first] = True
+    return order[np.cumsum(is_first) <= k]
+
+
+def synthetic_replay(n_workers=2_000, n_users=500, n_events=5_000, n_services=8, k=200, seed=42):
+    """
+    A candidate pool and booking events drawn from a known utility: users
+    prefer near, well-rated, already popular workers offering one of their
+    preferred services, with Gumbel noise.
+    """
+    rng = np.random.default_rng(seed)
+    center_lat, center_lon = 12.97, 77.59
+
+    services_per_worker = rng.integers(1, 3, size=n_workers)
+    worker_id = np.repeat(np.arange(1, n_workers + 1), services_per_worker)
+    rows = len(worker_id)
+    lat = np.repeat(center_lat + rng.uniform(-0.25, 0.25, size=n_workers), services_per_worker)
+    lon = np.repeat(center_lon + rng.uniform(-0.25, 0.25, size=n_workers), services_per_worker)
+    rating = np.repeat(rng.uniform(2.5, 5.0, size=n_workers), services_per_worker)
+    pool = CandidateSnapshot({
+        "worker_id": worker_id,
+        "worker_name": np.full(rows, "worker", dtype=object),
+        "service_id": rng.integers(1, n_services + 1, size=rows),
+        "service_name": np.full(rows, "service", dtype=object),
+        "worker_lat": lat,
+        "worker_lon": lon,
+        "num_bookings": np.zeros(rows, dtype=np.int64),
+        "total_rating": rating,
+        "charge": rng.uniform(100, 1000, size=rows),
+        "is_available": np.ones(rows, dtype=bool),
+        "profile_image": np.full(rows, None, dtype=object),
+        "address": np.full(rows, None, dtype=object),
+    })
+
+    user_lat = center_lat + rng.uniform(-0.25, 0.25, size=n_users)
+    user_lon = center_lon + rng.uniform(-0.25, 0.25, size=n_users)
+    preferred = rng.random((n_users, n_services + 1)) < 0.25
+    completed = np.zeros(n_workers + 1)
+
+    events = []
+    for user in rng.integers(0, n_users, size=n_events):
+        near = nearest_workers(pool, user_lat[user], user_lon[user], k)
+        cand = pool.take(near)
+        utility = (
+            -haversine_vector(user_lat[user], user_lon[user], cand.worker_lat, cand.worker_lon) / 2.0
+            + 0.8 * cand.total_rating
+            + 2.0 * preferred[user, cand.service_id]
+            - 0.001 * cand.charge
+            + 0.4 * np.log1p(completed[cand.worker_id])
+            + rng.gumbel(size=cand.size)
+        )
+        pick = int(np.argmax(utility))
+        completed[cand.worker_id[pick]] += 1
+        events.append((user + 1, user_lat[user], user_lon[user],
+                       cand.worker_id[pick], cand.service_id[pick], cand.total_rating[pick]))
+    return pool, pd.DataFrame(events, columns=EVENT_COLUMNS)
+
+
+def database_replay(engine=None):
+    """Current candidate pool (all workers, available or not) and every completed booking in time order."""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        events = pd.read_sql(EVENTS_SQL, conn)
+    return load_candidates(engine), events
+
+
+# ---------------------------------------------------------
+# 🔹 Replay
+# ---------------------------------------------------------
+def run_replay(pool, events, strategies, k=200, cutoffs=(1, 5, 10), evaluate_last=None):
+    """
+    Replay ``events`` against ``strategies`` (name -> scorer). All events
+    advance the booking counts and histories. Only the last
+    ``evaluate_last`` events (default all) are scored. Returns
+    ``{"events", "covered", "coverage", "strategies": {name: metrics}}``.
+    """
+    workers, pool_pos = np.unique(pool.worker_id, return_inverse=True)
+    completed = np.zeros(len(workers), dtype=np.int64)
+    histories = {}
+    first_scored = len(events) - evaluate_last if evaluate_last else 0
+
+    group, relevant = [], []
+    scores = {name: [] for name in strategies}
+    latency = {name: [] for name in strategies}
+    scored = 0
+
+    for i, event in enumerate(events.itertuples(index=False)):
+        if i >= first_scored:
+            scored += 1
+            rows = nearest_workers(pool, event.lat, event.lon, k)
+            cand = pool.take(rows)
+            cand.columns["num_bookings"] = completed[pool_pos[rows]]
+            history = pd.DataFrame(histories.get(event.user_id, []), columns=HISTORY_COLUMNS)
+            hit = (cand.worker_id == event.worker_id) & (cand.service_id == event.service_id)
+
+            for name, strategy in strategies.items():
+                start = time.perf_counter()
+                result = strategy(cand, event.lat, event.lon, history)
+                latency[name].append(time.perf_counter() - start)
+                if hit.any():
+                    scores[name].append(np.asarray(result, dtype=np.float64))
+            if hit.any():
+                group.append(np.full(cand.size, i))
+                relevant.append(hit)
+
+        pos = np.searchsorted(workers, event.worker_id)
+        if pos < len(workers) and workers[pos] == event.worker_id:
+            completed[pos] += 1
+        histories.setdefault(event.user_id, []).append(
+            (event.worker_id, event.service_id, event.worker_rating)
+        )
+
+    report = {"events": scored, "covered": len(group), "coverage": len(group) / scored if scored else 0.0,
+              "strategies": {}}
+    group = np.concatenate(group) if group else np.zeros(0, dtype=np.int64)
+    relevant = np.concatenate(relevant) if relevant else np.zeros(0, dtype=bool)
+    for name in strategies:
+        score = np.concatenate(scores[name]) if scores[name] else np.zeros(0)
+        ms = np.asarray(latency[name]) * 1000
+        metrics = {f"ndcg@{c}": ndcg_at_k(group, score, relevant, c) for c in cutoffs}
+        metrics["mrr"] = mean_reciprocal_rank(group, score, relevant)
+        metrics.update({f"recall@{c}": recall_at_k(group, score, relevant, c) for c in cutoffs})
+        for p in (50, 95, 99):
+            metrics[f"p{p}_ms"] = float(np.percentile(ms, p)) if len(ms) else 0.0
+        report["strategies"][name] = metrics
+    return report
@@ -0,0 +1,48 @@
+# core/parsers.py
+"""
+DRF parsers for the encrypted request envelope (``core.crypto``).
+
+``{"key" | "kid": ..., "data": {name: base64(IV + AES-CBC)}}`` is decrypted
+once, while DRF parses the body, so ``request.data`` of a view using
+``ENCRYPTED_PARSERS`` is the plain ``{name: str}``. Multipart forms send
+``data`` as a JSON string; their files stay in ``request.FILES``.
+
+A bad envelope (no key or data, unknown ``kid``, a field that does not
+decrypt) raises ``ParseError``. The response is 400 with ``{"error": ...}``,
+the shape the views returned before. The decryption time is recorded as
+the ``decrypt`` phase of the ``Server-Timing`` header (``core.middleware``).
+"""
+import time
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, JSONParser, MultiPartParser
+
+from core.crypto import EnvelopeError, decrypt_envelope
+from core.middleware import record_timing
+
+
+class EncryptedPayloadMixin:
+    def parse(self, stream, media_type=None, parser_context=None):
+        parsed = super().parse(stream, media_type, parser_context)
+        request = parser_context["request"]
+        files = getattr(parsed, "files", None)
+
+        start = time.perf_counter()
+        try:
+            data = decrypt_envelope(request, getattr(parsed, "data", parsed))
+        except EnvelopeError as e:
+            raise ParseError({"error": str(e)})
+        finally:
+            record_timing(request, "decrypt", time.perf_counter() - start)
+        return DataAndFiles(data, files) if files is not None else data
+
+
+class EncryptedJSONParser(EncryptedPayloadMixin, JSONParser):
+    pass
+
+
+class EncryptedMultiPartParser(EncryptedPayloadMixin, MultiPartParser):
+    pass
+
+
+ENCRYPTED_PARSERS = [EncryptedJSONParser, EncryptedMultiPartParser]
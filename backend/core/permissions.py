@@ -1,5 +1,5 @@
 from rest_framework.permissions import BasePermission
-from .models import UserRole
+from . import roles
 
 
 class IsVerifier1(BasePermission):
@@ -11,16 +11,13 @@ class IsVerifier1(BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         
-        # Check if user has verifier1 role
-        return UserRole.objects.filter(
-            user=request.user,
-            role='verifier1'
-        ).exists()
+        # Check if user has verifier1 role (cached, see core/roles.py)
+        return roles.has_role(request.user, 'verifier1')
 
 
 class IsVerifier2(BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and getattr(request.user, 'role', '') == 'verifier2'
+        return request.user.is_authenticated and roles.has_role(request.user, 'verifier2')
 
 
 class IsVerifier3(BasePermission):
@@ -32,10 +29,7 @@ class IsVerifier3(BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         
-        return UserRole.objects.filter(
-            user=request.user,
-            role='verifier3'
-        ).exists()
+        return roles.has_role(request.user, 'verifier3')
 
 
 class IsAdmin(BasePermission):
@@ -47,7 +41,4 @@ class IsAdmin(BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         
-        return UserRole.objects.filter(
-            user=request.user,
-            role='admin'
-        ).exists() or request.user.is_staff
+        return request.user.is_staff or roles.has_role(request.user, 'admin')
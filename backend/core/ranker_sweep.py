@@ -0,0 +1,222 @@
+# core/ranker_sweep.py
+"""
+Parallel hyperparameter sweep for the LightGBM ranker (``train_model --sweep``).
+
+* ``prepare_folds`` splits the training cache's users into folds. It builds
+  each fold's train / validation ``lgb.Dataset`` once and saves it as a
+  LightGBM binary. It also saves the validation features, labels and user ids
+  as ``.npy`` files. Trials load the binaries, so no trial re-bins the data.
+* ``run_sweep`` trains every (configuration, fold) pair on a process pool.
+  Each run gets ``num_threads = threads_per_run`` and the pool holds
+  ``cpu_count // threads_per_run`` processes, so the machine is used fully
+  without oversubscription. The pool uses ``spawn``: forking a process whose
+  OpenMP runtime LightGBM has already started can deadlock.
+* For each configuration, the mean NDCG@k, MRR and MAP over its folds, the
+  best iteration and the train time go to a JSON-lines results file as soon
+  as its last fold finishes.
+
+This module only imports NumPy, LightGBM and ``core.ranking_metrics`` at the
+top level, so spawned workers start without Django.
+"""
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+import lightgbm as lgb
+import numpy as np
+
+from core.ranking_metrics import mean_average_precision, mean_reciprocal_rank
+
+SEARCH_SPACE = {
+    "learning_rate": [0.01, 0.03, 0.1],
+    "num_leaves": [5, 15, 31],
+    "max_depth": [3, 5, -1],
+    "min_data_in_leaf": [100, 1000],
+    "feature_fraction": [0.5, 0.8, 1.0],
+    "bagging_fraction": [0.5, 0.8, 1.0],
+    "lambda_l2": [0.0, 1.0],
+}
+
+# Dataset construction must not depend on the swept params: with
+# feature_pre_filter the binary would bake in one min_data_in_leaf.
+DATASET_PARAMS = {"feature_pre_filter": False, "verbose": -1}
+
+
+# ---------------------------------------------------------
+# 🔹 Configurations
+# ---------------------------------------------------------
+def grid_configs(space):
+    keys = sorted(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_configs(space, trials, seed=42):
+    """``trials`` distinct configurations drawn uniformly from ``space``."""
+    rng = np.random.default_rng(seed)
+    keys = sorted(space)
+    total = int(np.prod([len(space[k]) for k in keys])) if keys else 1
+    configs, seen = [], set()
+    while len(configs) < min(trials, total):
+        values = tuple(space[k][rng.integers(len(space[k]))] for k in keys)
+        if values not in seen:
+            seen.add(values)
+            configs.append(dict(zip(keys, values)))
+    return configs
+
+
+# ---------------------------------------------------------
+# 🔹 Folds
+# ---------------------------------------------------------
+def _ranges(starts, sizes, idx):
+    return list(zip(starts[idx].tolist(), (starts[idx] + sizes[idx]).tolist()))
+
+
+def fold_indices(n_groups, n_folds, seed=42):
+    """``[(train_idx, valid_idx)]`` over query groups (users never span train and valid)."""
+    if n_groups < 2:
+        idx = np.arange(n_groups)
+        return [(idx, idx)]
+    rng = np.random.default_rng(seed)
+    if n_folds <= 1:
+        perm = rng.permutation(n_groups)
+        n_valid = max(1, int(round(0.2 * n_groups)))
+        return [(np.sort(perm[n_valid:]), np.sort(perm[:n_valid]))]
+    parts = np.array_split(rng.permutation(n_groups), min(n_folds, n_groups))
+    return [
+        (np.sort(np.concatenate(parts[:i] + parts[i + 1:])), np.sort(valid))
+        for i, valid in enumerate(parts)
+    ]
+
+
+def prepare_folds(cache, directory, feature_cols, categorical_features, n_folds=3, batch_size=None, seed=42):
+    """Write each fold's Dataset binaries and validation arrays under ``directory``."""
+    os.makedirs(directory, exist_ok=True)
+    users, starts, sizes = cache.user_groups()
+    folds = []
+    for i, (train_idx, valid_idx) in enumerate(fold_indices(len(users), n_folds, seed)):
+        train_ranges, valid_ranges = _ranges(starts, sizes, train_idx), _ranges(starts, sizes, valid_idx)
+        paths = {name: os.path.join(directory, f"fold{i}_{name}") for name in
+                 ("train.bin", "valid.bin", "valid_X.npy", "valid_y.npy", "valid_users.npy")}
+
+        train = lgb.Dataset(
+            cache.sequence(feature_cols, train_ranges, batch_size),
+            label=cache.gather("relevance_int", train_ranges), group=sizes[train_idx],
+            feature_name=feature_cols, categorical_feature=categorical_features, params=DATASET_PARAMS,
+        )
+        valid_seq = cache.sequence(feature_cols, valid_ranges, batch_size)
+        valid_y = cache.gather("relevance_int", valid_ranges)
+        valid = lgb.Dataset(
+            valid_seq, label=valid_y, group=sizes[valid_idx], reference=train,
+            feature_name=feature_cols, categorical_feature=categorical_features, params=DATASET_PARAMS,
+        )
+        train.save_binary(paths["train.bin"])
+        valid.save_binary(paths["valid.bin"])
+
+        matrix = np.lib.format.open_memmap(paths["valid_X.npy"], mode="w+", dtype=np.float64,
+                                           shape=(len(valid_seq), len(feature_cols)))
+        row = 0
+        for batch in valid_seq.batches():
+            matrix[row:row + len(batch)] = batch
+            row += len(batch)
+        matrix.flush()
+        del matrix
+        np.save(paths["valid_y.npy"], valid_y)
+        np.save(paths["valid_users.npy"], np.repeat(users[valid_idx], sizes[valid_idx]))
+
+        folds.append({"fold": i, "train_rows": len(train.get_label()), "valid_rows": len(valid_y), **paths})
+    return folds
+
+
+# ---------------------------------------------------------
+# 🔹 Trials
+# ---------------------------------------------------------
+def run_trial(task):
+    """Train one configuration on one fold (runs in a pool process)."""
+    fold, params = task["fold"], task["params"]
+    train = lgb.Dataset(fold["train.bin"], params=DATASET_PARAMS)
+    valid = lgb.Dataset(fold["valid.bin"], reference=train, params=DATASET_PARAMS)
+
+    evals = {}
+    start = time.perf_counter()
+    model = lgb.train(
+        params, train,
+        num_boost_round=task["num_boost_round"],
+        valid_sets=[valid], valid_names=["valid"],
+        callbacks=[lgb.early_stopping(task["early_stopping"], verbose=False),
+                   lgb.record_evaluation(evals)],
+    )
+    train_seconds = time.perf_counter() - start
+
+    best = model.best_iteration or model.current_iteration()
+    matrix = np.load(fold["valid_X.npy"], mmap_mode="r")
+    step = task["predict_batch"]
+    pred = np.concatenate(
+        [model.predict(matrix[lo:lo + step], num_iteration=best) for lo in range(0, len(matrix), step)]
+    ) if len(matrix) else np.zeros(0)
+    relevant = np.load(fold["valid_y.npy"]) >= task["relevance_threshold"]
+    user_ids = np.load(fold["valid_users.npy"])
+
+    result = {
+        "config_id": task["config_id"],
+        "fold": fold["fold"],
+        "best_iteration": best,
+        "train_seconds": round(train_seconds, 3),
+        "mrr": mean_reciprocal_rank(user_ids, pred, relevant),
+        "map": mean_average_precision(user_ids, pred, relevant),
+    }
+    for name, values in evals.get("valid", {}).items():
+        result[name] = values[best - 1]
+    return result
+
+
+def _summarise(config_id, config, results):
+    summary = {"config_id": config_id, "params": config, "folds": len(results)}
+    for key in sorted(results[0]):
+        if key in ("config_id", "fold"):
+            continue
+        summary[key] = round(float(np.mean([r[key] for r in results])), 6)
+    summary["fold_results"] = sorted(results, key=lambda r: r["fold"])
+    return summary
+
+
+def run_sweep(configs, folds, base_params, output, threads_per_run=1, jobs=None,
+              num_boost_round=1000, early_stopping=100, relevance_threshold=3, predict_batch=100_000,
+              on_result=None):
+    """Run every (config, fold); append one summary per config to ``output`` (JSON lines)."""
+    jobs = jobs or max(1, (os.cpu_count() or 1) // threads_per_run)
+    pending = {i: [] for i in range(len(configs))}
+    summaries = []
+
+    tasks = [
+        {
+            "config_id": i,
+            "fold": fold,
+            "params": {**base_params, **config, "num_threads": threads_per_run, "verbose": -1},
+            "num_boost_round": num_boost_round,
+            "early_stopping": early_stopping,
+            "relevance_threshold": relevance_threshold,
+            "predict_batch": predict_batch,
+        }
+        for i, config in enumerate(configs)
+        for fold in folds
+    ]
+
+    context = multiprocessing.get_context("spawn")
+    with open(output, "a") as out, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=context) as pool:
+        futures = [pool.submit(run_trial, task) for task in tasks]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            config_id = result["config_id"]
+            pending[config_id].append(result)
+            if len(pending[config_id]) == len(folds):
+                summary = _summarise(config_id, configs[config_id], pending.pop(config_id))
+                out.write(json.dumps(summary) + "\n")
+                out.flush()
+                summaries.append(summary)
+                if on_result:
+                    on_result(summary)
+    return summaries
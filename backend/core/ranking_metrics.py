@@ -0,0 +1,91 @@
+# core/ranking_metrics.py
+"""
+Vectorised per-user ranking metrics.
+
+Every function takes flat, row-aligned arrays: ``user_ids``, model
+``scores`` and a boolean ``relevant``. Rows are ranked per user by
+descending score in one ``lexsort``, so ties keep their input order. The
+per-user ranks and running counts come from ``cumsum`` over the sorted
+arrays, not from a Python loop over ``groupby`` groups.
+"""
+import numpy as np
+
+
+class RankedGroups:
+    """Rows sorted by (user, score desc) with their 1-based rank inside the user's list."""
+
+    def __init__(self, user_ids, scores, relevant):
+        user_ids = np.asarray(user_ids)
+        scores = np.asarray(scores, dtype=np.float64)
+        order = np.lexsort((-scores, user_ids))
+
+        users = user_ids[order]
+        first = np.ones(len(users), dtype=bool)
+        first[1:] = users[1:] != users[:-1]
+
+        self.order = order
+        self.starts = np.flatnonzero(first)
+        self.sizes = np.diff(np.append(self.starts, len(users)))
+        self.group = np.cumsum(first) - 1
+        self.rank = np.arange(1, len(users) + 1) - self.starts[self.group]
+        self.relevant = np.asarray(relevant, dtype=bool)[order]
+
+    def sorted(self, values):
+        """``values`` (row-aligned with the input) in ranked order."""
+        return np.asarray(values, dtype=np.float64)[self.order]
+
+    def per_user_sum(self, values):
+        if not len(self.starts):
+            return np.zeros(0)
+        return np.add.reduceat(values, self.starts)
+
+    def cumulative_relevant(self):
+        """Relevant rows at or above each row's rank, within its user."""
+        running = np.cumsum(self.relevant)
+        before = running[self.starts] - self.relevant[self.starts]
+        return running - before[self.group]
+
+
+def mean_reciprocal_rank(user_ids, scores, relevant):
+    """Mean of 1 / rank of each user's first relevant row (users without one are skipped)."""
+    ranked = RankedGroups(user_ids, scores, relevant)
+    if not len(ranked.starts):
+        return 0.0
+    ranks = np.where(ranked.relevant, ranked.rank, np.inf)
+    first = np.minimum.reduceat(ranks, ranked.starts)
+    first = first[np.isfinite(first)]
+    return float(np.mean(1.0 / first)) if first.size else 0.0
+
+
+def mean_average_precision(user_ids, scores, relevant):
+    """Mean over users with a relevant row of the average precision at each relevant rank."""
+    ranked = RankedGroups(user_ids, scores, relevant)
+    precision = ranked.cumulative_relevant() / ranked.rank
+    hits = ranked.per_user_sum(ranked.relevant.astype(np.float64))
+    ap_sum = ranked.per_user_sum(np.where(ranked.relevant, precision, 0.0))
+    mask = hits > 0
+    return float(np.mean(ap_sum[mask] / hits[mask])) if mask.any() else 0.0
+
+
+def ndcg_at_k(user_ids, scores, relevance, k):
+    """Mean NDCG@k with linear gains (LightGBM's ``label_gain = [0, 1, 2, ...]``) over users with a relevant row."""
+    relevance = np.asarray(relevance, dtype=np.float64)
+    ranked = RankedGroups(user_ids, scores, relevance > 0)
+    ideal = RankedGroups(user_ids, relevance, relevance > 0)
+
+    def dcg(groups):
+        discount = np.where(groups.rank <= k, 1.0 / np.log2(groups.rank + 1.0), 0.0)
+        return groups.per_user_sum(groups.sorted(relevance) * discount)
+
+    actual, best = dcg(ranked), dcg(ideal)
+    mask = best > 0
+    return float(np.mean(actual[mask] / best[mask])) if mask.any() else 0.0
+
+
+def recall_at_k(user_ids, scores, relevant, k):
+    """Mean share of each user's relevant rows ranked in the top ``k`` (users without one are skipped)."""
+    ranked = RankedGroups(user_ids, scores, relevant)
+    hits = ranked.per_user_sum(ranked.relevant.astype(np.float64))
+    found = ranked.per_user_sum((ranked.relevant & (ranked.rank <= k)).astype(np.float64))
+    mask = hits > 0
+    return float(np.mean(found[mask] / hits[mask])) if mask.any() else 0.0
@@ -0,0 +1,229 @@
+# core/rec_cache.py
+"""
+Cache of finished recommendation lists.
+
+Entries live in the Django cache named by ``RECOMMENDER_RESULT_CACHE['ALIAS']``
+(the database cache by default, Redis for lower latency). That backend must be
+shared by every process: a change saved by one web worker, or lists warmed by
+``manage.py warm_recommendations``, only reach the others through it. A
+process-local backend (``LocMemCache``) is only fit for a single-process dev
+server; ``is_shared()`` tells them apart. Keys embed
+two generation counters: one for the user, one for the user's service area (a
+``core.geo_grid`` cell of ``AREA_CELL_DEG``). Invalidation never deletes
+entries. It bumps a generation so the old keys are simply never read again and
+expire by TTL:
+
+* the user's generation changes with their location or completed bookings;
+* an area's generation changes when a worker within retrieval reach of it
+  changes (location, availability, rating, bookings). The reach is
+  ``RECOMMENDER_RETRIEVAL['MAX_RADIUS_KM']``, the farthest the adaptive radius
+  goes. A worker that moves invalidates the areas around both locations.
+
+A user with fewer than ``MIN_CANDIDATES`` workers within that radius falls
+back to an unbounded nearest-neighbour search. Their list can include workers
+beyond the reach, whose changes then show only once the entry expires (TTL).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from core import geo_grid
+
+DEFAULTS = {
+    "ALIAS": "recommendations",
+    "TTL": 600,
+    "AREA_CELL_DEG": 0.5,   # ~55 km cells: ~25 generations cover the 80 km reach
+    "WARM_USERS": 500,
+}
+
+STATS_KEYS = ("rec:stats:hits", "rec:stats:misses")
+
+# Backends whose entries never leave the process that wrote them.
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def cache_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, "RECOMMENDER_RESULT_CACHE", {}))
+    return conf
+
+
+def enabled():
+    return bool(cache_settings()["TTL"])
+
+
+def _cache():
+    return caches[cache_settings()["ALIAS"]]
+
+
+def is_shared():
+    """Whether the cache backend is visible to every process (not local memory)."""
+    return not isinstance(_cache(), PROCESS_LOCAL_BACKENDS)
+
+
+# ---------------------------------------------------------
+# 🔹 Keys & generations
+# ---------------------------------------------------------
+def area_cell(lat, lon):
+    return geo_grid.cell_id(lat, lon, cache_settings()["AREA_CELL_DEG"])
+
+
+def _user_gen_key(user_id):
+    return f"rec:gen:user:{user_id}"
+
+
+def _area_gen_key(cell):
+    return f"rec:gen:area:{cell}"
+
+
+def _bump(cache, key):
+    # A generation that was evicted restarts from the clock, never from a value
+    # an older entry may still be keyed with.
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def _generations(cache, keys):
+    gens = cache.get_many(keys)
+    for key in keys:
+        if key not in gens:
+            cache.add(key, time.time_ns(), timeout=None)
+            gens[key] = cache.get(key)
+    return [gens[key] for key in keys]
+
+
+def result_key(user_id, location, scorer, top_n, service_id=None, model_version=None):
+    """
+    Key of one cached list. Lists ranked by the model also carry the serving
+    version, so moving the CURRENT pointer retires them at once.
+    """
+    cell = area_cell(*location)
+    user_gen, area_gen = _generations(_cache(), [_user_gen_key(user_id), _area_gen_key(cell)])
+    service = "all" if service_id is None else service_id
+    ranker = scorer if model_version is None else f"{scorer}@{model_version}"
+    return f"rec:v5:{user_id}:{ranker}:{top_n}:{service}:{cell}:{user_gen}:{area_gen}"
+
+
+def _model_version(scorer, model):
+    return getattr(model, "version", None) if scorer == "model" else None
+
+
+def _count(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+# ---------------------------------------------------------
+# 🔹 Read / write
+# ---------------------------------------------------------
+def get_recommendations(user_id, model, engine, top_n=10, scorer="heuristic", feature_cols=None,
+                        shadow=False, service_id=None):
+    """
+    Cached ``recommend_top_n_for_user``. With ``shadow``, requests picked by
+    ``shadow_sampled()`` skip the cache read so the shadow ranker scores them
+    too; the sample is a fraction of all requests, not of misses.
+    """
+    from core.recommender import get_user_location, recommend_top_n_for_user, shadow_sampled
+
+    conf = cache_settings()
+    shadow = shadow and shadow_sampled()
+    if not conf["TTL"]:
+        return recommend_top_n_for_user(user_id, model, engine, top_n, scorer, feature_cols, shadow, service_id)
+
+    location = get_user_location(user_id, engine)
+    if not location:
+        return []
+
+    key = result_key(user_id, location, scorer, top_n, service_id, _model_version(scorer, model))
+    recommendations = None if shadow else _cache().get(key)
+    if recommendations is not None:
+        _count("rec:stats:hits")
+        return recommendations
+
+    _count("rec:stats:misses")
+    recommendations = recommend_top_n_for_user(
+        user_id, model, engine, top_n, scorer, feature_cols, shadow, service_id
+    )
+    _cache().set(key, recommendations, conf["TTL"])
+    return recommendations
+
+
+def refresh_recommendations(user_id, model, engine, top_n=10, scorer="heuristic", feature_cols=None):
+    """
+    Recompute the list ``get_recommendations`` serves and cache it, whether or
+    not an entry exists (used by ``warm_recommendations``). Returns the list.
+    """
+    from core.recommender import get_user_location, recommend_top_n_for_user
+
+    conf = cache_settings()
+    location = get_user_location(user_id, engine)
+    if not conf["TTL"] or not location:
+        return []
+
+    key = result_key(user_id, location, scorer, top_n, model_version=_model_version(scorer, model))
+    recommendations = recommend_top_n_for_user(user_id, model, engine, top_n, scorer, feature_cols)
+    _cache().set(key, recommendations, conf["TTL"])
+    return recommendations
+
+
+# ---------------------------------------------------------
+# 🔹 Invalidation
+# ---------------------------------------------------------
+def invalidate_user(user_id):
+    _bump(_cache(), _user_gen_key(user_id))
+
+
+def reach_km():
+    """How far from a user retrieval looks for workers, before the unbounded fallback."""
+    return getattr(settings, "RECOMMENDER_RETRIEVAL", {}).get("MAX_RADIUS_KM", 80)
+
+
+def invalidate_area(lat, lon):
+    """Invalidate every area cell within ``reach_km()`` of ``(lat, lon)``."""
+    cells = geo_grid.neighbour_cells(lat, lon, reach_km(), cache_settings()["AREA_CELL_DEG"])
+    # One set_many for the whole block (one round trip on Redis, a few queries
+    # per key on the database cache, hence the coarse cells). Any new value
+    # retires the old keys, and the clock never hands out a value an older entry
+    # may still be keyed with.
+    generation = time.time_ns()
+    _cache().set_many({_area_gen_key(cell): generation for cell in cells}, timeout=None)
+
+
+def invalidate_locations(*points):
+    """``invalidate_area`` around each GEOS point (x = lon, y = lat); None and repeats are skipped."""
+    seen = []
+    for point in points:
+        if point is not None and not any(point.equals_exact(other) for other in seen):
+            seen.append(point)
+            invalidate_area(point.y, point.x)
+
+
+# ---------------------------------------------------------
+# 🔹 Monitoring
+# ---------------------------------------------------------
+def stats():
+    values = _cache().get_many(STATS_KEYS)
+    hits = values.get("rec:stats:hits", 0)
+    misses = values.get("rec:stats:misses", 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else None,
+        "backend": settings.CACHES[cache_settings()["ALIAS"]]["BACKEND"],
+        "shared": is_shared(),
+        "ttl": cache_settings()["TTL"],
+    }
+
+
+def reset_stats():
+    _cache().delete_many(STATS_KEYS)
@@ -0,0 +1,395 @@
+# core/recommender.py
+"""Worker recommendations: candidate retrieval, scoring and top-N selection."""
+import logging
+import random
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils.encoding import filepath_to_uri
+from sqlalchemy import text
+
+from core import distance
+from core.candidates import candidate_index, retrieve_from_snapshot, retrieve_nearest
+from core.db import get_engine
+from core.features import distance_bucket
+from core.ml_model import get_model, get_shadow_model, shadow_sample_rate
+from core.utils import TTLCache
+
+logger = logging.getLogger(__name__)
+
+RESULT_FIELDS = [
+    "worker_id", "worker_name", "service_name", "worker_lat", "worker_lon",
+    "charge", "num_bookings", "total_rating", "distance_km",
+    "user_worker_bookings", "service_match", "final_rank_score",
+    "profile_image", "address",
+]
+
+
+# ---------------------------------------------------------
+# 🔹 Helper Functions
+# ---------------------------------------------------------
+USER_LOCATION_SQL = text("""
+    SELECT ST_Y(location::geometry) AS lat,
+           ST_X(location::geometry) AS lon
+    FROM core_authenticateduser
+    WHERE id = :user_id AND location IS NOT NULL;
+""")
+
+USER_HISTORY_SQL = text("""
+    SELECT b.worker_id, b.service_id, w.average_rating AS worker_rating
+    FROM bookings b
+    JOIN workers w ON w.id = b.worker_id
+    WHERE b.user_id = :user_id AND b.status = 'completed';
+""")
+
+SCORERS = ("heuristic", "model")
+
+_MISSING = object()
+_caches = {}
+
+
+def _settings_cache(name):
+    """Per-process TTLCache configured by ``settings.<name>``, or None when disabled."""
+    if name not in _caches:
+        conf = getattr(settings, name, {})
+        ttl = conf.get("TTL", 300)
+        _caches[name] = TTLCache(maxsize=conf.get("MAXSIZE", 10000), ttl=ttl) if ttl else None
+    return _caches[name]
+
+
+def get_user_location(user_id, engine=None):
+    """Return ``(lat, lon)`` for one user, or None if they have no location."""
+    cache = _settings_cache("RECOMMENDER_USER_LOCATION_CACHE")
+    if cache is not None:
+        cached = cache.get(user_id, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        row = conn.execute(USER_LOCATION_SQL, {"user_id": user_id}).first()
+    location = (row.lat, row.lon) if row else None
+
+    if cache is not None:
+        cache.set(user_id, location)
+    return location
+
+
+def invalidate_user_location(user_id):
+    """Forget a cached location, e.g. after the user edits their profile."""
+    cache = _settings_cache("RECOMMENDER_USER_LOCATION_CACHE")
+    if cache is not None:
+        cache.pop(user_id)
+
+
+def get_user_history(user_id, engine=None):
+    """
+    Return the user's completed bookings as a ``worker_id`` / ``service_id`` /
+    ``worker_rating`` DataFrame. Served by the ``(user_id, status)`` index on ``bookings``;
+    cached until one of the user's bookings changes.
+    """
+    cache = _settings_cache("RECOMMENDER_USER_HISTORY_CACHE")
+    if cache is not None:
+        cached = cache.get(user_id)
+        if cached is not None:
+            return cached
+
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        history = pd.read_sql(USER_HISTORY_SQL, conn, params={"user_id": user_id})
+
+    if cache is not None:
+        cache.set(user_id, history)
+    return history
+
+
+def invalidate_user_history(user_id):
+    """Forget a cached history (called when the user's bookings change)."""
+    cache = _settings_cache("RECOMMENDER_USER_HISTORY_CACHE")
+    if cache is not None:
+        cache.pop(user_id)
+
+
+def normalize(values):
+    """Safely normalize an array between 0–1."""
+    lo, hi = values.min(), values.max()
+    if hi == lo:
+        return np.full(values.shape, 0.5)
+    return (values - lo) / (hi - lo)
+
+
+def _fill_charge(charge):
+    charge = charge.copy()
+    missing = np.isnan(charge)
+    if missing.any():
+        charge[missing] = np.nanmedian(charge) if not missing.all() else 0.0
+    return charge
+
+
+def _records(cand, features, order):
+    columns = {
+        "worker_id": cand.worker_id[order],
+        "worker_name": cand.worker_name[order],
+        "service_name": cand.service_name[order],
+        "worker_lat": cand.worker_lat[order],
+        "worker_lon": cand.worker_lon[order],
+        "num_bookings": cand.num_bookings[order],
+        "total_rating": cand.total_rating[order],
+        "profile_image": cand.profile_image[order],
+        "address": cand.address[order],
+    }
+    columns.update({name: values[order] for name, values in features.items()})
+    lists = [columns[name].tolist() for name in RESULT_FIELDS]
+    return [dict(zip(RESULT_FIELDS, row)) for row in zip(*lists)]
+
+
+def attach_media(recommendations, media_base):
+    """
+    Replace each record's stored ``profile_image`` path with an absolute
+    ``avatar`` URL under ``media_base`` (e.g. ``request.build_absolute_uri(settings.MEDIA_URL)``)
+    and default missing addresses, the way ``WorkerImageSerializer`` did.
+    """
+    for rec in recommendations:
+        image = rec.pop("profile_image", None)
+        rec["avatar"] = (
+            media_base + filepath_to_uri(image) if image
+            else f"https://i.pravatar.cc/80?u={rec['worker_id']}"
+        )
+        rec["address"] = rec.get("address") or "Not provided"
+    return recommendations
+
+
+# ---------------------------------------------------------
+# 🔹 Core Recommendation Logic
+# ---------------------------------------------------------
+def _user_features(cand, user_lat, user_lon, history):
+    """Distance, service match and per-worker booking counts for one user."""
+    distance_km = distance.distance_km(user_lat, user_lon, cand.points())
+
+    if history.empty:
+        service_match = np.zeros(cand.size, dtype=np.int64)
+        user_worker_bookings = np.zeros(cand.size, dtype=np.int64)
+    else:
+        service_match = np.isin(cand.service_id, history["service_id"].to_numpy()).astype(np.int64)
+        hist_workers, hist_counts = np.unique(history["worker_id"].to_numpy(), return_counts=True)
+        pos = np.searchsorted(hist_workers, cand.worker_id).clip(max=len(hist_workers) - 1)
+        user_worker_bookings = np.where(hist_workers[pos] == cand.worker_id, hist_counts[pos], 0)
+
+    return distance_km, service_match, user_worker_bookings
+
+
+def score_candidates(cand, user_lat, user_lon, history):
+    """
+    Score every row of ``cand`` for one user with the weighted heuristic.
+
+    ``history`` is a DataFrame of the user's completed bookings
+    (``worker_id``, ``service_id``). Returns a dict of feature arrays,
+    including ``final_rank_score``, aligned with ``cand``.
+    """
+    is_new_user = history.empty
+
+    charge = _fill_charge(cand.charge)
+    distance_km, service_match, user_worker_bookings = _user_features(cand, user_lat, user_lon, history)
+
+    # --- Feature normalization ---
+    loc_rank = np.exp(-distance_km / 10)
+    num_bookings_rank = normalize(cand.num_bookings)
+    charge_rank = 1 - normalize(charge)
+    rating_rank = normalize(cand.total_rating)
+    user_worker_bookings_rank = normalize(user_worker_bookings)
+
+    # --- Score calculation ---
+    if is_new_user:
+        # Cold-start user (no booking history)
+        score = loc_rank * 0.7 + rating_rank * 0.2 + charge_rank * 0.1
+    else:
+        # Experienced user (combine multiple signals)
+        score = (
+            loc_rank * 0.4 +
+            service_match * 0.2 +
+            num_bookings_rank * 0.15 +
+            user_worker_bookings_rank * 0.1 +
+            charge_rank * 0.05 +
+            rating_rank * 0.1
+        )
+
+    return {
+        "charge": charge,
+        "distance_km": distance_km,
+        "user_worker_bookings": user_worker_bookings,
+        "service_match": service_match,
+        "final_rank_score": score,
+    }
+
+
+def user_avg_rating(history):
+    """Mean rating of the workers a user has booked (NaN for cold-start users)."""
+    if history.empty or "worker_rating" not in history:
+        return np.nan
+    return history["worker_rating"].astype(float).fillna(0.0).mean()
+
+
+def assemble_features(columns, feature_cols, n_rows):
+    """Stack ``columns`` (name -> array or scalar) into an ``(n_rows, F)`` matrix."""
+    matrix = np.empty((n_rows, len(feature_cols)), dtype=np.float64)
+    for i, name in enumerate(feature_cols):
+        matrix[:, i] = columns[name]
+    return matrix
+
+
+def build_feature_matrix(cand, distance_km, service_match, history, feature_cols):
+    """
+    The ranker's input matrix (rows aligned with ``cand``, columns in
+    ``feature_cols`` order), built the way ``train_model`` derives them.
+    """
+    columns = {
+        "worker_lat": cand.worker_lat,
+        "worker_lon": cand.worker_lon,
+        "charge": np.nan_to_num(cand.charge, nan=0.0),
+        "num_bookings": cand.num_bookings,
+        "distance_km": distance_km,
+        "distance_km_scaled": distance_km * 2,
+        "distance_bucket": distance_bucket(distance_km),
+        "service_match": service_match,
+        "worker_avg_rating": cand.total_rating,
+        "worker_total_bookings": cand.num_bookings,
+        "user_avg_rating": user_avg_rating(history),
+    }
+    return assemble_features(columns, feature_cols, cand.size)
+
+
+def score_candidates_with_model(cand, user_lat, user_lon, history, model, feature_cols):
+    """Score every row of ``cand`` with the LightGBM ranker in one ``predict`` call."""
+    distance_km, service_match, user_worker_bookings = _user_features(cand, user_lat, user_lon, history)
+    matrix = build_feature_matrix(cand, distance_km, service_match, history, feature_cols)
+
+    return {
+        "charge": _fill_charge(cand.charge),
+        "distance_km": distance_km,
+        "user_worker_bookings": user_worker_bookings,
+        "service_match": service_match,
+        "final_rank_score": model.predict(matrix),
+    }
+
+
+def resolve_scorer(requested=None):
+    """``requested`` (e.g. a query parameter) or ``settings.RECOMMENDER_SCORER``."""
+    scorer = requested or getattr(settings, "RECOMMENDER_SCORER", "heuristic")
+    if scorer not in SCORERS:
+        raise ValueError(f"Unknown scorer '{scorer}'. Choose one of: {', '.join(SCORERS)}.")
+    return scorer
+
+
+def resolve_ranker(requested=None):
+    """
+    ``(scorer, model)`` that will actually score: ``resolve_scorer(requested)``
+    and, for ``"model"``, the serving ranker. Without a usable ranker (none
+    published, or no feature order) this is ``("heuristic", None)``, so
+    callers report and cache under the scorer that really ran.
+    """
+    scorer = resolve_scorer(requested)
+    if scorer != "model":
+        return scorer, None
+    model = get_model()
+    if model is None or not model.feature_cols:
+        logger.warning("No usable ranker loaded; scoring with the heuristic instead")
+        return "heuristic", None
+    return scorer, model
+
+
+def retrieval_settings():
+    conf = {"STRATEGY": "postgis", "K": 200, "RADIUS_KM": 5, "MAX_RADIUS_KM": 80, "MIN_CANDIDATES": 20}
+    conf.update(getattr(settings, "RECOMMENDER_RETRIEVAL", {}))
+    return conf
+
+
+def retrieve_candidates(user_lat, user_lon, engine=None, service_id=None):
+    """
+    Candidate retrieval stage, chosen by ``RECOMMENDER_RETRIEVAL['STRATEGY']``:
+    ``"postgis"`` asks PostGIS for the nearest ``K`` workers only,
+    ``"snapshot"`` takes the available workers in the grid cells around the
+    user from the in-memory snapshot. With ``service_id`` both keep only the
+    workers offering that service (and only that service's rows).
+    """
+    conf = retrieval_settings()
+    if conf["STRATEGY"] == "postgis":
+        return retrieve_nearest(
+            user_lat, user_lon,
+            k=conf["K"],
+            radius_km=conf["RADIUS_KM"],
+            max_radius_km=conf["MAX_RADIUS_KM"],
+            min_candidates=conf["MIN_CANDIDATES"],
+            engine=engine,
+            service_id=service_id,
+        )
+
+    return retrieve_from_snapshot(
+        candidate_index.snapshot(), user_lat, user_lon,
+        k=conf["K"],
+        radius_km=conf["RADIUS_KM"],
+        max_radius_km=conf["MAX_RADIUS_KM"],
+        min_candidates=conf["MIN_CANDIDATES"],
+        service_id=service_id,
+    )
+
+
+def shadow_sampled():
+    """
+    Whether this request joins the shadow sample: true for
+    ``ML_SHADOW_SAMPLE_RATE`` of calls while a shadow ranker is set. Decided
+    per request, before any cache lookup, so the sample covers all traffic.
+    """
+    rate = shadow_sample_rate()
+    return bool(rate) and random.random() < rate and get_shadow_model() is not None
+
+
+def shadow_score(cand, features, history, order):
+    """
+    Score the same candidates with the shadow ranker (``ml_models/SHADOW``)
+    and record its latency, scores and top-N overlap with the served ranking.
+    Never affects the response.
+    """
+    try:
+        shadow = get_shadow_model()
+        if shadow is None:
+            return
+        matrix = build_feature_matrix(
+            cand, features["distance_km"], features["service_match"], history, shadow.feature_cols
+        )
+        scores = shadow.predict(matrix)
+        shadow_order = np.argsort(-scores, kind="stable")[:len(order)]
+        shadow.stats.record_overlap(len(np.intersect1d(order, shadow_order)) / max(len(order), 1))
+    except Exception:
+        logger.exception("Shadow scoring failed")
+
+
+def recommend_top_n_for_user(user_id, model, engine, top_n=10, scorer=None, feature_cols=None,
+                             shadow=False, service_id=None):
+    """
+    Top ``top_n`` recommendation records for one user. ``shadow=True`` also
+    scores the request with the shadow ranker (pass ``shadow_sampled()``).
+    """
+    user_location = get_user_location(user_id, engine)
+    if not user_location:
+        return []
+    user_lat, user_lon = user_location
+
+    # --- User booking history ---
+    user_history = get_user_history(user_id, engine)
+
+    # --- Candidate workers ---
+    cand = retrieve_candidates(user_lat, user_lon, engine, service_id)
+    if cand.size == 0:
+        return []
+
+    if resolve_scorer(scorer) == "model" and model is not None and feature_cols:
+        features = score_candidates_with_model(cand, user_lat, user_lon, user_history, model, feature_cols)
+    else:
+        features = score_candidates(cand, user_lat, user_lon, user_history)
+
+    # --- Sort & pick top N ---
+    order = np.argsort(-features["final_rank_score"], kind="stable")[:top_n]
+    if shadow:
+        shadow_score(cand, features, user_history, order)
+    return _records(cand, features, order)
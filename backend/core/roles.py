@@ -0,0 +1,111 @@
+# core/roles.py
+"""
+Cached role lookups for permission checks.
+
+A user's roles (``UserRole`` rows, oldest first) are read from the database
+at most once per request, and across requests at most once per
+``ROLE_CACHE['TTL']``:
+
+* per request: the tuple is kept on the user instance. The authentication
+  middleware loads ``request.user`` fresh for every request, so it never
+  outlives the request;
+* per user: the tuple is kept in the Django cache ``ROLE_CACHE['ALIAS']``
+  under ``roles:v1:<user id>``. Logging in fills it (``user_logged_in``).
+  Saving or deleting a ``UserRole`` drops it once the change is committed
+  (``core.signals``).
+
+Queryset ``update()`` bypasses signals, and so does a change made in
+another process while the cache backend is the per-process local-memory
+one. The TTL bounds how long either can go unseen. Use a shared backend
+(Redis) for immediate invalidation everywhere.
+
+Once the cache is warm, permission checks cost no queries.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULTS = {
+    "ALIAS": "default",
+    "TTL": 300,
+}
+
+INSTANCE_ATTR = "_cached_roles"
+DEFAULT_ROLE = "customer"
+
+
+def role_cache_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, "ROLE_CACHE", {}))
+    return conf
+
+
+def _cache():
+    return caches[role_cache_settings()["ALIAS"]]
+
+
+def _key(user_id):
+    return f"roles:v1:{user_id}"
+
+
+# ---------------------------------------------------------
+# 🔹 Lookups
+# ---------------------------------------------------------
+def load(user_id):
+    from core.models import UserRole
+
+    return tuple(
+        UserRole.objects.filter(user_id=user_id).order_by("created_at", "id").values_list("role", flat=True)
+    )
+
+
+def refresh(user):
+    """Re-read ``user``'s roles from the database into both caches."""
+    roles = load(user.pk)
+    _cache().set(_key(user.pk), list(roles), role_cache_settings()["TTL"])
+    user.__dict__[INSTANCE_ATTR] = roles
+    return roles
+
+
+def user_roles(user):
+    """Role names of ``user``, oldest first. Empty for anonymous users."""
+    if not getattr(user, "is_authenticated", False) or user.pk is None:
+        return ()
+    roles = user.__dict__.get(INSTANCE_ATTR)
+    if roles is None:
+        cached = _cache().get(_key(user.pk))
+        if cached is None:
+            return refresh(user)
+        roles = user.__dict__[INSTANCE_ATTR] = tuple(cached)
+    return roles
+
+
+def has_role(user, *names):
+    return any(role in names for role in user_roles(user))
+
+
+def primary_role(user):
+    """
+    The user's oldest role. A user without any role gets ``customer``, so
+    this writes only in that case (``AuthenticatedUser.role``).
+    """
+    roles = user_roles(user)
+    if roles:
+        return roles[0]
+
+    from core.models import UserRole
+
+    UserRole.objects.get_or_create(user=user, role=DEFAULT_ROLE)
+    user.__dict__[INSTANCE_ATTR] = (DEFAULT_ROLE,)
+    return DEFAULT_ROLE
+
+
+# ---------------------------------------------------------
+# 🔹 Invalidation
+# ---------------------------------------------------------
+def invalidate(user_id):
+    _cache().delete(_key(user_id))
+
+
+def forget(user):
+    """Drop the per-request copy kept on ``user``."""
+    user.__dict__.pop(INSTANCE_ATTR, None)
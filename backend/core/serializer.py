@@ -204,7 +204,15 @@ class BookingSerializer(serializers.ModelSerializer):
         return None  # Return None if no review
 
 from rest_framework import serializers
-from django.db.models import Avg
+from django.db.models import Avg, OuterRef, Prefetch, Subquery
+
+
+def _worker_services(obj):
+    """The worker's services (with ``service`` loaded), from the prefetch when the queryset has one."""
+    if 'services' in getattr(obj, '_prefetched_objects_cache', {}):
+        return obj.services.all()
+    return obj.services.select_related('service').order_by('pk')
+
 
 class WorkerSerializer(serializers.ModelSerializer):
     name = serializers.SerializerMethodField()
@@ -228,6 +236,22 @@ class WorkerSerializer(serializers.ModelSerializer):
             'address'
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Everything the fields read, for any number of workers, in one query
+        plus one for the services: user and application joined, services
+        prefetched in pk order (the "first" service), average charge as a
+        subquery annotation.
+        """
+        avg_charge = (
+            WorkerService.objects.filter(worker=OuterRef('pk'))
+            .values('worker').annotate(avg=Avg('charge')).values('avg')
+        )
+        return queryset.select_related('user', 'application').prefetch_related(
+            Prefetch('services', queryset=WorkerService.objects.select_related('service').order_by('pk'))
+        ).annotate(avg_service_charge=Subquery(avg_charge))
+
     def get_name(self, obj):
         return obj.worker_name or obj.user.name or f"Worker {obj.id}"
 
@@ -240,18 +264,18 @@ class WorkerSerializer(serializers.ModelSerializer):
         return f"https://i.pravatar.cc/80?u={obj.id}"
 
     def get_service(self, obj):
-        services_qs = obj.services.select_related('service')
-        service_entity = services_qs.first()
+        service_entity = next(iter(_worker_services(obj)), None)
         if service_entity and service_entity.service:
             return {'service_type': service_entity.service.service_type}
         return {'service_type': 'Service not specified'}
 
     def get_costPerHour(self, obj):
-        services_qs = obj.services.all()
-        if services_qs.exists():
-            avg_charge = services_qs.aggregate(avg=Avg('charge'))['avg']
-            return round(avg_charge or 0, 2)
-        return 0
+        if hasattr(obj, 'avg_service_charge'):
+            avg_charge = obj.avg_service_charge
+        else:
+            charges = [service.charge for service in _worker_services(obj)]
+            avg_charge = sum(charges) / len(charges) if charges else None
+        return round(float(avg_charge), 2) if avg_charge is not None else 0
 
     def get_description(self, obj):
         return obj.application.experience if obj.application else ""
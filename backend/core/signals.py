@@ -1,4 +1,8 @@
-from django.db.models.signals import post_save, post_delete
+import sys
+
+from django.db import transaction
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 
 from core.models import (
@@ -8,15 +12,34 @@ from core.models import (
     Worker,
     WorkerService,
     Service,
-    UserRole
+    UserRole,
+    Booking,
+    update_worker_data,
 )
+from core import feature_store, rec_cache, roles
 
 # ---------------------------------------------------------
 # 1. UPDATE WORKER AVG RATING WHEN REVIEWS CHANGE
 # ---------------------------------------------------------
+@receiver(pre_save, sender=UserReview)
+def remember_review_state(sender, instance, **kwargs):
+    """Keep the stored rating / worker / user so post_save can apply the difference."""
+    old = None
+    if instance.pk:
+        old = UserReview.objects.filter(pk=instance.pk).values("rating", "worker_id", "user_id").first()
+    instance._feature_store_old = old
+
+
 @receiver([post_save, post_delete], sender=UserReview)
-def update_worker_avg_rating(sender, instance, **kwargs):
-    """Keep worker's average rating updated whenever reviews change."""
+def update_worker_avg_rating(sender, instance, signal, **kwargs):
+    """Keep the feature store and the worker's average rating updated whenever reviews change."""
+    if signal is post_delete:
+        feature_store.review_changed(feature_store.review_state(instance), None)
+    else:
+        feature_store.review_changed(getattr(instance, "_feature_store_old", None),
+                                     feature_store.review_state(instance))
+        instance._feature_store_old = feature_store.review_state(instance)
+
     if instance.worker:
         instance.worker.update_average_rating()
 
@@ -90,3 +113,114 @@ def create_worker_service_after_approval(sender, instance, created, **kwargs):
             service=service_obj,
             defaults={'charge': instance.base_charge or 0}
         )
+
+
+# ---------------------------------------------------------
+# 5. KEEP THE RECOMMENDATION CANDIDATE SNAPSHOT IN SYNC
+# ---------------------------------------------------------
+@receiver([post_save, post_delete], sender=Worker)
+@receiver([post_save, post_delete], sender=WorkerService)
+@receiver([post_save, post_delete], sender=Booking)
+def refresh_candidate_snapshot(sender, instance, **kwargs):
+    """Re-read the affected worker's candidate rows once the change is committed."""
+    candidates = sys.modules.get("core.candidates")
+    if candidates is None:
+        return  # nothing recommended in this process yet, so no snapshot to patch
+
+    worker_id = instance.pk if sender is Worker else instance.worker_id
+    if worker_id is not None:
+        transaction.on_commit(lambda: candidates.candidate_index.mark_dirty(worker_id))
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def refresh_user_history(sender, instance, **kwargs):
+    """Drop the booking user's cached recommendation history after commit."""
+    recommender = sys.modules.get("core.recommender")
+    if recommender is None:
+        return
+
+    user_id = instance.user_id
+    transaction.on_commit(lambda: recommender.invalidate_user_history(user_id))
+
+
+# ---------------------------------------------------------
+# 6. INVALIDATE CACHED RECOMMENDATION LISTS
+# ---------------------------------------------------------
+@receiver(pre_save, sender=Worker)
+def remember_worker_location(sender, instance, **kwargs):
+    """Keep the stored location so post_save can also expire lists around the old one."""
+    old = None
+    if instance.pk and rec_cache.enabled():
+        old = Worker.objects.filter(pk=instance.pk).values_list("location", flat=True).first()
+    instance._rec_cache_old_location = old
+
+
+@receiver([post_save, post_delete], sender=Worker)
+@receiver([post_save, post_delete], sender=UserReview)
+@receiver([post_save, post_delete], sender=Booking)
+def invalidate_cached_recommendations(sender, instance, **kwargs):
+    """Expire lists near a changed worker (and the booking user's own lists)."""
+    if not rec_cache.enabled():
+        return
+
+    if sender is Worker:
+        locations = [getattr(instance, "_rec_cache_old_location", None), instance.location]
+        instance._rec_cache_old_location = instance.location
+    elif instance.worker_id:
+        locations = [Worker.objects.filter(pk=instance.worker_id).values_list("location", flat=True).first()]
+    else:
+        locations = []
+    user_id = instance.user_id if sender is Booking else None
+
+    def invalidate():
+        rec_cache.invalidate_locations(*locations)
+        if user_id is not None:
+            rec_cache.invalidate_user(user_id)
+
+    transaction.on_commit(invalidate)
+
+
+# ---------------------------------------------------------
+# 7. KEEP THE FEATURE STORE IN SYNC WITH BOOKINGS
+# ---------------------------------------------------------
+@receiver(pre_save, sender=Booking)
+def remember_booking_state(sender, instance, **kwargs):
+    """Keep the stored status / worker / user so post_save can apply the difference."""
+    old = None
+    if instance.pk:
+        old = Booking.objects.filter(pk=instance.pk).values("status", "worker_id", "user_id").first()
+    instance._feature_store_old = old
+
+
+@receiver(post_save, sender=Booking)
+def update_booking_features(sender, instance, **kwargs):
+    feature_store.booking_changed(getattr(instance, "_feature_store_old", None),
+                                  feature_store.booking_state(instance))
+    instance._feature_store_old = feature_store.booking_state(instance)
+
+
+@receiver(post_delete, sender=Booking)
+def remove_booking_features(sender, instance, **kwargs):
+    feature_store.booking_changed(feature_store.booking_state(instance), None)
+
+
+# Registered after update_booking_features so it reads counts that include this booking.
+post_save.connect(update_worker_data, sender=Booking)
+
+
+# ---------------------------------------------------------
+# 8. KEEP THE ROLE CACHE IN SYNC
+# ---------------------------------------------------------
+@receiver(user_logged_in)
+def cache_roles_on_login(sender, request, user, **kwargs):
+    """Read the roles once at login so the following requests are authorised from the cache."""
+    roles.refresh(user)
+
+
+@receiver([post_save, post_delete], sender=UserRole)
+def invalidate_cached_roles(sender, instance, **kwargs):
+    """Forget the user's cached roles: the shared entry once committed, a loaded user object now."""
+    user_id = instance.user_id
+    if UserRole.user.is_cached(instance):
+        roles.forget(instance.user)  # may be request.user
+    transaction.on_commit(lambda: roles.invalidate(user_id))
@@ -0,0 +1,259 @@
+# core/training_cache.py
+"""
+Columnar on-disk cache of the ranker's training data.
+
+``build_training_cache`` streams ``data_prep.TRAINING_SQL`` through a
+server-side cursor in ``chunksize`` rows. It computes the row-level
+features of each chunk and appends every column to a flat binary file.
+Worker aggregates come precomputed from the feature store with every row.
+The per-user mean is only known after the last chunk, so a second chunked
+pass over the files fills it in. Memory is bounded by the chunk size plus
+one entry per user, never by the size of the interaction table.
+
+``TrainingCache`` opens the files as read-only ``np.memmap``s. Its
+``sequence()`` is a ``lightgbm.Sequence``, so LightGBM builds its binned
+Dataset from row batches without a full feature matrix in memory.
+Rows are sorted by user, so each user's query group is one contiguous
+row range.
+
+Layout::
+
+    <directory>/meta.json       row count, column dtypes, build info
+    <directory>/<column>.bin    raw little-endian values, one file per column
+"""
+import json
+import os
+import shutil
+import time
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from core.data_prep import iter_training_chunks
+from core.features import distance_bucket
+from core.ml_model import ML_DIR
+from core.utils import haversine_vector
+
+DEFAULTS = {
+    "DIRECTORY": os.path.join(ML_DIR, "training_cache"),
+    "CHUNKSIZE": 100_000,
+}
+
+# Columns written while streaming, then the ones filled in from aggregates.
+BASE_COLUMNS = {
+    "user_id": "<i8",
+    "worker_id": "<i8",
+    "service_id": "<i8",
+    "worker_lat": "<f8",
+    "worker_lon": "<f8",
+    "charge": "<f8",
+    "num_bookings": "<f8",
+    "total_rating": "<f8",
+    "distance_km_scaled": "<f8",
+    "distance_bucket": "<f8",
+    "worker_avg_rating": "<f8",
+    "worker_total_bookings": "<f8",
+    "relevance_int": "<i4",
+}
+AGGREGATE_COLUMNS = {
+    "service_match": "<f8",
+    "user_avg_rating": "<f8",
+}
+
+
+def cache_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, "ML_TRAINING_CACHE", {}))
+    return conf
+
+
+def relevance_labels(distance_km, rng):
+    """train_model's synthetic relevance: closer is better, plus seeded noise."""
+    relevance = np.clip(5.0 - (distance_km / 10.0), 0.0, 5.0)
+    relevance = np.clip(relevance + rng.normal(loc=0.0, scale=0.6, size=len(distance_km)), 0.0, 5.0)
+    return relevance.round().astype(int)
+
+
+# ---------------------------------------------------------
+# 🔹 Build
+# ---------------------------------------------------------
+def _add_sums(totals, chunk, key, **columns):
+    partial = chunk.groupby(key).agg(**{name: (column, "sum") for name, column in columns.items()},
+                                     rows=("total_rating", "size"))
+    return partial if totals is None else totals.add(partial, fill_value=0)
+
+
+def _lookup(ids, totals, column):
+    position = np.searchsorted(totals.index.values, ids)
+    return totals[column].values[position]
+
+
+def build_training_cache(directory=None, engine=None, chunksize=None, seed=42):
+    """Stream the training rows into ``directory``; returns the opened ``TrainingCache``."""
+    conf = cache_settings()
+    directory = directory or conf["DIRECTORY"]
+    chunksize = chunksize or conf["CHUNKSIZE"]
+
+    tmp = f"{directory.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed=seed)
+    rows, chunks, user_totals = 0, 0, None
+    files = {name: open(os.path.join(tmp, f"{name}.bin"), "wb") for name in BASE_COLUMNS}
+    try:
+        for chunk in iter_training_chunks(engine, chunksize):
+            distance_km = haversine_vector(
+                chunk["lat_user"].values, chunk["lon_user"].values,
+                chunk["worker_lat"].values, chunk["worker_lon"].values,
+            )
+            chunk["distance_km_scaled"] = distance_km * 2
+            chunk["distance_bucket"] = distance_bucket(distance_km)
+            chunk["relevance_int"] = relevance_labels(distance_km, rng)
+            for name, dtype in BASE_COLUMNS.items():
+                np.ascontiguousarray(chunk[name].values, dtype=dtype).tofile(files[name])
+
+            user_totals = _add_sums(user_totals, chunk, "user_id", rating="total_rating")
+            rows += len(chunk)
+            chunks += 1
+    finally:
+        for f in files.values():
+            f.close()
+
+    meta = {
+        "rows": rows,
+        "columns": {**BASE_COLUMNS, **AGGREGATE_COLUMNS},
+        "chunksize": chunksize,
+        "chunks": chunks,
+        "seed": seed,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # Second pass: per-row lookups of the per-user aggregate.
+    cache = TrainingCache(tmp)
+    user_totals = (user_totals if user_totals is not None else pd.DataFrame(
+        columns=["rating", "rows"])).sort_index()
+    user_totals["avg_rating"] = user_totals["rating"] / user_totals["rows"]
+
+    files = {name: open(os.path.join(tmp, f"{name}.bin"), "wb") for name in AGGREGATE_COLUMNS}
+    try:
+        user_ids = cache.column("user_id")
+        for lo in range(0, rows, chunksize):
+            users = user_ids[lo:lo + chunksize]
+            values = {
+                # Every row's (user, service) pair is in that user's own history,
+                # exactly as train_model derives the feature.
+                "service_match": np.ones(len(users)),
+                "user_avg_rating": _lookup(users, user_totals, "avg_rating"),
+            }
+            for name, dtype in AGGREGATE_COLUMNS.items():
+                np.ascontiguousarray(values[name], dtype=dtype).tofile(files[name])
+    finally:
+        for f in files.values():
+            f.close()
+    del cache, user_ids
+
+    meta["build_seconds"] = round(time.perf_counter() - start, 2)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+    return TrainingCache(directory)
+
+
+# ---------------------------------------------------------
+# 🔹 Read
+# ---------------------------------------------------------
+class TrainingCache:
+    """Read-only memmapped columns of a cache built by ``build_training_cache``."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or cache_settings()["DIRECTORY"]
+        with open(os.path.join(self.directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta["rows"]
+        self._columns = {}
+
+    @classmethod
+    def exists(cls, directory=None):
+        return os.path.exists(os.path.join(directory or cache_settings()["DIRECTORY"], "meta.json"))
+
+    def column(self, name):
+        if name not in self._columns:
+            if not self.rows:
+                self._columns[name] = np.zeros(0, dtype=self.meta["columns"][name])
+            else:
+                self._columns[name] = np.memmap(
+                    os.path.join(self.directory, f"{name}.bin"),
+                    dtype=self.meta["columns"][name], mode="r", shape=(self.rows,),
+                )
+        return self._columns[name]
+
+    def user_groups(self):
+        """``(user_ids, starts, sizes)`` of the contiguous per-user row ranges."""
+        users = self.column("user_id")
+        step = cache_settings()["CHUNKSIZE"]
+        starts, ids, previous = [], [], None
+        for lo in range(0, self.rows, step):
+            block = np.asarray(users[lo:lo + step])
+            first = np.ones(len(block), dtype=bool)
+            first[1:] = block[1:] != block[:-1]
+            if previous is not None and block[0] == previous:
+                first[0] = False
+            starts.append(np.flatnonzero(first) + lo)
+            ids.append(block[first])
+            previous = block[-1]
+        starts = np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64)
+        ids = np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64)
+        return ids, starts, np.diff(np.append(starts, self.rows))
+
+    def gather(self, name, ranges):
+        """Concatenate column ``name`` over ``(start, stop)`` row ranges."""
+        column = self.column(name)
+        if not ranges:
+            return np.zeros(0, dtype=column.dtype)
+        return np.concatenate([column[lo:hi] for lo, hi in ranges])
+
+    def sequence(self, feature_cols, ranges, batch_size=None):
+        return RowSequence(
+            [self.column(name) for name in feature_cols], ranges,
+            batch_size or cache_settings()["CHUNKSIZE"],
+        )
+
+
+class RowSequence(lgb.Sequence):
+    """Feature rows of a set of row ranges, read batch by batch from the memmaps."""
+
+    def __init__(self, columns, ranges, batch_size):
+        self.columns = columns
+        self.batch_size = batch_size
+        self.range_starts = np.array([lo for lo, _ in ranges], dtype=np.int64)
+        lengths = np.array([hi - lo for lo, hi in ranges], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def _physical(self, positions):
+        which = np.searchsorted(self.offsets, positions, side="right") - 1
+        return self.range_starts[which] + (positions - self.offsets[which])
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            positions = np.arange(*idx.indices(len(self)))
+        else:
+            positions = np.asarray(idx)
+            if positions.ndim == 0 and positions < 0:
+                positions = positions + len(self)
+        rows = self._physical(positions)
+        return np.stack([np.asarray(column[rows], dtype=np.float64) for column in self.columns], axis=-1)
+
+    def batches(self):
+        for lo in range(0, len(self), self.batch_size):
+            yield self[lo:lo + self.batch_size]
@@ -0,0 +1,309 @@
+# core/tree_eval.py
+"""
+Pure-NumPy evaluator for small LightGBM ranking models.
+
+``CompiledRanker.from_booster`` turns ``Booster.dump_model()`` into a few
+flat lookup arrays:
+
+* **Feature bins.** Every feature value is mapped to a global bin:
+  ``searchsorted`` over all thresholds the model uses for that feature,
+  plus dedicated bins for NaN and for exact zeros (numerical features) or for
+  unseen categories (categorical features). Every split decision in the
+  model is a function of that bin alone.
+* **Tree tables.** Each tree only looks at a handful of features (at most 4
+  for ``train_model``'s ``num_leaves=5`` trees). For every (tree, feature)
+  pair, the feature's global bins are folded into the few distinct patterns
+  of left/right decisions that the tree's splits on that feature can
+  produce. The tree is pre-evaluated for every combination of those
+  patterns, which gives a small dense table of leaf values.
+
+A table has one entry per combination of patterns, so its size is the
+product of the per-feature pattern counts. That is tiny for shallow trees
+but explodes for deep ones (31 leaves, unbounded depth). ``from_dump``
+therefore counts the entries before building anything, and refuses a
+model above ``max_entries`` with ``ModelTooLarge``.
+
+``predict`` bins every feature once, gathers the pattern codes, combines
+them into one table index per (row, tree) and reads the leaf values. There
+is no Python loop per row or per tree. Split semantics follow LightGBM's
+``Tree::NumericalDecision`` / ``CategoricalDecision``: missing types,
+``default_left`` and category sets. Trees are accumulated in order, as
+LightGBM does, so scores match ``Booster.predict`` on raw feature matrices.
+"""
+import itertools
+
+import numpy as np
+
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+ZERO_THRESHOLD = 1e-35  # LightGBM's kZeroThreshold
+
+# Objectives whose prediction is the raw sum of tree outputs.
+IDENTITY_OBJECTIVES = ("lambdarank", "rank_xendcg", "regression")
+
+# Default cap on the total number of leaf-table entries (8 bytes each).
+MAX_TABLE_ENTRIES = 2_000_000
+
+
+class ModelTooLarge(ValueError):
+    """The compiled tables would exceed the allowed number of entries."""
+
+
+class _Split:
+    __slots__ = ("feature", "threshold", "categories", "default_left", "missing", "left", "right")
+
+
+def _parse_tree(node, splits, feature_kind):
+    """Nested dump -> node ids; splits are appended to ``splits``, leaves are ``("leaf", value)``."""
+    if "leaf_value" in node:
+        return ("leaf", node["leaf_value"])
+    if node.get("is_linear"):
+        raise ValueError("Linear trees are not supported.")
+
+    split = _Split()
+    split.feature = node["split_feature"]
+    split.default_left = bool(node["default_left"])
+    split.missing = MISSING_TYPES[node["missing_type"]]
+    if node["decision_type"] == "==":
+        split.categories = frozenset(int(c) for c in str(node["threshold"]).split("||"))
+        split.threshold = None
+    elif node["decision_type"] == "<=":
+        split.categories = None
+        split.threshold = float(node["threshold"])
+    else:
+        raise ValueError(f"Unsupported decision type {node['decision_type']!r}.")
+    feature_kind.setdefault(split.feature, split.categories is not None)
+
+    index = len(splits)
+    splits.append(split)
+    split.left = _parse_tree(node["left_child"], splits, feature_kind)
+    split.right = _parse_tree(node["right_child"], splits, feature_kind)
+    return ("split", index)
+
+
+def _tree_splits(node, splits):
+    """Split indices of the tree rooted at ``node``."""
+    if node[0] == "leaf":
+        return []
+    split = splits[node[1]]
+    return [node[1]] + _tree_splits(split.left, splits) + _tree_splits(split.right, splits)
+
+
+class CompiledRanker:
+    """Binned lookup-table form of a single-output LightGBM model."""
+
+    ARRAYS = (
+        "feat_index", "feat_is_cat", "feat_size", "feat_zero", "thr_start", "thresholds",
+        "slot_row", "lut_offset", "lut", "table",
+    )
+
+    def __init__(self, feat_index, feat_is_cat, feat_size, feat_zero, thr_start, thresholds,
+                 slot_row, lut_offset, lut, table):
+        self.feat_index = feat_index      # (U,) column of X for every feature the model uses
+        self.feat_is_cat = feat_is_cat    # categorical feature?
+        self.feat_size = feat_size        # numerical: #thresholds; categorical: max category + 1
+        self.feat_zero = feat_zero        # numerical feature has a split with missing_type Zero
+        self.thr_start = thr_start        # (U + 1,) slice of ``thresholds`` per feature
+        self.thresholds = thresholds      # sorted unique thresholds, concatenated
+        self.slot_row = slot_row          # (T, width) feature (row of the bin matrix) of every tree slot
+        self.lut_offset = lut_offset      # (T, width) slice of ``lut`` mapping global bin -> index part
+        self.lut = lut                    # pattern code * stride (+ table offset for a tree's first slot)
+        self.table = table                # leaf values of all tree tables
+
+    @property
+    def num_trees(self):
+        return len(self.slot_row)
+
+    # -----------------------------------------------------
+    # Export
+    # -----------------------------------------------------
+    @classmethod
+    def from_booster(cls, booster, num_iteration=None, max_entries=MAX_TABLE_ENTRIES):
+        """Compile ``booster`` using ``num_iteration`` trees (default: best iteration, else all)."""
+        if num_iteration is None:
+            num_iteration = booster.best_iteration if booster.best_iteration > 0 else None
+        return cls.from_dump(booster.dump_model(num_iteration=num_iteration), max_entries=max_entries)
+
+    @classmethod
+    def from_dump(cls, dump, max_entries=MAX_TABLE_ENTRIES):
+        """Compile a ``Booster.dump_model()`` dict. Raises ``ModelTooLarge`` past ``max_entries`` table entries."""
+        objective = dump.get("objective", "").split()[0]
+        if dump.get("num_tree_per_iteration", 1) != 1 or objective not in IDENTITY_OBJECTIVES:
+            raise ValueError(f"Only single-output {IDENTITY_OBJECTIVES} models can be compiled, got '{objective}'.")
+        if dump.get("average_output"):
+            raise ValueError("Averaged-output (random forest) models are not supported.")
+
+        splits, feature_kind, roots = [], {}, []
+        for tree in dump["tree_info"]:
+            roots.append(_parse_tree(tree["tree_structure"], splits, feature_kind))
+
+        # --- global bins per feature ---
+        features = sorted(feature_kind) or [0]
+        row_of = {f: i for i, f in enumerate(features)}
+        thresholds, sizes, zeros, thr_start = [], [], [], [0]
+        for f in features:
+            on_f = [s for s in splits if s.feature == f]
+            if feature_kind.get(f):
+                sizes.append(max(max(s.categories) for s in on_f) + 1)
+                zeros.append(False)
+            else:
+                values = sorted({s.threshold for s in on_f})
+                thresholds.extend(values)
+                sizes.append(len(values))
+                zeros.append(any(s.missing == MISSING_ZERO for s in on_f))
+            thr_start.append(len(thresholds))
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+
+        def n_bins(f):
+            return sizes[row_of[f]] + 3
+
+        def goes_left(split, b):
+            """Decision of ``split`` for every value in global bin ``b`` of its feature."""
+            size = sizes[row_of[split.feature]]
+            if split.categories is not None:
+                # bins: 0..size-1 categories, size = unseen / negative, size+1 = NaN
+                if b < size:
+                    return b in split.categories
+                if b == size:
+                    return False
+                return split.missing != MISSING_NAN and 0 in split.categories
+            # bins: 0..size regular, size+1 = NaN, size+2 = exact zero
+            if b <= size:
+                lo = thr_start[row_of[split.feature]]
+                j = int(np.searchsorted(thresholds[lo:lo + size], split.threshold))
+                return b <= j
+            # NaN is read as zero unless the split treats NaN as missing; a
+            # zero only takes the default branch at a Zero-type split
+            if b == size + 1 and split.missing != MISSING_NONE:
+                return split.default_left
+            if b == size + 2 and split.missing == MISSING_ZERO:
+                return split.default_left
+            return 0.0 <= split.threshold
+
+        # --- tree tables ---
+        # Every tree gets ``width`` slots (padding slots read a run of zeros).
+        # Lookup values are pre-multiplied by the slot's stride in its tree
+        # table, and the first slot also carries the table's offset, so the
+        # table index of a (row, tree) is the plain sum of its slot lookups.
+        width = max(
+            [len({splits[i].feature for i in _tree_splits(root, splits)}) for root in roots], default=1
+        ) or 1
+        # First pass: the patterns of every (tree, feature) and the table sizes,
+        # so an oversized model is refused before any table is allocated.
+        compiled_trees, entries = [], 0
+        for root in roots:
+            tree_splits = _tree_splits(root, splits)
+            tree_features = sorted({splits[i].feature for i in tree_splits})
+
+            patterns, raw_luts = [], []   # per slot: decision dict per code; bin -> code
+            for f in tree_features:
+                on_f = [i for i in tree_splits if splits[i].feature == f]
+                codes, code_of, raw = [], {}, []
+                for b in range(n_bins(f)):
+                    pattern = tuple(goes_left(splits[i], b) for i in on_f)
+                    if pattern not in code_of:
+                        code_of[pattern] = len(codes)
+                        codes.append(dict(zip(on_f, pattern)))
+                    raw.append(code_of[pattern])
+                patterns.append(codes)
+                raw_luts.append(raw)
+
+            dims = [len(codes) for codes in patterns]
+            entries += int(np.prod(dims, dtype=np.float64))
+            if max_entries is not None and entries > max_entries:
+                raise ModelTooLarge(
+                    f"Compiled tables would exceed {max_entries:,} entries "
+                    f"(reached {entries:,} after {len(compiled_trees) + 1} of {len(roots)} trees)."
+                )
+            compiled_trees.append((root, tree_features, patterns, raw_luts, dims))
+
+        lut = [0] * n_bins(features[0])  # padding run
+        slot_row, lut_offset, table = [], [], []
+        for root, tree_features, patterns, raw_luts, dims in compiled_trees:
+            strides = np.cumprod([1] + dims[:0:-1])[::-1].tolist() if dims else []
+            offset = len(table)
+            for slot, f in enumerate(tree_features):
+                base = offset if slot == 0 else 0
+                lut_offset.append(len(lut))
+                lut.extend(base + code * strides[slot] for code in raw_luts[slot])
+                slot_row.append(row_of[f])
+            if not tree_features:  # single-leaf tree
+                lut_offset.append(len(lut))
+                lut.extend([offset] * n_bins(features[0]))
+                slot_row.append(0)
+            for _ in range(width - max(1, len(tree_features))):
+                lut_offset.append(0)
+                slot_row.append(0)
+
+            for combo in itertools.product(*(range(d) for d in dims)):
+                decided = {}
+                for slot, code in enumerate(combo):
+                    decided.update(patterns[slot][code])
+                node = root
+                while node[0] == "split":
+                    split = splits[node[1]]
+                    node = split.left if decided[node[1]] else split.right
+                table.append(node[1])
+
+        return cls(
+            feat_index=np.asarray(features, dtype=np.intp),
+            feat_is_cat=np.asarray([bool(feature_kind.get(f)) for f in features]),
+            feat_size=np.asarray(sizes or [0], dtype=np.intp),
+            feat_zero=np.asarray(zeros or [False]),
+            thr_start=np.asarray(thr_start, dtype=np.intp),
+            thresholds=thresholds,
+            slot_row=np.asarray(slot_row, dtype=np.intp).reshape(len(roots), width),
+            lut_offset=np.asarray(lut_offset, dtype=np.int32).reshape(len(roots), width),
+            lut=np.asarray(lut, dtype=np.int32),
+            table=np.asarray(table, dtype=np.float64),
+        )
+
+    # -----------------------------------------------------
+    # Evaluation
+    # -----------------------------------------------------
+    def bins(self, X):
+        """``(n_features_used, n_rows)`` global bin of every feature value."""
+        X = np.asarray(X, dtype=np.float64)
+        out = np.empty((len(self.feat_index), X.shape[0]), dtype=np.int32)
+        for row, column in enumerate(self.feat_index):
+            x = X[:, column]
+            size = self.feat_size[row]
+            nan = np.isnan(x)
+            if self.feat_is_cat[row]:
+                with np.errstate(invalid="ignore"):
+                    code = np.where(nan, 0.0, x).astype(np.intp)  # truncates like LightGBM's int cast
+                b = np.where((code >= 0) & (code < size), code, size)
+            else:
+                lo = self.thr_start[row]
+                b = np.searchsorted(self.thresholds[lo:lo + size], x, side="left")
+                if self.feat_zero[row]:
+                    b[np.abs(x) <= ZERO_THRESHOLD] = size + 2
+            b[nan] = size + 1
+            out[row] = b
+        return out
+
+    def predict(self, X):
+        bins = self.bins(X)
+        if not len(self.slot_row):
+            return np.zeros(bins.shape[1])
+        # One (T, n) gather per slot column; int32 halves the memory traffic.
+        index = None
+        for k in range(self.slot_row.shape[1]):
+            position = np.take(bins, self.slot_row[:, k], axis=0)
+            position += self.lut_offset[:, k, None]
+            part = np.take(self.lut, position)
+            index = part if index is None else index + part
+        # Reducing the outer axis of a C-ordered array adds rows one after
+        # another, i.e. trees are accumulated in order, like LightGBM.
+        return self.table[index].sum(axis=0)
+
+    # -----------------------------------------------------
+    # Persistence
+    # -----------------------------------------------------
+    def save(self, path):
+        np.savez(path, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in cls.ARRAYS})
@@ -10,16 +10,22 @@ urlpatterns = [
    
     path('signup/', views.user_signup, name='user_signup'),
     path('login/', views.api_user_login, name='api_user_login'),
+    # async variants for ASGI deployments (RSA work on core.crypto_pool)
+    path('signup/async/', views.user_signup_async, name='user_signup_async'),
+    path('login/async/', views.api_user_login_async, name='api_user_login_async'),
     path('password-reset/', views.password_reset_request, name='password_reset_request'),
     path('password-reset-confirm/<uidb64>/<token>/', views.password_reset_confirm, name='password_reset_confirm'),
     path('social-login/google/', views.google_social_login, name='google_social_login'),
     path('csrf/', views.csrf, name='csrf_token'),
+    path('crypto/session-key/', views.crypto_session_key, name='crypto_session_key'),
+    path('crypto/pool/stats/', views.crypto_pool_stats, name='crypto_pool_stats'),
     path('user-profile/', views.user_profile, name='user_profile'),
 
     # ======================================================
     #                 RECOMMENDATION & BOOKING ROUTES
     # ======================================================
     path('recommend/<int:user_id>/', views.recommend_view, name='recommend'),
+    path('recommend/batch/', views.recommend_batch_view, name='recommend_batch'),
     path('bookings/', views.BookingCreateView.as_view(), name='booking_create'),
     path('user/bookings/', views.user_booking_history, name='user_bookings'),
     path('user/bookings/<int:booking_id>/', views.user_booking_detail, name='user_booking_detail'),
@@ -78,6 +84,8 @@ urlpatterns = [
    
     
     path('admin/dashboard/', views.admin_dashboard_api, name='admin_dashboard_api'),
+    path('admin/recommendation-cache/', views.recommendation_cache_stats, name='admin_recommendation_cache'),
+    path('admin/ml-model/', views.ml_model_info, name='admin_ml_model'),
 
     # ======================================================
     #                 VERIFIER 1 ROUTES
@@ -14,87 +14,62 @@ from rest_framework.decorators import api_view, permission_classes,action
 from rest_framework.permissions import IsAuthenticated,AllowAny
 from rest_framework.response import Response
 from django.contrib.gis.geos import Point as GEOSPoint
+from django.contrib.gis.measure import D
 from .serializer import *
+from . import geo_grid, roles
 
 from django.http import JsonResponse
-from .data_prep import *# load_df returns DataFrame
-from shapely.geometry import Point
 from django.conf import settings
-import pandas as pd
-from sqlalchemy import create_engine
-from core.ml_model import recommendation_model  # Your pre-loaded LightGBM model
-from core.utils import haversine_vector
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 from rest_framework import status,viewsets
 from django.shortcuts import get_object_or_404
 import os
 import json
-import base64
-from Crypto.Cipher import AES, PKCS1_OAEP
-from Crypto.Util.Padding import unpad
 import hashlib
-from Crypto.PublicKey import RSA
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.core.files.base import ContentFile
 from django.views.decorators.csrf import csrf_exempt
 import razorpay
 import hmac
 from decimal import Decimal
-import joblib
-import lightgbm as lgb
 import os
-from .ml_model import recommendation_model, feature_cols
 from django.contrib.auth.decorators import login_required
 User = get_user_model()
 
-# Load RSA private key securely (store private.pem safely on your server)
-PRIVATE_KEY_PATH = os.path.join(settings.BASE_DIR, 'private.pem')
-with open(PRIVATE_KEY_PATH, 'rb') as key_file:
-    PRIVATE_KEY = RSA.import_key(key_file.read())
+# The RSA private key, the AES helpers and the per-session AES keys live in core/crypto.py
+from .crypto import drop_session_keys, establish_session_key
+# Encrypted payloads are decrypted by the parser: request.data is the plain {field: value}
+from rest_framework.decorators import parser_classes
+from .parsers import ENCRYPTED_PARSERS
 
-def decrypt_rsa(encrypted_b64):
-    try:
-        encrypted_data = base64.b64decode(encrypted_b64)
-        cipher_rsa = PKCS1_OAEP.new(PRIVATE_KEY)
-        decrypted = cipher_rsa.decrypt(encrypted_data)
-        return decrypted  # bytes representing AES key
-    except Exception:
-        return None
-
-def decrypt_aes(encrypted_b64, aes_key):
-    try:
-        encrypted_data = base64.b64decode(encrypted_b64)
-        iv = encrypted_data[:16]
-        ciphertext = encrypted_data[16:]
-        cipher_aes = AES.new(aes_key, AES.MODE_CBC, iv)
-        decrypted_data = unpad(cipher_aes.decrypt(ciphertext), AES.block_size)
-        return decrypted_data.decode('utf-8')
-    except Exception:
-        return None
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([AllowAny])
+def crypto_session_key(request):
+    """
+    POST {"key": RSA-OAEP(aes_key)} -> {"kid", "expires_in", "rotate_after"}; later
+    encrypted payloads send {"kid": ...} instead of "key". DELETE forgets all session keys.
+    """
+    if request.method == 'DELETE':
+        drop_session_keys(request.session)
+        return Response(status=204)
+
+    key_enc = request.data.get('key')
+    if not key_enc:
+        return Response({"error": "Missing encrypted key."}, status=400)
+    established = establish_session_key(request.session, key_enc)
+    if not established:
+        return Response({"error": "Invalid encrypted key."}, status=400)
+    return Response(established, status=201)
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@parser_classes(ENCRYPTED_PARSERS)
 def user_signup(request):
+    decrypted = request.data  # outside the try: a bad envelope is a 400, not a 500
     try:
-        payload = request.data
-        key_enc = payload.get('key')
-        data_enc = payload.get('data')
-        if not key_enc or not data_enc:
-            return Response({"error": "Missing encryption data."}, status=400)
-
-        aes_key = decrypt_rsa(key_enc)
-        if not aes_key:
-            return Response({"error": "Invalid encrypted key."}, status=400)
-
-        decrypted = {}
-        for field in ['name', 'email', 'password']:
-            val = decrypt_aes(data_enc.get(field), aes_key)
-            if val is None:
-                return Response({"error": f"Failed to decrypt {field}."}, status=400)
-            decrypted[field] = val
-
         email, password, name = decrypted.get('email'), decrypted.get('password'), decrypted.get('name')
         if not all([email, password, name]):
             return Response({"error": "Missing required information."}, status=400)
@@ -124,41 +99,16 @@ from core.models import UserRole
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@parser_classes(ENCRYPTED_PARSERS)
 def api_user_login(request):
+    # Decrypted credentials (the parser answers 400 for a bad envelope)
+    decrypted = request.data
     try:
-        payload = request.data
-        print(f"📥 Raw payload: {payload} (type: {type(payload)})")
-
-        # Check for key and data
-        key_enc = payload.get('key')
-        data_enc = payload.get('data')
-
-        if not key_enc or data_enc is None:
-            return Response({"error": "Missing encryption key or data."}, status=400)
-
-        # Ensure `data` is a dict
-        if not isinstance(data_enc, dict):
-            return Response({"error": "Data must be a JSON object."}, status=400)
-
-        encrypted_email = data_enc.get('email')
-        encrypted_password = data_enc.get('password')
-
-        if not encrypted_email or not encrypted_password:
-            return Response({"error": "Missing encrypted email or password."}, status=400)
-
-        # Decrypt AES key
-        aes_key = decrypt_rsa(key_enc)
-        if not aes_key:
-            return Response({"error": "Invalid encrypted key."}, status=400)
-
-        print(f"🔑 AES Key length: {len(aes_key)} bytes")
-
-        # Decrypt credentials
-        email = decrypt_aes(encrypted_email, aes_key)
-        password = decrypt_aes(encrypted_password, aes_key)
+        email = decrypted.get('email')
+        password = decrypted.get('password')
 
         if not email or not password:
-            return Response({"error": "Decryption failed."}, status=400)
+            return Response({"error": "Missing encrypted email or password."}, status=400)
 
         email = email.strip()
         password = password.strip()
@@ -172,16 +122,8 @@ def api_user_login(request):
 
         login(request, user)
 
-        # Get role and profile completeness
-        user_role = UserRole.objects.filter(user=user).first()
-        role = user_role.role if user_role else ("admin" if user.is_staff else "user")
-        profile_complete = all([user.phone, user.address, getattr(user, 'location', None)])
-
-        return Response({
-            "message": "Login successful",
-            "role": role,
-            "profile_complete": profile_complete
-        })
+        # Role (read once by login(), see core/roles.py) and profile completeness
+        return Response(login_summary(user, roles.user_roles(user)))
 
     except Exception as e:
         import traceback
@@ -190,6 +132,97 @@ def api_user_login(request):
         return Response({"error": "Internal server error."}, status=500)
 
 
+def login_summary(user, user_roles):
+    role = user_roles[0] if user_roles else ("admin" if user.is_staff else "user")
+    profile_complete = all([user.phone, user.address, getattr(user, 'location', None)])
+    return {
+        "message": "Login successful",
+        "role": role,
+        "profile_complete": profile_complete
+    }
+
+
+# ---------------------------------------------------------
+# 🔹 Async login / signup (ASGI)
+# ---------------------------------------------------------
+# Plain Django async views: the RSA step is awaited on core.crypto_pool and the
+# password hashing runs in a thread, so neither blocks the event loop. Same
+# payloads and responses as api_user_login / user_signup, and CSRF-exempt like
+# those AllowAny views; 503 + Retry-After when the crypto pool is saturated.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import alogin
+from django.views.decorators.http import require_POST
+from .crypto import EnvelopeError
+from .crypto_pool import CryptoPoolBusy, decrypt_envelope_async, get_pool
+
+
+async def _decrypted_body(request):
+    """(decrypted fields, None) or (None, error response)."""
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return None, JsonResponse({"error": "Invalid JSON."}, status=400)
+    try:
+        return await decrypt_envelope_async(request, payload), None
+    except EnvelopeError as e:
+        return None, JsonResponse({"error": str(e)}, status=400)
+    except CryptoPoolBusy:
+        response = JsonResponse({"error": "Server busy, please retry."}, status=503)
+        response["Retry-After"] = "1"
+        return None, response
+
+
+@csrf_exempt
+@require_POST
+async def api_user_login_async(request):
+    decrypted, error = await _decrypted_body(request)
+    if error:
+        return error
+    try:
+        email = (decrypted.get('email') or '').strip()
+        password = (decrypted.get('password') or '').strip()
+        if not email or not password:
+            return JsonResponse({"error": "Missing encrypted email or password."}, status=400)
+
+        # EmailBackend only implements the sync authenticate()
+        user = await sync_to_async(authenticate)(request, email=email, password=password)
+        if not user:
+            return JsonResponse({"error": "Invalid credentials."}, status=401)
+
+        await alogin(request, user)
+        return JsonResponse(login_summary(user, await sync_to_async(roles.user_roles)(user)))
+
+    except Exception as e:
+        import traceback
+        print(f"💥 Exception in async login: {str(e)}")
+        traceback.print_exc()
+        return JsonResponse({"error": "Internal server error."}, status=500)
+
+
+@csrf_exempt
+@require_POST
+async def user_signup_async(request):
+    decrypted, error = await _decrypted_body(request)
+    if error:
+        return error
+    try:
+        email, password, name = decrypted.get('email'), decrypted.get('password'), decrypted.get('name')
+        if not all([email, password, name]):
+            return JsonResponse({"error": "Missing required information."}, status=400)
+        if await User.objects.filter(email=email).aexists():
+            return JsonResponse({"error": "Email already registered."}, status=400)
+
+        try:
+            validate_password(password)
+        except Exception as e:
+            return JsonResponse({"error": getattr(e, 'messages', str(e))}, status=400)
+
+        await sync_to_async(User.objects.create_user)(email=email, password=password, name=name, is_active=True)
+        return JsonResponse({"message": "User registered successfully."}, status=201)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
 
 @api_view(['POST'])
 def password_reset_request(request):
@@ -218,21 +251,9 @@ def password_reset_request(request):
 
     return Response({"message": "Password reset link sent to your email."})
 @api_view(['POST'])
+@parser_classes(ENCRYPTED_PARSERS)
 def password_reset_confirm(request, uidb64, token):
-    payload = request.data
-    key_enc = payload.get('key')
-    data_enc = payload.get('data')
-    if not key_enc or not data_enc:
-        return Response({"error": "Missing encryption data."}, status=400)
-
-    # Decrypt AES key with RSA private key
-    aes_key = decrypt_rsa(key_enc)
-    if not aes_key:
-        return Response({"error": "Invalid encrypted key."}, status=400)
-
-    # Decrypt password with AES key
-    encrypted_password = data_enc.get('password')
-    new_password = decrypt_aes(encrypted_password, aes_key)
+    new_password = request.data.get('password')
     if not new_password:
         return Response({"error": "Failed to decrypt password."}, status=400)
 
@@ -288,192 +309,133 @@ def google_social_login(request):
         "email": user.email,
         "is_new_user": created,
     })
-import joblib
-import numpy as np
-import pandas as pd
-import lightgbm as lgb
-from shapely.geometry import Point
-from sqlalchemy import create_engine
 from django.conf import settings
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from .utils import haversine_vector
 from .models import Worker
-from .serializer import WorkerImageSerializer
+from django.http import StreamingHttpResponse
+from rest_framework.permissions import IsAdminUser
+
+# The recommendation modules (pandas, SQLAlchemy, LightGBM) are imported inside
+# the views below so that importing this module stays cheap; the ranker itself
+# comes from the lazy registry in core.ml_model.
 
 
 # ---------------------------------------------------------
-# 🔹 Load Trained Model + Feature Columns
+# 🔹 API Endpoint
 # ---------------------------------------------------------
-MODEL_PATH = 'ml_models/lgb_ranker.txt'
-FEATURE_COLS_PATH = 'ml_models/feature_cols.pkl'
+@api_view(['GET'])
+def recommend_view(request, user_id):
+    """Returns top-N recommended workers for a given user."""
+    from . import rec_cache
+    from .db import get_engine
+    from .recommender import attach_media, resolve_ranker
 
-recommendation_model = lgb.Booster(model_file=MODEL_PATH)
-feature_cols = joblib.load(FEATURE_COLS_PATH)
+    engine = get_engine()
 
+    try:
+        scorer, model = resolve_ranker(request.query_params.get("scorer"))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
 
-# ---------------------------------------------------------
-# 🔹 Helper Functions
-# ---------------------------------------------------------
-def build_user_locs_dict(engine):
-    """Build {user_id: Point(lon, lat)} from database."""
-    query = """
-        SELECT id,
-               ST_Y(location::geometry) AS lat,
-               ST_X(location::geometry) AS lon
-        FROM core_authenticateduser
-        WHERE location IS NOT NULL;
-    """
-    user_locs = pd.read_sql(query, engine)
-    return {row["id"]: Point(row["lon"], row["lat"]) for _, row in user_locs.iterrows()}
+    # Optional ?service=<service id>: only workers offering it are retrieved and scored
+    service_id = request.query_params.get("service")
+    if service_id is not None:
+        try:
+            service_id = int(service_id)
+        except ValueError:
+            return Response({"error": "service must be a service id."}, status=400)
 
+    recommendations = rec_cache.get_recommendations(
+        int(user_id), model, engine, top_n=10,
+        scorer=scorer, feature_cols=model.feature_cols if model else None, shadow=True,
+        service_id=service_id,
+    ) or []
+
+    # --- Absolute avatar URLs + address fallbacks (no extra query) ---
+    attach_media(recommendations, request.build_absolute_uri(settings.MEDIA_URL))
 
-def normalize(series):
-    """Safely normalize a pandas Series between 0–1."""
-    if series.max() == series.min():
-        return pd.Series(0.5, index=series.index)
-    return (series - series.min()) / (series.max() - series.min())
+    return Response({
+        "user_id": user_id,
+        "scorer": scorer,
+        "service": service_id,
+        "count": len(recommendations),
+        "recommendations": recommendations
+    })
 
 
-# ---------------------------------------------------------
-# 🔹 Core Recommendation Logic
-# ---------------------------------------------------------
-def recommend_top_n_for_user(user_id, model, engine, top_n=10):
-    user_locs_dict = build_user_locs_dict(engine)
-    user_point = user_locs_dict.get(user_id)
-    if not user_point:
-        return []
-
-    # --- User booking history ---
-    bookings_df = pd.read_sql(
-        "SELECT user_id, worker_id, service_id FROM bookings WHERE status='completed'",
-        engine
-    )
-    user_history = bookings_df[bookings_df["user_id"] == user_id]
-    is_new_user = user_history.empty
-
-    user_worker_counts = user_history.groupby("worker_id").size().to_dict()
-    past_services = set(user_history["service_id"].unique())
-
-    # --- Candidate workers ---
-    cand_sql = """
-        SELECT w.id AS worker_id,
-               wu.name AS worker_name,
-               s.id AS service_id,
-               s.service_type AS service_name,
-               ST_Y(w.location::geometry) AS worker_lat,
-               ST_X(w.location::geometry) AS worker_lon,
-               COALESCE(b.total_bookings, 0) AS num_bookings,
-               w.average_rating AS total_rating,
-               ws.charge,
-               w.is_available
-        FROM workers w
-        LEFT JOIN core_authenticateduser wu ON w.user_id = wu.id
-        LEFT JOIN worker_services ws ON w.id = ws.worker_id
-        LEFT JOIN core_service s ON ws.service_id = s.id
-        LEFT JOIN (
-            SELECT worker_id, COUNT(*) AS total_bookings
-            FROM bookings
-            WHERE status = 'completed'
-            GROUP BY worker_id
-        ) b ON w.id = b.worker_id
-        WHERE w.is_available = TRUE AND w.location IS NOT NULL;
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def recommend_batch_view(request):
     """
-    cand_df = pd.read_sql(cand_sql, engine)
-    if cand_df.empty:
-        return []
-    
-    # --- Fill nulls & clean ---
-    cand_df["total_rating"] = cand_df["total_rating"].fillna(0.0).astype(float)
-    cand_df["charge"] = cand_df["charge"].fillna(cand_df["charge"].median()).astype(float)
-    cand_df["num_bookings"] = cand_df["num_bookings"].fillna(0).astype(int)
-
-    # --- Distance computation ---
-    cand_df["distance_km"] = haversine_vector(
-        user_point.y, user_point.x,
-        cand_df["worker_lat"], cand_df["worker_lon"]
+    Streams top-N workers for many users. Body:
+    {"user_ids": [...], "top_n": 10, "format": "jsonl" | "csv", "scorer": "heuristic" | "model"}
+    """
+    from .batch_recommender import FORMATS as BATCH_FORMATS, batch_settings, recommend_batch
+    from .recommender import resolve_ranker
+
+    user_ids = request.data.get("user_ids") or []
+    fmt = request.data.get("format", "jsonl")
+    max_users = batch_settings()["MAX_API_USERS"]
+
+    if not isinstance(user_ids, list) or not user_ids:
+        return Response({"error": "user_ids must be a non-empty list."}, status=400)
+    if len(user_ids) > max_users:
+        return Response({"error": f"At most {max_users} users per request."}, status=400)
+    if fmt not in BATCH_FORMATS:
+        return Response({"error": f"Unknown format '{fmt}'."}, status=400)
+    try:
+        user_ids = [int(u) for u in user_ids]
+        top_n = int(request.data.get("top_n", 10))
+        scorer, model = resolve_ranker(request.data.get("scorer"))
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=400)
+    if top_n < 1:
+        return Response({"error": "top_n must be at least 1."}, status=400)
+
+    results = recommend_batch(
+        user_ids, model, model.feature_cols if model else None, top_n=top_n, scorer=scorer
     )
+    render, content_type = BATCH_FORMATS[fmt]
+    response = StreamingHttpResponse(render(results), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="recommendations.{fmt}"'
+    return response
 
-    # --- User-related features ---
-    cand_df["service_match"] = cand_df["service_id"].apply(lambda sid: 1 if sid in past_services else 0) if not is_new_user else 0
-    cand_df["user_worker_bookings"] = cand_df["worker_id"].map(user_worker_counts).fillna(0).astype(int)
-
-    # --- Feature normalization ---
-    cand_df["_loc_rank"] = np.exp(-cand_df["distance_km"] / 10)
-    cand_df["_num_bookings_rank"] = normalize(cand_df["num_bookings"])
-    cand_df["_charge_rank"] = 1 - normalize(cand_df["charge"])
-    cand_df["_rating_rank"] = normalize(cand_df["total_rating"])
-    cand_df["_service_match_rank"] = cand_df["service_match"]
-    cand_df["_user_worker_bookings_rank"] = normalize(cand_df["user_worker_bookings"])
-
-    # --- Score calculation ---
-    if is_new_user:
-        # Cold-start user (no booking history)
-        cand_df["final_rank_score"] = (
-            cand_df["_loc_rank"] * 0.7 +
-            cand_df["_rating_rank"] * 0.2 +
-            cand_df["_charge_rank"] * 0.1
-        )
-    else:
-        # Experienced user (combine multiple signals)
-        cand_df["final_rank_score"] = (
-            cand_df["_loc_rank"] * 0.4 +
-            cand_df["_service_match_rank"] * 0.2 +
-            cand_df["_num_bookings_rank"] * 0.15 +
-            cand_df["_user_worker_bookings_rank"] * 0.1 +
-            cand_df["_charge_rank"] * 0.05 +
-            cand_df["_rating_rank"] * 0.1
-        )
 
-    # --- Sort & pick top N ---
-    top_workers = cand_df.sort_values("final_rank_score", ascending=False).head(top_n)
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def recommendation_cache_stats(request):
+    """Hit/miss counters of the recommendation cache (DELETE resets them)."""
+    from . import rec_cache
 
-    return top_workers[[
-        "worker_id", "worker_name", "service_name", "worker_lat", "worker_lon",
-        "charge", "num_bookings", "total_rating", "distance_km",
-        "user_worker_bookings", "service_match", "final_rank_score"
-    ]].to_dict(orient="records")
+    if request.method == 'DELETE':
+        rec_cache.reset_stats()
+    return Response(rec_cache.stats())
 
 
-# ---------------------------------------------------------
-# 🔹 API Endpoint
-# ---------------------------------------------------------
-@api_view(['GET'])
-def recommend_view(request, user_id):
-    """Returns top-N recommended workers for a given user."""
-    db = settings.DATABASES['default']
-    conn_str = f"postgresql://{db['USER']}:{db['PASSWORD']}@{db['HOST']}:{db['PORT']}/{db['NAME']}"
-    engine = create_engine(conn_str, pool_pre_ping=True)
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def crypto_pool_stats(request):
+    """Queue depth and execution / wait times of the crypto pool (DELETE resets the counters)."""
+    pool = get_pool()
+    if request.method == 'DELETE':
+        pool.reset_stats()
+    return Response(pool.stats())
 
-    recommendations = recommend_top_n_for_user(
-        int(user_id), recommendation_model, engine, top_n=10
-    ) or []
 
-    # --- Fetch worker images and addresses ---
-    worker_ids = [rec.get("worker_id") for rec in recommendations if isinstance(rec, dict)]
-    workers = Worker.objects.filter(id__in=worker_ids)
-    serializer = WorkerImageSerializer(workers, many=True, context={'request': request})
-    
-    # Create maps for avatar and address
-    image_map = {item['id']: item['profile_image_url'] for item in serializer.data}
-    address_map = {worker.id: worker.address or "Not provided" for worker in workers}
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def ml_model_info(request):
+    """Serving / shadow ranker versions, their load cost and per-version scoring metrics."""
+    from .ml_model import model_info
 
-    # --- Merge images and addresses into recommendations ---
-    for rec in recommendations:
-        if isinstance(rec, dict):
-            worker_id = rec.get("worker_id")
-            rec["avatar"] = image_map.get(worker_id)
-            rec["address"] = address_map.get(worker_id)
+    return Response(model_info())
 
-    return Response({
-        "user_id": user_id,
-        "count": len(recommendations),
-        "recommendations": recommendations
-    })
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@parser_classes(ENCRYPTED_PARSERS)
 def user_profile(request):
     user = request.user
 
@@ -497,28 +459,12 @@ def user_profile(request):
 
     # ----------------------- POST -----------------------
     elif request.method == 'POST':
-        payload = request.data
-        key_enc = payload.get('key')
-        data_enc = payload.get('data')
-
-        if not key_enc or not data_enc:
-            return Response({"error": "Missing encryption data."}, status=400)
-
-        # Decrypt AES key
-        aes_key = decrypt_rsa(key_enc)
-        if not aes_key:
-            return Response({"error": "Invalid encrypted key."}, status=400)
-
         decrypted = {}
 
-        # fields to decrypt
+        # fields already decrypted by the parser
         for field in ['name', 'address', 'phone', 'location']:
-            val_enc = data_enc.get(field)
-            if val_enc:
-                val = decrypt_aes(val_enc, aes_key)
-                if val is None:
-                    return Response({"error": f"Failed to decrypt {field}."}, status=400)
-
+            val = request.data.get(field)
+            if val:
                 # Location should be JSON
                 if field == 'location':
                     try:
@@ -556,6 +502,12 @@ def user_profile(request):
                 return Response({"error": "Invalid location format."}, status=400)
 
         user.save()
+        if 'location' in decrypted:
+            from . import rec_cache
+            from .recommender import invalidate_user_location
+
+            invalidate_user_location(user.id)
+            rec_cache.invalidate_user(user.id)
         return Response({"message": "Profile updated"})
 
 from django.db.models import Prefetch   
@@ -563,62 +515,35 @@ class WorkerListView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        # Prefetch related WorkerServices and their linked Service to optimize queries
-        service_prefetch = Prefetch('services', queryset=WorkerService.objects.select_related('service'))
-        workers = Worker.objects.prefetch_related(service_prefetch)
+        # User, application, services and average charge loaded up front (no per-worker queries)
+        workers = WorkerSerializer.setup_eager_loading(Worker.objects.all())
+
+        # Optional ?lat=&lng=&radius_km= : indexed grid-cell lookup, then the exact distance check
+        if request.query_params.get('lat') and request.query_params.get('lng'):
+            try:
+                lat = float(request.query_params['lat'])
+                lng = float(request.query_params['lng'])
+                radius_km = float(request.query_params.get('radius_km', 10))
+            except ValueError:
+                return Response({"error": "lat, lng and radius_km must be numbers."}, status=400)
+            if not 0 < radius_km <= 50:
+                return Response({"error": "radius_km must be between 0 and 50."}, status=400)
+            workers = workers.filter(
+                grid_cell__in=geo_grid.neighbour_cells(lat, lng, radius_km),
+                location__dwithin=(GEOSPoint(lng, lat, srid=4326), D(km=radius_km)),
+            )
 
         serializer = WorkerSerializer(workers, many=True, context={'request': request})
         return Response(serializer.data)
 class BookingCreateView(APIView):
     permission_classes = [IsAuthenticated]
     serializer_class = BookingSerializer
-
-    def decrypt_aes(self, encrypted_bytes: bytes, aes_key: bytes) -> bytes:
-        """
-        Decrypt AES-CBC encrypted data (with first 16 bytes as IV).
-        Handles padding issues by stripping null bytes if unpad fails.
-        """
-        if len(encrypted_bytes) < 16:
-            raise ValueError("Invalid encrypted data length")
-
-        iv = encrypted_bytes[:16]
-        ciphertext = encrypted_bytes[16:]
-
-        remainder = len(ciphertext) % 16
-        if remainder != 0:
-            ciphertext += b'\x00' * (16 - remainder)
-
-        cipher = AES.new(aes_key, AES.MODE_CBC, iv)
-        decrypted_padded = cipher.decrypt(ciphertext)
-
-        try:
-            decrypted = unpad(decrypted_padded, AES.block_size)
-        except ValueError:
-            decrypted = decrypted_padded.rstrip(b'\x00')
-        return decrypted
+    # multipart: "key"/"kid", "data" (JSON string of encrypted fields) and "photos"
+    parser_classes = ENCRYPTED_PARSERS
 
     def post(self, request):
+        decrypted_map = request.data  # outside the try: a bad envelope is a 400, not a 500
         try:
-            payload = request.data
-            encrypted_key = payload.get("key")
-            encrypted_data_str = payload.get("data")
-
-            if not encrypted_key or not encrypted_data_str:
-                return Response({"error": "Missing encryption data."}, status=400)
-
-            aes_key = decrypt_rsa(encrypted_key)
-            if not aes_key:
-                return Response({"error": "Invalid encryption key."}, status=400)
-
-            encrypted_data = json.loads(encrypted_data_str)
-            decrypted_map = {}
-            for field in ["userId", "workerId", "contactDates", "description", "equipmentRequirement"]:
-                enc_field = encrypted_data.get(field)
-                if enc_field:
-                    enc_bytes = base64.b64decode(enc_field)
-                    decrypted_map[field] = self.decrypt_aes(enc_bytes, aes_key).decode("utf-8")
-
-
             serializer = BookingCreateSerializer(data={
                     "userId": int(decrypted_map["userId"]),
                     "workerId": int(decrypted_map["workerId"]),
@@ -902,11 +827,7 @@ def update_tariff(request):
 from .models import UserRole
 
 def user_has_worker_role(user):
-    try:
-        user_role = UserRole.objects.get(user=user)
-        return user_role.role == 'worker'
-    except UserRole.DoesNotExist:
-        return False
+    return roles.has_role(user, 'worker')
 @api_view(['GET'])
 def job_detail(request, pk):
     try:
@@ -1599,7 +1520,7 @@ def admin_list_users(request):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def admin_list_workers(request):
-    workers = Worker.objects.select_related('user').prefetch_related('services__service').all()
+    workers = WorkerSerializer.setup_eager_loading(Worker.objects.all())
     serializer = WorkerSerializer(workers, many=True, context={'request': request})
     return Response({"workers": serializer.data})
 
@@ -2580,10 +2501,7 @@ class ApplicationSharedDetailView(APIView):
 
         # Allow verifiers (stage 1–3) or staff
         user = request.user
-        if not (
-            hasattr(user, 'role')
-            and user.role in ['verifier1', 'verifier2', 'verifier3', 'admin']
-        ):
+        if not roles.has_role(user, 'verifier1', 'verifier2', 'verifier3', 'admin'):
             return Response({'error': 'Permission denied'}, status=403)
 
         serializer = WorkerApplicationDetailSerializer(app, context={'request': request})
@@ -2605,4 +2523,4 @@ class WorkerViewSet(viewsets.ModelViewSet):
                 Q(service__servicetype__icontains=query) |
                 Q(description__icontains=query)
             )
-        return queryset
\ No newline at end of file
+        return self.serializer_class.setup_eager_loading(queryset)
\ No newline at end of file
@@ -71,6 +71,8 @@ PHONENUMBER_DEFAULT_REGION = "IN"  # Correct code for India
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
+    # Server-Timing header (e.g. decrypt;dur=...) for phases timed with core.middleware.record_timing
+    'core.middleware.ServerTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -210,3 +212,140 @@ TEMPLATES = [
         },
     },
 ]
+
+# SQLAlchemy pool shared by the recommender / ML pipeline (see core/db.py)
+RECOMMENDER_DB_POOL = {
+    'POOL_SIZE': 5,
+    'MAX_OVERFLOW': 10,
+    'POOL_TIMEOUT': 30,
+    'POOL_RECYCLE': 1800,
+    'SLOW_CHECKOUT_MS': 50,
+    'LISTENERS': [],  # dotted paths to callback(event, alias, wait_seconds, pool)
+}
+
+# Seconds before the in-memory recommendation candidate snapshot is fully reloaded
+# (per-worker changes are applied immediately via signals; 0 disables the reload)
+RECOMMENDER_CANDIDATE_TTL = 300
+
+# Per-process LRU cache of user coordinates used by recommendations (TTL 0 disables)
+RECOMMENDER_USER_LOCATION_CACHE = {
+    'MAXSIZE': 10000,
+    'TTL': 300,
+}
+
+# Per-process cache of each user's completed-booking history (TTL 0 disables)
+RECOMMENDER_USER_HISTORY_CACHE = {
+    'MAXSIZE': 10000,
+    'TTL': 300,
+}
+
+# Recommendation candidate retrieval: "postgis" fetches only the K nearest workers via
+# the GiST index on workers.location, widening the radius from RADIUS_KM up to
+# MAX_RADIUS_KM until MIN_CANDIDATES workers are found; "snapshot" takes the workers
+# held in memory from the grid cells (GEO_GRID) around the user, with the same radii.
+RECOMMENDER_RETRIEVAL = {
+    'STRATEGY': 'postgis',
+    'K': 200,
+    'RADIUS_KM': 5,
+    'MAX_RADIUS_KM': 80,
+    'MIN_CANDIDATES': 20,
+}
+
+# How recommendations are scored: "heuristic" (weighted sum) or "model" (LightGBM
+# ranker in ml_models/). Can be overridden per request with ?scorer=.
+RECOMMENDER_SCORER = 'heuristic'
+
+# Bulk recommendations (POST /api/recommend/batch/, manage.py recommend_batch):
+# users are loaded CHUNK_USERS at a time and scored in batches of at most MAX_CELLS
+# user x candidate pairs.
+RECOMMENDER_BATCH = {
+    'MAX_CELLS': 2_000_000,
+    'CHUNK_USERS': 1_000,
+    'MAX_API_USERS': 10_000,
+}
+
+# Caches. "recommendations" holds finished recommendation lists and must be shared by
+# every process: invalidations (post_save signals) and manage.py warm_recommendations
+# run in one process and have to reach all web workers. The default is the database
+# cache (table created by migration 0013); 'django.core.cache.backends.redis.RedisCache'
+# (LOCATION = 'redis://host:6379/1') is faster. A per-process LocMemCache only suits a
+# single-process dev server, and warm_recommendations refuses to run against it.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'recommendations': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'recommendation_cache',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+
+RECOMMENDER_RESULT_CACHE = {
+    'ALIAS': 'recommendations',
+    'TTL': 600,            # seconds; 0 disables the result cache
+    'AREA_CELL_DEG': 0.5,  # service-area grid cell (~55 km); a changed worker invalidates
+                           # every cell within RECOMMENDER_RETRIEVAL['MAX_RADIUS_KM'] (~25)
+    'WARM_USERS': 500,     # users pre-computed by manage.py warm_recommendations
+}
+
+# Load the LightGBM ranker (and pandas / SQLAlchemy) at startup instead of on the
+# first recommendation. Enable under `gunicorn --preload` so forked workers share it.
+ML_PRELOAD_MODELS = False
+
+# Versioned ranker store (ml_models/versions/, CURRENT and SHADOW pointers).
+# Processes re-check the pointers every ML_MODEL_RELOAD_INTERVAL seconds; a SHADOW
+# version is scored alongside CURRENT on ML_SHADOW_SAMPLE_RATE of recommend_view requests
+# (sampled requests skip the result cache so hits are sampled too).
+ML_MODEL_RELOAD_INTERVAL = 30
+ML_SHADOW_SAMPLE_RATE = 0.0
+
+# "lightgbm" scores with Booster.predict; "numpy" with the compiled lookup-table
+# form from core/tree_eval.py (same scores, lightgbm not imported when the version
+# ships a compiled_ranker.npz). Compare with `manage.py bench_tree_eval`.
+ML_RANKER_EVALUATOR = 'lightgbm'
+# Versions whose compiled tables would exceed this many entries (8 bytes each) are
+# not compiled and keep scoring with lightgbm (deep trees grow the tables fast).
+ML_RANKER_MAX_TABLE_ENTRIES = 2_000_000
+
+# On-disk columnar cache used by `manage.py train_model --streaming`: rows are read
+# CHUNKSIZE at a time through a server-side cursor and LightGBM trains from memmaps.
+ML_TRAINING_CACHE = {
+    'DIRECTORY': os.path.join(BASE_DIR, 'ml_models', 'training_cache'),
+    'CHUNKSIZE': 100_000,
+}
+
+# Fixed lat/lon grid (core/geo_grid.py) behind workers.grid_cell /
+# core_authenticateduser.grid_cell; run `manage.py rebuild_geo_grid` after changing it.
+GEO_GRID = {
+    'CELL_DEG': 0.05,
+}
+
+# Distance kernel used when scoring candidates (core/distance.py): "haversine" (exact
+# great-circle) or "equirectangular" (flat approximation, ~1e-4 relative error at city scale).
+RECOMMENDER_DISTANCE = 'haversine'
+
+# Per-session AES keys (core/crypto.py): a client RSA-encrypts its AES key once via
+# POST /api/crypto/session-key/ and then sends {"kid": ...} instead of an RSA-wrapped key.
+CRYPTO_SESSION_KEYS = {
+    'TTL': 3600,          # seconds a session key stays valid
+    'ROTATE_AFTER': 1800, # clients are told to establish a fresh key after this
+    'MAX_KEYS': 2,        # newest keys kept per session (old one usable during rotation)
+}
+
+# Worker pool for RSA private-key operations in the async login/signup views
+# (core/crypto_pool.py). KIND: "thread" (GMP releases the GIL) or "process".
+# Past MAX_PENDING queued + running jobs the views answer 503 instead of queueing.
+CRYPTO_POOL = {
+    'KIND': 'thread',
+    'WORKERS': 4,
+    'MAX_PENDING': 64,
+}
+
+# Role lookups for permission classes (core/roles.py): kept per request on the user and
+# for TTL seconds in this cache; filled at login, dropped when a UserRole is saved/deleted.
+# With the local-memory cache other processes only see role changes after TTL.
+ROLE_CACHE = {
+    'ALIAS': 'default',
+    'TTL': 300,
+}
@@ -120,6 +120,14 @@ def test_recommendations():
     check_status(r, [200, 404])
 
 
+def test_recommendations_for_service():
+    r = requests.get(f"{BASE_URL}/recommend/1/", params={"service": 1})
+    check_status(r, [200, 404])
+
+    r = requests.get(f"{BASE_URL}/recommend/1/", params={"service": "plumbing"})
+    check_status(r, [400])
+
+
 def test_booking_create(auth_headers):
     payload = {
         "userId": 1,
@@ -105,3 +105,125 @@ def test_full_integration(client, test_user):
         print(f"🔹 Progress: {progress}% integration testing completed")
 
         assert r.status_code in allowed_status, f"{ep} returned {r.status_code}"
+
+
+# ----------------------
+# 🔑 Session AES key
+# ----------------------
+@pytest.mark.django_db
+def test_login_with_session_key(client, test_user):
+    aes_key = os.urandom(32)
+    resp = client.post(
+        "/api/crypto/session-key/",
+        json.dumps({"key": encrypt_rsa(aes_key)}),
+        content_type="application/json",
+    )
+    assert resp.status_code == 201
+    kid = resp.json()["kid"]
+
+    def login_payload(kid):
+        return json.dumps({
+            "kid": kid,
+            "data": {
+                "email": encrypt_aes(test_user.email, aes_key),
+                "password": encrypt_aes("Test@1234", aes_key),
+            },
+        })
+
+    resp = client.post("/api/login/", login_payload("unknown"), content_type="application/json")
+    assert resp.status_code == 400
+
+    resp = client.post("/api/login/", login_payload(kid), content_type="application/json")
+    assert resp.status_code == 200, "Login with session key failed"
+
+    # login() keeps the session data, so the key id still works afterwards
+    resp = client.post("/api/login/", login_payload(kid), content_type="application/json")
+    assert resp.status_code == 200
+
+
+# ----------------------
+# 📦 Encrypted payload parser
+# ----------------------
+@pytest.mark.django_db
+def test_encrypted_payload_parser(client, test_user):
+    aes_key = os.urandom(16)
+    data = {
+        "email": encrypt_aes(test_user.email, aes_key),
+        "password": encrypt_aes("Test@1234", aes_key),
+    }
+
+    resp = client.post("/api/login/", json.dumps({"data": data}), content_type="application/json")
+    assert resp.status_code == 400
+    assert resp.json() == {"error": "Missing encryption data."}
+
+    bad = dict(data, password="not-base64!")
+    resp = client.post("/api/login/", json.dumps({"key": encrypt_rsa(aes_key), "data": bad}),
+                       content_type="application/json")
+    assert resp.status_code == 400
+    assert resp.json() == {"error": "Failed to decrypt password."}
+
+    resp = client.post("/api/login/", json.dumps({"key": encrypt_rsa(aes_key), "data": data}),
+                       content_type="application/json")
+    assert resp.status_code == 200
+    assert resp["Server-Timing"].startswith("decrypt;dur=")
+
+
+# ----------------------
+# ⚡ Async login (crypto pool)
+# ----------------------
+@pytest.mark.django_db(transaction=True)
+def test_async_login(test_user):
+    from django.test import Client
+    from core.crypto_pool import get_pool
+
+    client = Client(enforce_csrf_checks=True)  # no CSRF token, like the DRF login views
+
+    aes_key = os.urandom(32)
+    payload = {
+        "key": encrypt_rsa(aes_key),
+        "data": {
+            "email": encrypt_aes(test_user.email, aes_key),
+            "password": encrypt_aes("Test@1234", aes_key),
+        },
+    }
+    submitted = get_pool().stats()["submitted"]
+
+    resp = client.post("/api/login/async/", json.dumps(dict(payload, key="bad")), content_type="application/json")
+    assert resp.status_code == 400
+
+    resp = client.post("/api/login/async/", json.dumps(payload), content_type="application/json")
+    assert resp.status_code == 200, "Async login failed"
+    assert resp.json()["role"] == "worker"
+    assert get_pool().stats()["submitted"] == submitted + 2
+
+    signup = {
+        "key": encrypt_rsa(aes_key),
+        "data": {
+            "email": encrypt_aes(f"async_{uuid.uuid4().hex[:6]}@example.com", aes_key),
+            "password": encrypt_aes("Test@1234", aes_key),
+            "name": encrypt_aes("Async User", aes_key),
+        },
+    }
+    resp = client.post("/api/signup/async/", json.dumps(signup), content_type="application/json")
+    assert resp.status_code == 201, "Async signup failed"
+
+
+def test_crypto_pool_counts_cancelled_jobs_until_done():
+    import asyncio
+    import threading
+    from core.crypto_pool import CryptoPool
+
+    pool = CryptoPool(workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def cancel_running_job():
+        task = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(cancel_running_job())
+    assert pool.stats()["pending"] == 1  # the job still occupies the worker
+    release.set()
+    pool.shutdown()
+    assert pool.stats()["pending"] == 0
@@ -0,0 +1,134 @@
+from contextlib import nullcontext
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import batch_recommender, recommender
+from core.candidates import CandidateSnapshot, candidate_index
+
+
+# ----------------------
+# ⚙️ Fixtures
+# ----------------------
+@pytest.fixture
+def snapshot():
+    rng = np.random.default_rng(7)
+    # a dense city plus a few scattered workers far out
+    lat = np.concatenate([rng.uniform(12.90, 13.05, 300), rng.uniform(11.5, 14.5, 40)])
+    lon = np.concatenate([rng.uniform(77.50, 77.70, 300), rng.uniform(76.0, 79.0, 40)])
+    n = len(lat)
+    return CandidateSnapshot({
+        "worker_id": np.arange(n, dtype=np.int64) // 2,
+        "worker_name": np.full(n, "worker", dtype=object),
+        "service_id": np.arange(n, dtype=np.int64) % 2 + 1,
+        "service_name": np.full(n, "service", dtype=object),
+        "worker_lat": np.repeat(lat[::2], 2),
+        "worker_lon": np.repeat(lon[::2], 2),
+        "num_bookings": rng.integers(0, 50, size=n),
+        "total_rating": rng.uniform(0, 5, size=n),
+        "charge": rng.uniform(100, 1000, size=n),
+        "is_available": np.repeat(rng.random(n // 2) > 0.1, 2),
+        "profile_image": np.full(n, None, dtype=object),
+        "address": np.full(n, None, dtype=object),
+    })
+
+
+@pytest.fixture
+def users(snapshot, settings, monkeypatch):
+    settings.RECOMMENDER_RETRIEVAL = {
+        "STRATEGY": "snapshot", "RADIUS_KM": 2, "MAX_RADIUS_KM": 80, "MIN_CANDIDATES": 20,
+    }
+    settings.RECOMMENDER_BATCH = {"MAX_CELLS": 500, "CHUNK_USERS": 4}
+
+    locations = pd.DataFrame({
+        "id": [1, 2, 3, 4, 5, 6],
+        "lat": [12.95, 12.9501, 13.02, 12.0, 14.4, 12.95],
+        "lon": [77.60, 77.6001, 77.55, 76.5, 78.9, 77.60],
+    })
+    histories = pd.DataFrame({
+        "user_id": [2, 2, 3],
+        "worker_id": [10, 11, 40],
+        "service_id": [1, 2, 2],
+        "worker_rating": [4.0, 3.5, None],
+    })
+    monkeypatch.setattr(candidate_index, "snapshot", lambda: snapshot)
+    monkeypatch.setattr(
+        batch_recommender, "_load_users",
+        lambda conn, ids: (locations[locations["id"].isin(ids)], histories[histories["user_id"].isin(ids)]),
+    )
+
+    def location(user_id, engine=None):
+        row = locations[locations["id"] == user_id]
+        return (row["lat"].iloc[0], row["lon"].iloc[0]) if len(row) else None
+
+    def history(user_id, engine=None):
+        rows = histories[histories["user_id"] == user_id]
+        return rows[["worker_id", "service_id", "worker_rating"]].reset_index(drop=True)
+
+    monkeypatch.setattr(recommender, "get_user_location", location)
+    monkeypatch.setattr(recommender, "get_user_history", history)
+    return [1, 2, 3, 4, 5, 6, 99]
+
+
+# ----------------------
+# 🔁 Same results as the single-user path
+# ----------------------
+FEATURE_COLS = [
+    "worker_lat", "worker_lon", "charge", "num_bookings",
+    "distance_km_scaled", "distance_bucket", "service_match",
+    "worker_avg_rating", "worker_total_bookings", "user_avg_rating",
+]
+
+
+class LinearRanker:
+    """Stand-in for the LightGBM ranker: a fixed weighted sum of the features."""
+
+    def __init__(self):
+        self.weights = np.linspace(-1.0, 1.0, len(FEATURE_COLS))
+
+    def predict(self, matrix):
+        return np.nan_to_num(matrix, nan=-1.0) @ self.weights
+
+
+@pytest.mark.parametrize("model", [None, LinearRanker()], ids=["heuristic", "model"])
+def test_score_batch_matches_score_candidates(snapshot, model):
+    lats = np.array([12.95, 13.02, 12.0])
+    lons = np.array([77.60, 77.55, 76.5])
+    user_ids = np.array([1, 2, 3])
+    histories = pd.DataFrame({
+        "user_id": [2, 2, 3],
+        "worker_id": [10, 11, 999],
+        "service_id": [1, 2, 7],
+        "worker_rating": [4.0, None, 2.0],
+    })
+
+    batch = batch_recommender.score_batch(snapshot, lats, lons, histories, user_ids, model, FEATURE_COLS)
+    for i, user_id in enumerate(user_ids):
+        history = histories[histories["user_id"] == user_id][["worker_id", "service_id", "worker_rating"]]
+        history = history.reset_index(drop=True)
+        if model is None:
+            single = recommender.score_candidates(snapshot, lats[i], lons[i], history)
+        else:
+            single = recommender.score_candidates_with_model(
+                snapshot, lats[i], lons[i], history, model, FEATURE_COLS
+            )
+        for name, values in single.items():
+            expected = batch[name][i] if batch[name].ndim == 2 else batch[name]
+            np.testing.assert_allclose(values, expected, err_msg=name)
+
+
+@pytest.mark.parametrize("top_n", [1, 10, 500])
+def test_batch_matches_single_user(snapshot, users, top_n):
+    engine = SimpleNamespace(connect=nullcontext)
+    batch = dict(batch_recommender.recommend_batch(users, top_n=top_n, scorer="heuristic", engine=engine))
+
+    assert list(batch) == users
+    assert batch[99] == []
+    for user_id in users:
+        assert batch[user_id] == recommender.recommend_top_n_for_user(
+            user_id, None, engine, top_n=top_n, scorer="heuristic"
+        )
+    # users in the city are scored against the rows around them, not the whole snapshot
+    assert len(batch[1]) < min(top_n + 1, snapshot.is_available.sum())
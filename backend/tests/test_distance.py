@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from core import distance
+from core.utils import haversine_vector
+
+
+# ----------------------
+# 📏 Kernels
+# ----------------------
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-60, 60, size=500)
+    lon = rng.uniform(-180, 180, size=500)
+    return lat, lon, distance.prepared_points(lat, lon)
+
+
+def test_haversine_matches_reference_and_broadcasts(points):
+    lat, lon, prepared = points
+    users_lat = np.array([[12.97], [-33.9], [51.5]])
+    users_lon = np.array([[77.59], [151.2], [-0.12]])
+
+    out = np.empty((3, 500))
+    result = distance.haversine_km(users_lat, users_lon, prepared, out=out)
+    assert result is out
+    np.testing.assert_allclose(result, haversine_vector(users_lat, users_lon, lat, lon), rtol=1e-9, atol=1e-9)
+
+    with pytest.raises(ValueError):
+        distance.haversine_km(12.97, 77.59, prepared, out=np.empty(3))
+
+
+def test_equirectangular_is_close_at_short_range():
+    rng = np.random.default_rng(1)
+    lat = 12.97 + rng.uniform(-0.3, 0.3, size=1_000)
+    lon = 77.59 + rng.uniform(-0.3, 0.3, size=1_000)
+    expected = haversine_vector(12.97, 77.59, lat, lon)
+    approx = distance.equirectangular_km(12.97, 77.59, distance.prepared_points(lat, lon))
+    np.testing.assert_allclose(approx, expected, rtol=1e-4)
+
+    # across the antimeridian
+    across = distance.equirectangular_km(0.0, 179.99, distance.prepared_points([0.0], [-179.99]))
+    np.testing.assert_allclose(across, haversine_vector(0.0, 179.99, 0.0, -179.99), rtol=1e-4)
@@ -0,0 +1,85 @@
+import uuid
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+
+from core import feature_store
+from core.models import Booking, Service, UserFeatures, UserReview, Worker, WorkerFeatures
+
+
+# ----------------------
+# ⚙️ Fixtures
+# ----------------------
+def make_user(name):
+    return get_user_model().objects.create_user(
+        email=f"{name}_{uuid.uuid4().hex[:6]}@example.com", password="Test@1234", name=name
+    )
+
+
+@pytest.fixture
+def worker(db):
+    return Worker.objects.create(
+        user=make_user("worker"), address="Test Address", experience_years=2, location=Point(77.59, 12.97)
+    )
+
+
+@pytest.fixture
+def customer(db):
+    return make_user("customer")
+
+
+@pytest.fixture
+def service(db):
+    return Service.objects.create(service_type=f"Plumbing {uuid.uuid4().hex[:6]}", base_coins_cost=100)
+
+
+def snapshot(worker, user):
+    wf = WorkerFeatures.objects.filter(worker=worker).values("completed_bookings", "review_count", "rating_sum").first()
+    uf = UserFeatures.objects.filter(user=user).values("completed_bookings", "review_count", "rating_sum").first()
+    return wf, uf
+
+
+# ----------------------
+# 📊 Feature store
+# ----------------------
+def test_incremental_updates_match_rebuild(worker, customer, service):
+    booking = Booking.objects.create(user=customer, worker=worker, service=service)
+    other = Booking.objects.create(user=customer, worker=worker, service=service, status="completed")
+
+    booking.status = "completed"
+    booking.save()
+    other.status = "cancelled"
+    other.save()
+    review = UserReview.objects.create(user=customer, worker=worker, booking=booking, rating=4)
+    review.rating = 5
+    review.save()
+    UserReview.objects.create(user=customer, worker=worker, booking=other, rating=2)
+
+    wf, uf = snapshot(worker, customer)
+    assert wf == {"completed_bookings": 1, "review_count": 2, "rating_sum": 7.0}
+    assert uf == wf
+
+    worker.refresh_from_db()
+    assert worker.average_rating == 3.5
+    assert worker.total_reviews == 2
+
+    feature_store.rebuild()
+    assert snapshot(worker, customer) == (wf, uf)
+
+
+def test_deleting_completed_booking_decrements(worker, customer, service):
+    booking = Booking.objects.create(user=customer, worker=worker, service=service, status="completed")
+    assert snapshot(worker, customer)[0]["completed_bookings"] == 1
+
+    booking.delete()
+    assert snapshot(worker, customer)[0]["completed_bookings"] == 0
+
+
+def test_decrement_of_drifted_count_stops_at_zero(worker, customer, service):
+    booking = Booking.objects.create(user=customer, worker=worker, service=service, status="completed")
+    WorkerFeatures.objects.filter(worker=worker).update(completed_bookings=0)  # drift: no signal
+
+    booking.delete()
+    assert snapshot(worker, customer)[0]["completed_bookings"] == 0
+    assert snapshot(worker, customer)[1]["completed_bookings"] == 0
@@ -0,0 +1,57 @@
+import uuid
+
+import numpy as np
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.db import connection
+
+from core import geo_grid
+from core.models import Worker
+from core.utils import haversine_vector
+
+
+# ----------------------
+# 🗺️ Cells
+# ----------------------
+@pytest.mark.parametrize("lat, lon", [(12.97, 77.59), (-33.9, 151.2), (64.1, -21.9), (0.01, 179.99)])
+def test_neighbour_cells_cover_radius(lat, lon):
+    rng = np.random.default_rng(0)
+    points_lat = lat + rng.uniform(-0.3, 0.3, size=5_000)
+    points_lon = lon + rng.uniform(-0.3, 0.3, size=5_000)
+    points_lon = (points_lon + 180.0) % 360.0 - 180.0
+    inside = haversine_vector(lat, lon, points_lat, points_lon) <= 10.0
+
+    cells = set(geo_grid.neighbour_cells(lat, lon, 10.0))
+    assert set(geo_grid.cell_ids(points_lat[inside], points_lon[inside]).tolist()) <= cells
+
+    index = geo_grid.CellIndex(points_lat, points_lon)
+    near = index.rows_near(lat, lon, 10.0)
+    assert set(np.flatnonzero(inside)) <= set(near.tolist())
+    assert len(near) < len(points_lat)
+
+
+def test_cell_ids_handle_missing_coordinates():
+    assert geo_grid.cell_ids([np.nan, 12.97], [77.59, 77.59]).tolist()[0] == -1
+    assert geo_grid.cell_for_point(None) is None
+
+
+# ----------------------
+# 💾 Stored cells
+# ----------------------
+def test_grid_cell_maintained_on_save_and_rebuild(db):
+    user = get_user_model().objects.create_user(
+        email=f"grid_{uuid.uuid4().hex[:6]}@example.com", password="Test@1234", name="grid"
+    )
+    worker = Worker.objects.create(user=user, address="Test Address", location=Point(77.59, 12.97))
+    assert worker.grid_cell == geo_grid.cell_id(12.97, 77.59)
+
+    worker.location = Point(151.2, -33.9)
+    worker.save(update_fields=["location"])
+    worker.refresh_from_db()
+    assert worker.grid_cell == geo_grid.cell_id(-33.9, 151.2)
+
+    Worker.objects.filter(pk=worker.pk).update(grid_cell=None)
+    geo_grid.rebuild(connection)
+    worker.refresh_from_db()
+    assert worker.grid_cell == geo_grid.cell_id(-33.9, 151.2)
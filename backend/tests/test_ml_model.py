@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pytest
+
+lgb = pytest.importorskip("lightgbm")
+
+from core import ml_model
+
+FEATURE_COLS = ["distance_km_scaled", "service_match", "worker_avg_rating"]
+
+
+# ----------------------
+# ⚙️ Fixtures
+# ----------------------
+@pytest.fixture
+def store(tmp_path, settings, monkeypatch):
+    """An empty model store in ``tmp_path``, re-read on every ``get_model()``."""
+    settings.ML_MODEL_RELOAD_INTERVAL = 0
+    monkeypatch.setattr(ml_model, "ML_DIR", str(tmp_path))
+    monkeypatch.setattr(ml_model, "VERSIONS_DIR", str(tmp_path / "versions"))
+    monkeypatch.setattr(ml_model, "_current", ml_model._Slot("CURRENT"))
+    return tmp_path
+
+
+def train(seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(600, len(FEATURE_COLS)))
+    y = rng.integers(0, 4, size=600)
+    dataset = lgb.Dataset(X, label=y, group=[20] * 30, params={"verbose": -1})
+    params = {"objective": "lambdarank", "num_leaves": 7, "min_data_in_leaf": 5, "verbose": -1}
+    return lgb.train(params, dataset, num_boost_round=10)
+
+
+# ----------------------
+# 📦 Versions & pointers
+# ----------------------
+@pytest.mark.parametrize("evaluator", ["lightgbm", "numpy"])
+def test_publish_point_and_load_round_trip(store, settings, evaluator):
+    settings.ML_RANKER_EVALUATOR = evaluator
+    first, second = train(1), train(2)
+    X = np.random.default_rng(3).normal(size=(50, len(FEATURE_COLS)))
+
+    version, directory = ml_model.publish_version(first, FEATURE_COLS, {"ndcg@10": 0.5}, version="v1")
+    assert (version, directory) == ("v1", os.path.join(ml_model.VERSIONS_DIR, "v1"))
+    assert ml_model.read_pointer("CURRENT") == "v1"
+    assert os.path.exists(os.path.join(directory, ml_model.COMPILED_FILE)) == (evaluator == "numpy")
+
+    model = ml_model.get_model()
+    assert (model.version, model.evaluator, model.feature_cols) == ("v1", evaluator, FEATURE_COLS)
+    assert model.metrics == {"version": "v1", "ndcg@10": 0.5}
+    np.testing.assert_allclose(model.predict(X), first.predict(X))
+
+    # stored only: serving does not change until the pointer moves
+    ml_model.publish_version(second, FEATURE_COLS, version="v2", pointer=None)
+    assert ml_model.get_model().version == "v1"
+    ml_model.write_pointer("CURRENT", "v2")
+    np.testing.assert_allclose(ml_model.get_model().predict(X), second.predict(X))
+    assert ml_model.list_versions() == ["v1", "v2"]
+
+
+def test_unknown_or_duplicate_versions_are_refused(store):
+    ml_model.publish_version(train(1), FEATURE_COLS, version="v1")
+    with pytest.raises(ValueError):
+        ml_model.publish_version(train(2), FEATURE_COLS, version="v1")
+    with pytest.raises(ValueError):
+        ml_model.write_pointer("CURRENT", "missing")
+    assert ml_model.read_pointer("CURRENT") == "v1"
@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from core import rec_cache
+
+CITY = (12.97, 77.59)
+NEARBY = (13.30, 77.90)     # ~50 km away, within retrieval reach
+ELSEWHERE = (19.07, 72.88)  # another city
+
+
+# ----------------------
+# ⚙️ Fixtures
+# ----------------------
+@pytest.fixture(autouse=True)
+def empty_cache(db):
+    rec_cache._cache().clear()
+    yield
+    rec_cache._cache().clear()
+
+
+def key(user_id, location):
+    return rec_cache.result_key(user_id, location, "heuristic", 10)
+
+
+# ----------------------
+# 🔑 Generations
+# ----------------------
+def test_keys_are_stable_until_invalidated():
+    assert key(1, CITY) == key(1, CITY)
+    assert key(1, CITY) != key(2, CITY)
+    assert key(1, CITY) != rec_cache.result_key(1, CITY, "heuristic", 10, service_id=3)
+
+
+def test_invalidate_user_changes_only_their_keys():
+    before = key(1, CITY), key(2, CITY)
+    rec_cache.invalidate_user(1)
+    assert key(1, CITY) != before[0]
+    assert key(2, CITY) == before[1]
+
+
+def test_invalidate_area_changes_keys_within_reach():
+    before = key(1, CITY), key(2, NEARBY), key(3, ELSEWHERE)
+    rec_cache.invalidate_area(*CITY)
+    assert key(1, CITY) != before[0]
+    assert key(2, NEARBY) != before[1]
+    assert key(3, ELSEWHERE) == before[2]
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    """Arguments of every ``recommend_top_n_for_user`` call; each returns a new list."""
+    from core import recommender
+
+    calls = []
+    monkeypatch.setattr(recommender, "get_user_location", lambda user_id, engine=None: CITY)
+    monkeypatch.setattr(recommender, "shadow_sampled", lambda: False)
+    monkeypatch.setattr(
+        recommender, "recommend_top_n_for_user",
+        lambda *args, **kwargs: calls.append(args) or [{"worker_id": len(calls)}],
+    )
+    return calls
+
+
+def test_invalidated_entries_are_not_served(computed):
+
+    assert rec_cache.get_recommendations(1, None, None) == [{"worker_id": 1}]
+    assert rec_cache.get_recommendations(1, None, None) == [{"worker_id": 1}]
+    rec_cache.invalidate_area(*NEARBY)
+    assert rec_cache.get_recommendations(1, None, None) == [{"worker_id": 2}]
+
+
+def test_swapping_the_model_version_retires_model_lists(computed):
+    v1, v2 = SimpleNamespace(version="v1"), SimpleNamespace(version="v2")
+    assert rec_cache.get_recommendations(1, v1, None, scorer="model") == [{"worker_id": 1}]
+    assert rec_cache.get_recommendations(1, v1, None, scorer="model") == [{"worker_id": 1}]
+    assert rec_cache.get_recommendations(1, v2, None, scorer="model") == [{"worker_id": 2}]
+    # the heuristic lists do not depend on the ranker
+    assert rec_cache.get_recommendations(1, v1, None) == [{"worker_id": 3}]
+    assert rec_cache.get_recommendations(1, v2, None) == [{"worker_id": 3}]
+
+
+def test_shadow_sample_includes_cache_hits(computed, monkeypatch):
+    from core import recommender
+
+    assert rec_cache.get_recommendations(1, None, None, shadow=True) == [{"worker_id": 1}]
+    monkeypatch.setattr(recommender, "shadow_sampled", lambda: True)
+    assert rec_cache.get_recommendations(1, None, None, shadow=True) == [{"worker_id": 2}]
+    assert computed[-1][6] is True  # recomputed with the shadow ranker
+
+
+# ----------------------
+# 🌐 Shared backend
+# ----------------------
+def test_default_backend_is_shared():
+    assert rec_cache.is_shared()
+    assert rec_cache.stats()["shared"]
+
+
+def test_warmer_refuses_process_local_cache(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        "recommendations": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    }
+    assert not rec_cache.is_shared()
+    with pytest.raises(CommandError, match="local to this process"):
+        call_command("warm_recommendations")
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import recommender
+from core.candidates import CandidateSnapshot
+from core.utils import haversine_vector
+
+USER = (12.97, 77.59)
+
+# Deliberately not the training order: columns must follow feature_cols, whatever it is.
+FEATURE_COLS = [
+    "user_avg_rating", "service_match", "distance_bucket", "worker_total_bookings",
+    "charge", "distance_km_scaled", "worker_avg_rating", "worker_lon", "worker_lat", "num_bookings",
+]
+
+
+# ----------------------
+# ⚙️ Fixtures
+# ----------------------
+class RecordingRanker:
+    """Stand-in ranker that keeps every matrix it is asked to score."""
+
+    feature_cols = FEATURE_COLS
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, matrix):
+        self.calls.append(matrix.copy())
+        return -matrix[:, FEATURE_COLS.index("distance_km_scaled")]
+
+
+@pytest.fixture
+def candidates():
+    rng = np.random.default_rng(11)
+    n = 60
+    return CandidateSnapshot({
+        "worker_id": np.arange(n, dtype=np.int64),
+        "worker_name": np.full(n, "worker", dtype=object),
+        "service_id": rng.integers(1, 4, size=n),
+        "service_name": np.full(n, "service", dtype=object),
+        "worker_lat": rng.uniform(12.90, 13.05, size=n),
+        "worker_lon": rng.uniform(77.50, 77.70, size=n),
+        "num_bookings": rng.integers(0, 50, size=n),
+        "total_rating": rng.uniform(0, 5, size=n),
+        "charge": np.where(rng.random(n) < 0.2, np.nan, rng.uniform(100, 1000, size=n)),
+        "is_available": np.ones(n, dtype=bool),
+        "profile_image": np.full(n, None, dtype=object),
+        "address": np.full(n, None, dtype=object),
+    })
+
+
+@pytest.fixture
+def history():
+    return pd.DataFrame({"worker_id": [3, 3, 8], "service_id": [2, 2, 1], "worker_rating": [4.0, 4.0, None]})
+
+
+@pytest.fixture
+def single_user(candidates, history, monkeypatch):
+    monkeypatch.setattr(recommender, "get_user_location", lambda user_id, engine=None: USER)
+    monkeypatch.setattr(recommender, "get_user_history", lambda user_id, engine=None: history)
+    monkeypatch.setattr(recommender, "retrieve_candidates", lambda *args, **kwargs: candidates)
+
+
+# ----------------------
+# 🤖 Model scoring
+# ----------------------
+def test_model_scoring_builds_feature_cols_in_order(single_user, candidates):
+    ranker = RecordingRanker()
+    recommendations = recommender.recommend_top_n_for_user(
+        1, ranker, None, top_n=5, scorer="model", feature_cols=FEATURE_COLS
+    )
+
+    assert len(ranker.calls) == 1  # one vectorised predict per request
+    matrix = ranker.calls[0]
+    assert matrix.shape == (candidates.size, len(FEATURE_COLS))
+
+    distance_km = haversine_vector(USER[0], USER[1], candidates.worker_lat, candidates.worker_lon)
+    expected = {
+        "worker_lat": candidates.worker_lat,
+        "worker_lon": candidates.worker_lon,
+        "charge": np.nan_to_num(candidates.charge, nan=0.0),
+        "num_bookings": candidates.num_bookings,
+        "distance_km_scaled": distance_km * 2,
+        "distance_bucket": pd.cut(distance_km, [-1, 1, 3, 10, 100], labels=[0, 1, 2, 3]).astype(float),
+        "service_match": np.isin(candidates.service_id, [1, 2]).astype(float),
+        "worker_avg_rating": candidates.total_rating,
+        "worker_total_bookings": candidates.num_bookings,
+        "user_avg_rating": np.full(candidates.size, 8.0 / 3),
+    }
+    for i, name in enumerate(FEATURE_COLS):
+        np.testing.assert_allclose(matrix[:, i], expected[name], rtol=1e-6, err_msg=name)
+
+    # ranked by the model's scores: nearest first
+    nearest = np.argsort(distance_km, kind="stable")[:5]
+    assert [r["worker_id"] for r in recommendations] == candidates.worker_id[nearest].tolist()
+
+
+def test_heuristic_scorer_never_calls_the_model(single_user):
+    ranker = RecordingRanker()
+    recommender.recommend_top_n_for_user(1, ranker, None, top_n=5, scorer="heuristic", feature_cols=FEATURE_COLS)
+    assert ranker.calls == []
@@ -0,0 +1,66 @@
+import uuid
+
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIRequestFactory
+
+from core import roles
+from core.models import UserRole
+from core.permissions import IsAdmin, IsVerifier1, IsVerifier2
+
+
+# ----------------------
+# ⚙️ Fixtures
+# ----------------------
+@pytest.fixture
+def verifier(db):
+    user = get_user_model().objects.create_user(
+        email=f"roles_{uuid.uuid4().hex[:6]}@example.com", password="Test@1234", name="Verifier"
+    )
+    UserRole.objects.create(user=user, role="verifier2")
+    roles.invalidate(user.pk)
+    return user
+
+
+def fresh(user):
+    """The user as the auth middleware loads it for a new request."""
+    return get_user_model().objects.get(pk=user.pk)
+
+
+def allowed(permission, user):
+    request = APIRequestFactory().get("/")
+    request.user = user
+    return permission().has_permission(request, None)
+
+
+# ----------------------
+# 🔐 Role cache
+# ----------------------
+@pytest.mark.django_db
+def test_permissions_hit_cache(verifier, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        user = fresh(verifier)
+    with django_assert_num_queries(1):
+        assert allowed(IsVerifier2, user)
+
+    user = fresh(verifier)
+    with django_assert_num_queries(0):
+        assert allowed(IsVerifier2, user)
+        assert not allowed(IsVerifier1, user)
+        assert not allowed(IsAdmin, user)
+        assert user.role == "verifier2"
+
+
+@pytest.mark.django_db
+def test_role_change_invalidates(verifier, django_capture_on_commit_callbacks):
+    user = fresh(verifier)
+    assert not allowed(IsVerifier1, user)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        UserRole.objects.create(user=verifier, role="verifier1")
+    assert allowed(IsVerifier1, fresh(verifier))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        UserRole.objects.filter(user=verifier, role="verifier2").delete()
+    assert not allowed(IsVerifier2, fresh(verifier))
+    assert fresh(verifier).role == "verifier1"
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pytest
+
+lgb = pytest.importorskip("lightgbm")
+
+from core.ml_model import MODEL_PATH
+from core.tree_eval import CompiledRanker, ModelTooLarge
+
+
+# ----------------------
+# ⚙️ Fixtures
+# ----------------------
+@pytest.fixture
+def rng():
+    return np.random.default_rng(7)
+
+
+@pytest.fixture
+def synthetic_ranker(rng):
+    """Small lambdarank model with NaNs, zeros and a categorical feature."""
+    X = rng.normal(size=(3000, 4))
+    X[:, 2] = rng.integers(0, 30, size=3000)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    X[rng.random(3000) < 0.1, 1] = 0
+    y = rng.integers(0, 4, size=3000)
+    dataset = lgb.Dataset(X, label=y, group=[30] * 100, categorical_feature=[2], params={"verbose": -1})
+    params = {"objective": "lambdarank", "num_leaves": 15, "min_data_in_leaf": 5,
+              "min_data_per_group": 5, "cat_smooth": 1, "verbose": -1}
+    return lgb.train(params, dataset, num_boost_round=40)
+
+
+# ----------------------
+# 🌲 Compiled evaluator
+# ----------------------
+def test_matches_booster_on_synthetic_model(synthetic_ranker, rng):
+    X = rng.normal(size=(2000, 4))
+    X[:, 2] = rng.integers(-2, 40, size=2000)  # includes unseen and negative categories
+    X[rng.random(X.shape) < 0.1] = np.nan
+    X[:100, 1] = 0
+
+    compiled = CompiledRanker.from_booster(synthetic_ranker)
+    np.testing.assert_array_equal(compiled.predict(X), synthetic_ranker.predict(X))
+
+
+@pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason="no trained ranker")
+def test_matches_shipped_ranker_and_survives_save(tmp_path, rng):
+    booster = lgb.Booster(model_file=MODEL_PATH)
+    X = rng.uniform(0, 100, size=(500, booster.num_feature()))
+    X[rng.random(X.shape) < 0.05] = np.nan
+
+    compiled = CompiledRanker.from_booster(booster)
+    np.testing.assert_array_equal(compiled.predict(X), booster.predict(X))
+
+    compiled.save(tmp_path / "compiled.npz")
+    np.testing.assert_array_equal(CompiledRanker.load(tmp_path / "compiled.npz").predict(X), booster.predict(X))
+
+
+def test_rejects_non_ranking_objective(rng):
+    X = rng.normal(size=(200, 3))
+    booster = lgb.train({"objective": "binary", "verbose": -1},
+                        lgb.Dataset(X, label=rng.integers(0, 2, 200)), num_boost_round=3)
+    with pytest.raises(ValueError):
+        CompiledRanker.from_booster(booster)
+
+
+def test_refuses_oversize_model(synthetic_ranker):
+    with pytest.raises(ModelTooLarge):
+        CompiledRanker.from_booster(synthetic_ranker, max_entries=10)
+
+
+def test_zero_and_nan_missing_types_on_one_feature(rng):
+    """A zero meets a NaN-type split as a plain value, even where other splits treat zero as missing."""
+    X = rng.normal(size=(2000, 2))
+    booster = lgb.train({"objective": "lambdarank", "num_leaves": 15, "min_data_in_leaf": 5, "verbose": -1},
+                        lgb.Dataset(X, label=rng.integers(0, 4, size=2000), group=[40] * 50),
+                        num_boost_round=10)
+
+    # rewrite every split's missing type: Zero and NaN in turn, default branch flipping with it
+    flags = iter([1 << 2 | 1 << 1, 2 << 2 | 1 << 1, 1 << 2, 2 << 2] * 1000)
+    lines = [
+        "decision_type=" + " ".join(str(next(flags)) for _ in line.split("=")[1].split())
+        if line.startswith("decision_type=") else line
+        for line in booster.model_to_string().splitlines()
+        if not line.startswith("tree_sizes=")  # byte offsets no longer hold
+    ]
+    booster = lgb.Booster(model_str="\n".join(lines))
+
+    X = rng.normal(size=(1000, 2))
+    X[rng.random(X.shape) < 0.2] = 0
+    X[rng.random(X.shape) < 0.2] = np.nan
+    X[:10] = [[0.0, np.nan], [np.nan, 0.0], [0.0, 0.0], [np.nan, np.nan], [-0.0, 1.0],
+              [1e-36, -1.0], [-1e-36, 0.5], [1.0, 1e-36], [0.0, -0.5], [np.nan, 2.0]]
+
+    compiled = CompiledRanker.from_booster(booster)
+    np.testing.assert_array_equal(compiled.predict(X), booster.predict(X))
@@ -0,0 +1,50 @@
+import uuid
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from core.models import Service, Worker, WorkerService
+
+
+# ----------------------
+# ⚙️ Fixtures
+# ----------------------
+@pytest.fixture
+def services(db):
+    return [
+        Service.objects.create(service_type=name, description=name, base_coins_cost=100)
+        for name in ("Plumbing", "Cleaning")
+    ]
+
+
+def make_workers(services, n):
+    User = get_user_model()
+    for i in range(n):
+        user = User.objects.create_user(
+            email=f"worker_{uuid.uuid4().hex[:8]}@example.com", password="Test@1234", name=f"Worker {i}"
+        )
+        worker = Worker.objects.create(user=user, address="Test Address", experience_years=i)
+        for service, charge in zip(services, (300, 500)):
+            WorkerService.objects.create(worker=worker, service=service, charge=charge)
+
+
+# ----------------------
+# 🔢 Query count
+# ----------------------
+@pytest.mark.django_db
+def test_worker_list_query_count(client, services, django_assert_num_queries):
+    # workers + prefetched services, however many workers are listed
+    make_workers(services, 3)
+    with django_assert_num_queries(2):
+        resp = client.get("/api/workers/")
+    assert resp.status_code == 200
+
+    make_workers(services, 5)
+    with django_assert_num_queries(2):
+        resp = client.get("/api/workers/")
+    listed = {w["id"]: w for w in resp.json()}
+
+    worker = Worker.objects.filter(services__isnull=False).latest("id")
+    assert listed[worker.id]["service"] == {"service_type": "Plumbing"}
+    assert listed[worker.id]["costPerHour"] == 400.0
+    assert listed[worker.id]["address"] == "Test Address"